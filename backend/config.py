@@ -1,3 +1,43 @@
 RESULT_BASE_PATH = "data/results"
 VIDEOS_BASE_PATH = "data/videos"
 PRESETS_BASE_PATH = "data/presets"
+THUMBNAILS_BASE_PATH = "data/thumbnails"
+
+# Jobs changed this many seconds before the client's cursor are returned again, so
+# updates committed slightly out of timestamp order are not missed
+JOB_CHANGES_OVERLAP_SECONDS = 2
+JOB_EVENTS_QUEUE_SIZE = 1000
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+
+# Number of open jobs (oldest first) scored by model affinity when a worker claims a job
+JOB_AFFINITY_CANDIDATES = 20
+# Jobs waiting longer than this are handed out in creation order regardless of affinity
+JOB_AFFINITY_MAX_WAIT_SECONDS = 120
+# Idle workers may wait this long for a job to be opened in their request for the next
+# job, each waiting worker holds a request thread meanwhile
+JOB_CLAIM_MAX_WAIT_SECONDS = 30
+
+# Order in which open jobs are handed out: "fifo" or "sjf" (shortest estimated job first)
+JOB_SCHEDULING_POLICY = "fifo"
+# For "sjf", seconds of estimated duration credited per second a job is waiting (aging)
+JOB_SJF_AGING_FACTOR = 1.0
+
+# Job cost estimator, see utils/job_cost_estimator.py
+JOB_COST_DEFAULT_SECONDS_PER_UNIT = 0.02
+JOB_COST_OVERHEAD_SECONDS = 20
+JOB_COST_CALIBRATION_WEIGHT = 0.2
+JOB_COST_CALIBRATION_HISTORY = 200
+
+# Preview jobs process a few sampled, downscaled frames of a video with the lightest models
+PREVIEW_FPS = 1
+PREVIEW_MAX_RESOLUTION = 480
+PREVIEW_MAX_FRAMES = 30
+# Open jobs with a higher priority are always handed out first
+PREVIEW_JOB_PRIORITY = 10
+PREVIEW_RESULT_NAME = "Preview"  # name of the result videos of preview jobs, not listed with the results
+
+# Single frame previews are rendered by the frame preview worker and cached on disk
+FRAME_PREVIEW_WORKER_URL = "http://python-worker-frame_preview:8001"
+FRAME_PREVIEW_TIMEOUT_SECONDS = 30
+FRAME_PREVIEWS_BASE_PATH = "data/frame_previews"
+FRAME_PREVIEW_CACHE_MAX_BYTES = 500 * 1024**2
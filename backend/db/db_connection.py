@@ -1,28 +1,97 @@
 import psycopg2
 import os
+import time
+from contextlib import contextmanager
+
+from utils.metrics import metrics_registry
+
+db_query_seconds = metrics_registry.histogram(
+    "db_query_seconds",
+    "Duration of database queries by statement type",
+    ("operation",),
+)
+
+
+def get_operation(sql: str) -> str:
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "UNKNOWN"
+
+
+def connect():
+    return psycopg2.connect(
+        database=os.environ["BACKEND_PG_DATABASE"],
+        user=os.environ["BACKEND_PG_USER"],
+        password=os.environ["BACKEND_PG_PASSWORD"],
+        host=os.environ["BACKEND_PG_HOST"],
+        port=os.environ["BACKEND_PG_PORT"],
+    )
+
+
+class DBTransaction:
+    """
+    Same interface as DBConnection for the managers, but nothing is committed until
+    the transaction block of DBConnection.transaction ends without an error.
+    """
+
+    def __init__(self, connection):
+        self.__connection = connection
+
+    def execute(self, sql: str, bindings: dict = {}):
+        start_time = time.perf_counter()
+        with self.__connection.cursor() as cursor:
+            cursor.execute(sql, bindings)
+        db_query_seconds.observe(
+            time.perf_counter() - start_time, operation=get_operation(sql)
+        )
+
+    def select_all(self, sql: str, bindings: dict = {}):
+        start_time = time.perf_counter()
+        with self.__connection.cursor() as cursor:
+            cursor.execute(sql, bindings)
+            result = cursor.fetchall()
+        db_query_seconds.observe(
+            time.perf_counter() - start_time, operation=get_operation(sql)
+        )
+        return result
 
 
 class DBConnection:
     def __init__(self):
-        self.__connection = psycopg2.connect(
-            database=os.environ["BACKEND_PG_DATABASE"],
-            user=os.environ["BACKEND_PG_USER"],
-            password=os.environ["BACKEND_PG_PASSWORD"],
-            host=os.environ["BACKEND_PG_HOST"],
-            port=os.environ["BACKEND_PG_PORT"],
-        )
+        self.__connection = connect()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the statements of managers created with the yielded DBTransaction in one
+        transaction, rolled back if the block raises. It has its own connection, the
+        shared one commits after every statement of concurrent requests.
+        """
+        connection = connect()
+        try:
+            # commits when the block succeeds, rolls back otherwise
+            with connection:
+                yield DBTransaction(connection)
+        finally:
+            connection.close()
 
     def execute(self, sql: str, bindings: dict = {}):
+        start_time = time.perf_counter()
         cursor = self.__connection.cursor()
         cursor.execute(sql, bindings)
         self.__connection.commit()
         cursor.close()
+        db_query_seconds.observe(
+            time.perf_counter() - start_time, operation=get_operation(sql)
+        )
 
     def select_all(self, sql: str, bindings: dict = {}):
+        start_time = time.perf_counter()
         cursor = self.__connection.cursor()
         cursor.execute(sql, bindings)
         result = cursor.fetchall()
         cursor.close()
+        db_query_seconds.observe(
+            time.perf_counter() - start_time, operation=get_operation(sql)
+        )
         return result
 
     def get_cursor(self):
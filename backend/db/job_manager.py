@@ -1,12 +1,53 @@
+import time
 import uuid
+from datetime import datetime, timedelta
+from typing import Optional
 from db.db_connection import DBConnection
 from db.model.job import Job
+from db.model.job_summary import JobSummary
+from db.result_cache_manager import ResultCacheManager
+from config import (
+    JOB_CHANGES_OVERLAP_SECONDS,
+    JOB_AFFINITY_CANDIDATES,
+    JOB_AFFINITY_MAX_WAIT_SECONDS,
+    JOB_SCHEDULING_POLICY,
+    JOB_SJF_AGING_FACTOR,
+    JOB_COST_CALIBRATION_HISTORY,
+)
+from utils.job_events import job_events, open_job_signal
+from utils.model_requirements import get_model_affinity
+from utils.job_cost_estimator import job_cost_estimator, compute_etas
+from utils.result_cache_utils import compute_cache_key, record_cache_lookup
+from utils.metrics import metrics_registry, DURATION_BUCKETS
 import json
 
+JOB_SUMMARY_COLUMNS = "id, video_id, result_video_id, type, status, created_at, started_at, finished_at, progress, updated_at, estimated_duration, priority, stage_timings"
+
+job_claim_wait_seconds = metrics_registry.histogram(
+    "job_claim_wait_seconds",
+    "Time jobs waited in the queue until a worker claimed them",
+    ("type",),
+    DURATION_BUCKETS,
+)
+job_duration_seconds = metrics_registry.histogram(
+    "job_duration_seconds",
+    "Processing time of finished jobs, from claim to finish",
+    ("type",),
+    DURATION_BUCKETS,
+)
+
+
+def get_scheduling_order() -> str:
+    # ORDER BY clause for open jobs, by priority and then the configured scheduling policy
+    if JOB_SCHEDULING_POLICY == "sjf":
+        return f"priority DESC, COALESCE(estimated_duration, 0) - {float(JOB_SJF_AGING_FACTOR)} * EXTRACT(EPOCH FROM (current_timestamp - created_at)) ASC, created_at ASC"
+    return "priority DESC, created_at ASC"
+
 
 class JobManager:
     def __init__(self, db_connection: DBConnection):
         self.__db_connection = db_connection
+        self.__result_cache_manager = ResultCacheManager(db_connection)
 
     def fetch_jobs(self):
         result = []
@@ -20,6 +61,75 @@ class JobManager:
 
         return result
 
+    def fetch_job_changes(self, since: Optional[datetime] = None) -> list[JobSummary]:
+        # Returns the jobs (without run params) that changed after the given cursor
+        if since is None:
+            job_data_list = self.__db_connection.select_all(
+                f"SELECT {JOB_SUMMARY_COLUMNS} FROM jobs ORDER BY updated_at ASC"
+            )
+        else:
+            job_data_list = self.__db_connection.select_all(
+                f"SELECT {JOB_SUMMARY_COLUMNS} FROM jobs WHERE updated_at > %(since)s ORDER BY updated_at ASC",
+                {"since": since - timedelta(seconds=JOB_CHANGES_OVERLAP_SECONDS)},
+            )
+
+        return [JobSummary(*job_data) for job_data in job_data_list]
+
+    def ensure_cost_estimator_calibrated(self):
+        # Calibrates the cost estimator with the most recent finished jobs once per process
+        if job_cost_estimator.is_calibrated:
+            return
+
+        finished_jobs = self.__db_connection.select_all(
+            """SELECT j.type, j.data, v.video_info, EXTRACT(EPOCH FROM (j.finished_at - j.started_at))
+            FROM jobs j LEFT JOIN videos v ON v.id = j.video_id
+            WHERE j.status=%(status)s AND j.started_at IS NOT NULL AND j.finished_at IS NOT NULL
+            ORDER BY j.finished_at DESC LIMIT %(limit)s""",
+            {"status": "finished", "limit": JOB_COST_CALIBRATION_HISTORY},
+        )
+        job_cost_estimator.calibrate(
+            [
+                (job_type, data, video_info, float(duration))
+                for job_type, data, video_info, duration in reversed(finished_jobs)
+            ]
+        )
+
+    def fetch_video_details(self, video_id: str):
+        # Returns video_info and content_hash of a video
+        video_data_list = self.__db_connection.select_all(
+            "SELECT video_info, content_hash FROM videos WHERE id=%(id)s",
+            {"id": video_id},
+        )
+
+        return video_data_list[0] if len(video_data_list) > 0 else (None, None)
+
+    def fetch_job_etas(self, worker_counts: dict) -> dict:
+        """
+        Returns the estimated seconds until each open or running job is finished,
+        simulating the queue of every job type with its number of active workers.
+        """
+        # the summary columns are enough for the simulation, the run params are not read
+        job_data_list = self.__db_connection.select_all(
+            f"SELECT {JOB_SUMMARY_COLUMNS}, EXTRACT(EPOCH FROM (current_timestamp - COALESCE(started_at, created_at))) FROM jobs WHERE status IN ('open', 'running') ORDER BY {get_scheduling_order()}"
+        )
+
+        jobs_by_type = {}
+        for job_data in job_data_list:
+            job = JobSummary(*job_data[:-1])
+            running_jobs, open_jobs = jobs_by_type.setdefault(job.type, ([], []))
+            if job.status == "running":
+                running_jobs.append((job, float(job_data[-1])))
+            else:
+                open_jobs.append(job)
+
+        etas = {}
+        for job_type, (running_jobs, open_jobs) in jobs_by_type.items():
+            etas.update(
+                compute_etas(running_jobs, open_jobs, worker_counts.get(job_type, 0))
+            )
+
+        return etas
+
     def create_new_jobs(
         self,
         id: str,
@@ -27,41 +137,124 @@ class JobManager:
         result_video_id: str,
         data: dict,
         job_type: str,
+        bypass_cache: bool = False,
+        priority: int = 0,
     ):
+        self.ensure_cost_estimator_calibrated()
+
         for idx, video_id in enumerate(video_ids):
             if idx == 0:
                 job_id = id
             else:
                 job_id = str(uuid.uuid4())
-            self.__db_connection.execute(
-                "INSERT INTO jobs (id, video_id, result_video_id, type, status, data, created_at) VALUES (%(id)s, %(video_id)s, %(result_video_id)s, %(type)s, %(status)s, %(data)s, current_timestamp)",
+
+            video_info, content_hash = self.fetch_video_details(video_id)
+            cache_key = compute_cache_key(content_hash, job_type, data)
+            is_cached = not bypass_cache and self.link_cached_results(
+                cache_key, job_type, job_id, video_id, result_video_id
+            )
+            if bypass_cache:
+                record_cache_lookup("bypassed")
+
+            if is_cached:
+                self.__db_connection.execute(
+                    "INSERT INTO jobs (id, video_id, result_video_id, type, status, data, created_at, started_at, finished_at, progress, updated_at, estimated_duration, cache_key, priority) VALUES (%(id)s, %(video_id)s, %(result_video_id)s, %(type)s, %(status)s, %(data)s, current_timestamp, current_timestamp, current_timestamp, 100, clock_timestamp(), 0, %(cache_key)s, %(priority)s)",
+                    {
+                        "id": job_id,
+                        "video_id": video_id,
+                        "result_video_id": result_video_id,
+                        "type": job_type,
+                        "status": "finished",
+                        "data": json.dumps(data),
+                        "cache_key": cache_key,
+                        "priority": priority,
+                    },
+                )
+            else:
+                self.__db_connection.execute(
+                    "INSERT INTO jobs (id, video_id, result_video_id, type, status, data, created_at, updated_at, estimated_duration, cache_key, priority) VALUES (%(id)s, %(video_id)s, %(result_video_id)s, %(type)s, %(status)s, %(data)s, current_timestamp, clock_timestamp(), %(estimated_duration)s, %(cache_key)s, %(priority)s)",
+                    {
+                        "id": job_id,
+                        "video_id": video_id,
+                        "result_video_id": result_video_id,
+                        "type": job_type,
+                        "status": "open",
+                        "data": json.dumps(data),
+                        "estimated_duration": job_cost_estimator.estimate_duration(
+                            job_type, data, video_info
+                        ),
+                        "cache_key": cache_key,
+                        "priority": priority,
+                    },
+                )
+
+            job_events.publish(
                 {
+                    "type": "created",
                     "id": job_id,
                     "video_id": video_id,
-                    "result_video_id": result_video_id,
-                    "type": job_type,
-                    "status": "open",
-                    "data": json.dumps(data),
-                },
+                    "job_type": job_type,
+                    "status": "finished" if is_cached else "open",
+                    "progress": 100 if is_cached else 0,
+                }
+            )
+
+            if not is_cached:
+                open_job_signal.notify()
+
+    def link_cached_results(
+        self,
+        cache_key: str,
+        job_type: str,
+        job_id: str,
+        video_id: str,
+        result_video_id: str,
+    ) -> bool:
+        # Links the results of an identical finished job to the new job, returns False on a cache miss
+        if cache_key is None:
+            return False
+
+        source_job = self.__result_cache_manager.fetch_cached_job(cache_key, job_type)
+        if source_job is None:
+            record_cache_lookup("misses")
+            return False
+
+        try:
+            self.__result_cache_manager.link_results(
+                source_job, job_id, video_id, result_video_id
             )
+        except Exception as error:
+            print("Linking cached results of job " + source_job.id + " failed")
+            print(error)
+            record_cache_lookup("misses")
+            return False
 
-    def fetch_next_job(self, job_type: str):
-        # @todo make this nice
+        print("Job " + job_id + " satisfied from cached job " + source_job.id)
+        record_cache_lookup("hits")
+        return True
+
+    def fetch_next_job(self, job_type: str, loaded_models: Optional[list[str]] = None):
+        # Claims an open job, preferring jobs whose models the worker has loaded already
         cursor = self.__db_connection.get_cursor()
-        jobs = []
+        job = None
 
         try:
             cursor.execute("BEGIN TRANSACTION ISOLATION LEVEL REPEATABLE READ")
             cursor.execute(
-                "SELECT * FROM jobs WHERE status=%(status)s AND type=%(job_type)s LIMIT 1",
-                {"status": "open", "job_type": job_type},
+                "SELECT *, EXTRACT(EPOCH FROM (current_timestamp - created_at)) FROM jobs WHERE status=%(status)s AND type=%(job_type)s ORDER BY " + get_scheduling_order() + " LIMIT %(limit)s FOR UPDATE SKIP LOCKED",
+                {
+                    "status": "open",
+                    "job_type": job_type,
+                    "limit": JOB_AFFINITY_CANDIDATES,
+                },
             )
-            jobs = cursor.fetchall()
+            candidates = [(Job(*row[:-1]), row[-1]) for row in cursor.fetchall()]
+            job = self.select_job_by_affinity(candidates, loaded_models)
 
-            if len(jobs) > 0:
+            if job is not None:
                 cursor.execute(
-                    "UPDATE jobs SET status=%(status)s, started_at=current_timestamp WHERE id=%(id)s",
-                    {"status": "running", "id": jobs[0][0]},
+                    "UPDATE jobs SET status=%(status)s, started_at=current_timestamp, updated_at=clock_timestamp() WHERE id=%(id)s",
+                    {"status": "running", "id": job.id},
                 )
 
             cursor.execute("COMMIT")
@@ -71,7 +264,64 @@ class JobManager:
         finally:
             cursor.close()
 
-        return None if len(jobs) < 1 else Job(*jobs[0])
+        if job is None:
+            return None
+
+        waiting_time = next(
+            waiting_time for candidate, waiting_time in candidates if candidate.id == job.id
+        )
+        job_claim_wait_seconds.observe(float(waiting_time), type=job.type)
+        job_events.publish({"type": "status", "id": job.id, "status": "running"})
+        return job
+
+    def wait_for_next_job(
+        self, job_type: str, loaded_models: Optional[list[str]], timeout: float
+    ):
+        # Claims the next job like fetch_next_job, but waits up to timeout seconds for a
+        # job to be opened if there is none
+        deadline = time.monotonic() + timeout
+        while True:
+            generation = open_job_signal.get_generation()
+            job = self.fetch_next_job(job_type, loaded_models)
+            remaining = deadline - time.monotonic()
+            if job is not None or remaining <= 0:
+                return job
+            open_job_signal.wait(generation, remaining)
+
+    @staticmethod
+    def select_job_by_affinity(candidates: list, loaded_models: Optional[list[str]]):
+        # candidates are (job, waiting time in seconds) pairs in scheduling order
+        if len(candidates) < 1:
+            return None
+
+        # affinity and waiting time only decide between jobs of the highest priority
+        top_priority = max(job.priority for job, _ in candidates)
+        candidates = [
+            candidate for candidate in candidates if candidate[0].priority == top_priority
+        ]
+
+        # starvation bound, jobs that waited too long are handed out first
+        oldest_job, oldest_waiting_time = max(candidates, key=lambda candidate: candidate[1])
+        if oldest_waiting_time >= JOB_AFFINITY_MAX_WAIT_SECONDS:
+            return oldest_job
+        if not loaded_models:
+            return candidates[0][0]
+
+        best_job, best_affinity = candidates[0][0], -1.0
+        for job, _ in candidates:
+            affinity = get_model_affinity(job.data, loaded_models)
+            if affinity > best_affinity:
+                best_job, best_affinity = job, affinity
+
+        return best_job
+
+    def fetch_job_id_by_result_video_id(self, result_video_id: str) -> Optional[str]:
+        job_data_list = self.__db_connection.select_all(
+            "SELECT id FROM jobs WHERE result_video_id=%(result_video_id)s",
+            {"result_video_id": result_video_id},
+        )
+
+        return job_data_list[0][0] if len(job_data_list) > 0 else None
 
     def fetch_job_by_result_video_id(self, result_video_id: str) -> Job:
         job_data_list = self.__db_connection.select_all(
@@ -86,21 +336,66 @@ class JobManager:
 
     def update_job_progress(self, job_id: str, progress: int):
         self.__db_connection.execute(
-            "UPDATE jobs SET progress=%(progress)s WHERE id=%(id)s",
+            "UPDATE jobs SET progress=%(progress)s, updated_at=clock_timestamp() WHERE id=%(id)s",
             {"progress": progress, "id": job_id},
         )
+        job_events.publish({"type": "progress", "id": job_id, "progress": progress})
+
+    def set_job_stage_timings(self, job_id: str, stage_timings: dict):
+        self.__db_connection.execute(
+            "UPDATE jobs SET stage_timings=%(stage_timings)s, updated_at=clock_timestamp() WHERE id=%(id)s",
+            {"stage_timings": json.dumps(stage_timings), "id": job_id},
+        )
+
+    def mark_job_as_started(self, job_id: str):
+        # Workers claim the next job before the current one is done, the processing
+        # (and the measured duration) starts later
+        self.__db_connection.execute(
+            "UPDATE jobs SET started_at=current_timestamp, updated_at=clock_timestamp() WHERE id=%(id)s AND status=%(status)s",
+            {"status": "running", "id": job_id},
+        )
 
     def mark_job_as_finished(self, job_id: str):
         self.__db_connection.execute(
-            "UPDATE jobs SET status=%(status)s, finished_at=current_timestamp, progress=100 WHERE id=%(id)s",
+            "UPDATE jobs SET status=%(status)s, finished_at=current_timestamp, progress=100, updated_at=clock_timestamp() WHERE id=%(id)s",
             {"status": "finished", "id": job_id},
         )
+        self.observe_job_duration(job_id)
+        job_events.publish(
+            {"type": "status", "id": job_id, "status": "finished", "progress": 100}
+        )
+
+    def observe_job_duration(self, job_id: str):
+        # Calibrates the cost estimator with the measured duration of a finished job
+        self.ensure_cost_estimator_calibrated()
+
+        job_data_list = self.__db_connection.select_all(
+            """SELECT j.type, j.data, v.video_info, EXTRACT(EPOCH FROM (j.finished_at - j.started_at))
+            FROM jobs j LEFT JOIN videos v ON v.id = j.video_id
+            WHERE j.id=%(id)s AND j.started_at IS NOT NULL AND j.finished_at IS NOT NULL""",
+            {"id": job_id},
+        )
+
+        if len(job_data_list) > 0:
+            job_type, data, video_info, duration = job_data_list[0]
+            job_cost_estimator.observe(job_type, data, video_info, float(duration))
+            job_duration_seconds.observe(float(duration), type=job_type)
 
     def mark_job_as_failed(self, job_id: str):
         self.__db_connection.execute(
-            "UPDATE jobs SET status=%(status)s, finished_at=current_timestamp, progress=100 WHERE id=%(id)s",
+            "UPDATE jobs SET status=%(status)s, finished_at=current_timestamp, progress=100, updated_at=clock_timestamp() WHERE id=%(id)s",
             {"status": "failed", "id": job_id},
         )
+        job_events.publish(
+            {"type": "status", "id": job_id, "status": "failed", "progress": 100}
+        )
+
+    def count_jobs_by_type_and_status(self) -> dict:
+        # (type, status) -> number of open and running jobs
+        job_count_list = self.__db_connection.select_all(
+            "SELECT type, status, count(*) FROM jobs WHERE status IN ('open', 'running') GROUP BY type, status"
+        )
+        return {(job_type, status): count for job_type, status, count in job_count_list}
 
     def get_job_status(self, job_id: str):
         job_data_list = self.__db_connection.select_all(
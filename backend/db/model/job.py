@@ -13,3 +13,8 @@ class Job:
     started_at: str
     finished_at: str
     progress: int
+    updated_at: str
+    estimated_duration: float
+    cache_key: str
+    priority: int
+    stage_timings: dict
@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class JobSummary:
+    # Job without its run params, used for the job list feed
+    id: str
+    video_id: str
+    result_video_id: str
+    type: str
+    status: str
+    created_at: str
+    started_at: str
+    finished_at: str
+    progress: int
+    updated_at: str
+    estimated_duration: float
+    priority: int
+    stage_timings: dict
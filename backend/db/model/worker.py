@@ -7,3 +7,5 @@ class Worker:
     job_id: str
     last_activity: str
     type: str
+    loaded_models: list
+    capacity: int
@@ -9,8 +9,9 @@ class ResultBlendshapesManager:
         self.__db_connection = db_connection
 
     def create_result_mp_kinematics_entry(
-        self, id: str, result_video_id: str, video_id: str, job_id: str, data: dict
+        self, id: str, result_video_id: str, video_id: str, job_id: str, data
     ):
+        # data is a dict or JSON text, which is stored as is
         self.__db_connection.execute(
             "INSERT INTO result_blendshapes (id, result_video_id, video_id, job_id, data) VALUES (%(id)s, %(result_video_id)s, %(video_id)s, %(job_id)s, %(data)s)",
             {
@@ -18,7 +19,7 @@ class ResultBlendshapesManager:
                 "result_video_id": result_video_id,
                 "video_id": video_id,
                 "job_id": job_id,
-                "data": json.dumps(data),
+                "data": data if isinstance(data, str) else json.dumps(data),
             },
         )
 
@@ -0,0 +1,92 @@
+import os
+import shutil
+
+from db.db_connection import DBConnection
+from db.model.job import Job
+from config import RESULT_BASE_PATH
+
+# result tables that are copied for a cached job, all share the columns
+# id, result_video_id, video_id, job_id followed by the listed data columns
+RESULT_TABLES = {
+    "result_mp_kinematics": ["type", "data"],
+    "result_blendshapes": ["data"],
+    "result_audio_files": ["data"],
+    "result_extra_files": ["ending", "data"],
+}
+
+
+def link_file(source_path: str, target_path: str):
+    # hardlink, so cached results do not take additional disk space
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+class ResultCacheManager:
+    def __init__(self, db_connection: DBConnection):
+        self.__db_connection = db_connection
+
+    def fetch_cached_job(self, cache_key: str, job_type: str):
+        # Returns the latest finished job with the same cache key whose result files still exist
+        job_data_list = self.__db_connection.select_all(
+            "SELECT * FROM jobs WHERE cache_key=%(cache_key)s AND type=%(type)s AND status=%(status)s ORDER BY finished_at DESC LIMIT 1",
+            {"cache_key": cache_key, "type": job_type, "status": "finished"},
+        )
+
+        if len(job_data_list) < 1:
+            return None
+
+        job = Job(*job_data_list[0])
+        result_video_count = self.__db_connection.select_all(
+            "SELECT COUNT(*) FROM result_videos WHERE job_id=%(job_id)s",
+            {"job_id": job.id},
+        )[0][0]
+        if result_video_count > 0 and not os.path.exists(
+            os.path.join(RESULT_BASE_PATH, job.video_id, job.result_video_id + ".mp4")
+        ):
+            return None
+
+        return job
+
+    def link_results(self, source_job: Job, job_id: str, video_id: str, result_video_id: str):
+        """
+        Satisfies the job with the results of source_job: the result video and preview
+        are hardlinked and all result rows are copied within one transaction.
+        """
+        source_dir = os.path.join(RESULT_BASE_PATH, source_job.video_id)
+        target_dir = os.path.join(RESULT_BASE_PATH, video_id)
+        os.makedirs(target_dir, exist_ok=True)
+        for ending in [".mp4", ".png"]:
+            source_path = os.path.join(source_dir, source_job.result_video_id + ending)
+            if os.path.exists(source_path):
+                link_file(source_path, os.path.join(target_dir, result_video_id + ending))
+
+        bindings = {
+            "job_id": job_id,
+            "video_id": video_id,
+            "result_video_id": result_video_id,
+            "source_job_id": source_job.id,
+        }
+
+        cursor = self.__db_connection.get_cursor()
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute(
+                "INSERT INTO result_videos (id, video_id, job_id, video_info, created_at, name) SELECT %(result_video_id)s, %(video_id)s, %(job_id)s, video_info, current_timestamp, name FROM result_videos WHERE job_id=%(source_job_id)s",
+                bindings,
+            )
+            for table, columns in RESULT_TABLES.items():
+                column_list = ", ".join(columns)
+                cursor.execute(
+                    f"INSERT INTO {table} (id, result_video_id, video_id, job_id, {column_list}) SELECT gen_random_uuid(), %(result_video_id)s, %(video_id)s, %(job_id)s, {column_list} FROM {table} WHERE job_id=%(source_job_id)s",
+                    bindings,
+                )
+            cursor.execute("COMMIT")
+        except Exception as error:
+            cursor.execute("ROLLBACK")
+            raise error
+        finally:
+            cursor.close()
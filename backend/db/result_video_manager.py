@@ -2,6 +2,7 @@ import json
 
 from db.db_connection import DBConnection
 from db.model.result_video import ResultVideo
+from config import PREVIEW_RESULT_NAME
 
 
 class ResultVideoManager:
@@ -23,11 +24,12 @@ class ResultVideoManager:
         )
 
     def fetch_result_videos(self, video_id: str):
+        # the results of preview jobs are not included
         result = []
 
         result_video_data_list = self.__db_connection.select_all(
-            "SELECT * FROM result_videos WHERE video_id=%(video_id)s ORDER BY created_at DESC",
-            {"video_id": video_id},
+            "SELECT * FROM result_videos WHERE video_id=%(video_id)s AND name IS DISTINCT FROM %(preview_name)s ORDER BY created_at DESC",
+            {"video_id": video_id, "preview_name": PREVIEW_RESULT_NAME},
         )
 
         for result_video_data in result_video_data_list:
@@ -35,11 +35,29 @@ class VideoManager:
         )
 
     def set_video_to_valid(self, id: str, video_info: dict):
+        # the content hash is set later by set_content_hash, NULL until then
         self.__db_connection.execute(
-            "UPDATE videos SET status=%(status)s, video_info=%(video_info)s WHERE id=%(id)s",
-            {"id": id, "status": "valid", "video_info": json.dumps(video_info)},
+            "UPDATE videos SET status=%(status)s, video_info=%(video_info)s, content_hash=NULL WHERE id=%(id)s",
+            {
+                "id": id,
+                "status": "valid",
+                "video_info": json.dumps(video_info),
+            },
         )
 
+    def set_content_hash(self, id: str, content_hash: str):
+        self.__db_connection.execute(
+            "UPDATE videos SET content_hash=%(content_hash)s WHERE id=%(id)s",
+            {"id": id, "content_hash": content_hash},
+        )
+
+    def fetch_content_hash(self, id: str):
+        result = self.__db_connection.select_all(
+            "SELECT content_hash FROM videos WHERE id=%(id)s", {"id": id}
+        )
+
+        return result[0][0] if result else None
+
     def fetch_all_results(self, video_id: str):
         result = []
 
@@ -1,3 +1,4 @@
+from typing import Optional
 from db.db_connection import DBConnection
 from db.model.worker import Worker
 import json
@@ -7,15 +8,41 @@ class WorkerManager:
     def __init__(self, db_connection: DBConnection):
         self.__db_connection = db_connection
 
-    def register_worker(self, id: str, type: str):
+    def register_worker(
+        self,
+        id: str,
+        type: str,
+        loaded_models: Optional[list[str]] = None,
+        capacity: int = 1,
+    ):
         self.__db_connection.execute(
-            "INSERT INTO workers (id, type, last_activity) VALUES (%(id)s, %(type)s, current_timestamp)",
+            "INSERT INTO workers (id, type, last_activity, loaded_models, capacity) VALUES (%(id)s, %(type)s, current_timestamp, %(loaded_models)s, %(capacity)s)",
             {
                 "id": id,
                 "type": type,
+                "loaded_models": json.dumps(loaded_models or []),
+                "capacity": capacity,
             },
         )
 
+    def update_worker_state(self, id: str, loaded_models: list[str], capacity: int):
+        self.__db_connection.execute(
+            "UPDATE workers SET loaded_models=%(loaded_models)s, capacity=%(capacity)s, last_activity=current_timestamp WHERE id=%(id)s",
+            {
+                "id": id,
+                "loaded_models": json.dumps(loaded_models),
+                "capacity": capacity,
+            },
+        )
+
+    def fetch_worker(self, id: str):
+        worker_data_list = self.__db_connection.select_all(
+            "SELECT * FROM workers WHERE id=%(id)s",
+            {"id": id},
+        )
+
+        return Worker(*worker_data_list[0]) if len(worker_data_list) > 0 else None
+
     def update_worker_activity(self, id: str):
         self.__db_connection.execute(
             "UPDATE workers SET last_activity=current_timestamp WHERE id=%(id)s",
@@ -42,6 +69,14 @@ class WorkerManager:
             },
         )
 
+    def fetch_active_worker_counts(self) -> dict:
+        # Returns the number of active workers of each type
+        worker_data_list = self.__db_connection.select_all(
+            "SELECT type, COUNT(*) FROM workers WHERE last_activity > NOW() - INTERVAL '3 MINUTES' GROUP BY type"
+        )
+
+        return {worker_type: count for worker_type, count in worker_data_list}
+
     def fetch_active_workers(self):
         result = []
 
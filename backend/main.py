@@ -6,6 +6,7 @@ import routers.workers_router as workers_router
 import routers.worker_router as worker_router
 import routers.results_router as results_router
 import routers.presets_router as presets_router
+import routers.metrics_router as metrics_router
 
 
 app = FastAPI()
@@ -27,3 +28,6 @@ app.include_router(results_router.router)
 
 # /presets
 app.include_router(presets_router.router)
+
+# /metrics
+app.include_router(metrics_router.router)
@@ -23,6 +23,12 @@ class RunParams(BaseModel):
     video_ids: list[str]
     result_video_id: str
     run_data: dict
+    bypass_cache: bool = False  # always run the job, even if an identical job finished before
+
+
+class FramePreviewParams(BaseModel):
+    timestamp: float  # position of the frame in seconds
+    run_data: dict
 
 
 class RequestVideoUploadParams(BaseModel):
@@ -38,6 +44,11 @@ class UpdateJobProgressParams(BaseModel):
     progress: int
 
 
+class JobStageTimingsParams(BaseModel):
+    # stage name -> {"count", "total_ms", "mean_ms", "max_ms"}
+    stage_timings: dict
+
+
 class CreatePresetParams(BaseModel):
     id: str
     name: str
@@ -54,3 +65,10 @@ class MpKinematicsType(str, Enum):
 
 class RegisterWorkerParams(BaseModel):
     type: str
+    loaded_models: list[str] = []
+    capacity: int = 1
+
+
+class WorkerHeartbeatParams(BaseModel):
+    loaded_models: list[str] = []
+    capacity: int = 1
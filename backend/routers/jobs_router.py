@@ -1,21 +1,89 @@
+import asyncio
+import json
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from models import RunParams
 from db.job_manager import JobManager
+from db.worker_manager import WorkerManager
 from db.db_connection import DBConnection
+from config import (
+    JOB_EVENTS_KEEPALIVE_SECONDS,
+    PREVIEW_FPS,
+    PREVIEW_MAX_RESOLUTION,
+    PREVIEW_MAX_FRAMES,
+    PREVIEW_JOB_PRIORITY,
+)
+from utils.job_events import job_events
+from utils.result_cache_utils import get_cache_stats
 
-job_manager = JobManager(DBConnection())
+db_connection = DBConnection()
+job_manager = JobManager(db_connection)
+worker_manager = WorkerManager(db_connection)
 
 router = APIRouter(
     prefix="/jobs",
 )
 
 
+def with_etas(jobs: list) -> list:
+    # Adds the estimated seconds until each open or running job is finished
+    if any(job.status in ("open", "running") for job in jobs):
+        etas = job_manager.fetch_job_etas(worker_manager.fetch_active_worker_counts())
+    else:
+        # finished and failed jobs have no ETA, e.g. most polls of the delta feed
+        etas = {}
+
+    return [{**asdict(job), "eta": etas.get(job.id)} for job in jobs]
+
+
 @router.get("")
 def fetch_jobs():
     jobs = job_manager.fetch_jobs()
 
-    return {"jobs": jobs}
+    return {"jobs": with_etas(jobs)}
+
+
+@router.get("/changes")
+def fetch_job_changes(since: Optional[datetime] = None):
+    # Lean delta feed for the job list, pass the returned cursor as since on the next call
+    jobs = job_manager.fetch_job_changes(since)
+    cursor = max([job.updated_at for job in jobs], default=since)
+
+    return {"jobs": with_etas(jobs), "cursor": cursor}
+
+
+@router.get("/events")
+async def stream_job_events(request: Request):
+    # Server-sent events stream of job progress and status changes
+    queue = job_events.subscribe()
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=JOB_EVENTS_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield f"event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        finally:
+            job_events.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/create")
@@ -26,4 +94,32 @@ def create_job(run_params: RunParams):
         run_params.result_video_id,
         run_params.run_data,
         "basic_masking",
+        run_params.bypass_cache,
+    )
+
+
+@router.post("/create-preview")
+def create_preview_job(run_params: RunParams):
+    # Runs the settings on a few sampled, downscaled frames, handed out before full jobs
+    run_data = {
+        **run_params.run_data,
+        "preview": {
+            "fps": PREVIEW_FPS,
+            "maxResolution": PREVIEW_MAX_RESOLUTION,
+            "maxFrames": PREVIEW_MAX_FRAMES,
+        },
+    }
+    job_manager.create_new_jobs(
+        run_params.id,
+        run_params.video_ids,
+        run_params.result_video_id,
+        run_data,
+        "basic_masking",
+        run_params.bypass_cache,
+        PREVIEW_JOB_PRIORITY,
     )
+
+
+@router.get("/cache/stats")
+def fetch_result_cache_stats():
+    return get_cache_stats()
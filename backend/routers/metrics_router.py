@@ -0,0 +1,44 @@
+from collections import Counter
+
+from fastapi import APIRouter, Response
+
+from db.job_manager import JobManager
+from db.worker_manager import WorkerManager
+from db.db_connection import DBConnection
+from utils.metrics import metrics_registry
+
+db_connection = DBConnection()
+job_manager = JobManager(db_connection)
+worker_manager = WorkerManager(db_connection)
+
+
+def count_active_workers() -> dict:
+    worker_counts = Counter(
+        worker.type for worker in worker_manager.fetch_active_workers()
+    )
+    return {(worker_type,): count for worker_type, count in worker_counts.items()}
+
+
+# Computed from the database whenever the metrics are scraped
+metrics_registry.gauge(
+    "jobs_queued",
+    "Number of open and running jobs",
+    ("type", "status"),
+    collect=job_manager.count_jobs_by_type_and_status,
+)
+metrics_registry.gauge(
+    "workers_active",
+    "Number of workers with activity in the last three minutes",
+    ("type",),
+    collect=count_active_workers,
+)
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def fetch_metrics():
+    return Response(
+        content=metrics_registry.render(),
+        media_type=metrics_registry.content_type,
+    )
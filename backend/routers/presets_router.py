@@ -1,12 +1,12 @@
 import os
-import cv2
 
-from fastapi import APIRouter, Request, Response
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response
 from models import CreatePresetParams
 from db.preset_manager import PresetManager
 from db.db_connection import DBConnection
 from config import PRESETS_BASE_PATH, RESULT_BASE_PATH
-from utils.preview_image_utils import aspect_preserving_resize_and_crop
+from utils.request_utils import cached_file_response
+from utils.thumbnail_utils import generate_preview_image
 
 preset_manager = PresetManager(DBConnection())
 
@@ -23,7 +23,7 @@ def fetch_presets():
 
 
 @router.post("/create")
-def create_preset(params: CreatePresetParams):
+def create_preset(params: CreatePresetParams, background_tasks: BackgroundTasks):
     preset_manager.create_new_preset(
         params.id,
         params.name,
@@ -38,15 +38,10 @@ def create_preset(params: CreatePresetParams):
             status_code=400, detail="A result video with this name does not exist"
         )
 
-    capture = cv2.VideoCapture(video_path)
-
-    frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
-    capture.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count / 2))
-    _, frame = capture.read()
-    preview_image = aspect_preserving_resize_and_crop(frame, 300, 300)
-
     preview_image_path = os.path.join(PRESETS_BASE_PATH, params.id + ".jpg")
-    cv2.imwrite(preview_image_path, preview_image)
+    background_tasks.add_task(
+        generate_preview_image, video_path, preview_image_path, 300, 300
+    )
 
 
 @router.post("/{preset_id}/delete")
@@ -59,14 +54,10 @@ def delete_preset(preset_id: str):
 
 
 @router.get("/{preset_id}/preview")
-def get_preview_for_preset(preset_id: str):
+def get_preview_for_preset(preset_id: str, request: Request):
     image_path = os.path.join(PRESETS_BASE_PATH, preset_id + ".jpg")
 
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Preview Image not found")
 
-    with open(image_path, "rb") as f:
-        image_content = f.read()
-        f.close()
-
-    return Response(content=image_content, media_type="image/jpeg")
+    return cached_file_response(request, image_path, "image/jpeg")
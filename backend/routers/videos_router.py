@@ -1,15 +1,28 @@
 import os
-import cv2
 
-from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Request, Response, HTTPException
 from fastapi.responses import FileResponse
 
 from config import RESULT_BASE_PATH, VIDEOS_BASE_PATH
-from utils.request_utils import range_requests_response
-from utils.preview_image_utils import aspect_preserving_resize_and_crop
-from utils.video_utils import extract_video_info_from_capture
+from utils.request_utils import range_requests_response, cached_file_response
+from utils.thumbnail_utils import (
+    generate_thumbnails,
+    get_thumbnail_path,
+    has_fresh_thumbnails,
+    read_manifest,
+)
+from utils.video_utils import get_video_metadata
+from utils.video_probe import compute_content_hash
+from utils.frame_preview_utils import (
+    compute_frame_preview_key,
+    get_frame_preview_path,
+    extract_frame,
+    render_frame_preview,
+    store_frame_preview,
+)
 from models import (
     RunParams,
+    FramePreviewParams,
     RequestVideoUploadParams,
     FinalizeVideoUploadParams,
     MpKinematicsType,
@@ -59,17 +72,87 @@ def download_video(video_id):
 
 
 @router.get("/{video_id}/preview")
-def get_preview_for_video(video_id: str):
+def get_preview_for_video(video_id: str, request: Request):
     image_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".jpg")
 
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Preview Image not found")
 
-    with open(image_path, "rb") as f:
-        image_content = f.read()
-        f.close()
+    return cached_file_response(request, image_path, "image/jpeg")
+
+
+@router.get("/{video_id}/thumbnails")
+def get_thumbnail_manifest(
+    video_id: str, background_tasks: BackgroundTasks, response: Response
+):
+    video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    if not has_fresh_thumbnails(video_id, video_path):
+        # (re-)generate missing or outdated thumbnails outside of the request
+        schedule_thumbnail_generation(background_tasks, video_id, video_path)
+        response.status_code = 202
+        return {"status": "pending"}
+
+    return {"status": "ready", "manifest": read_manifest(video_id)}
+
+
+@router.get("/{video_id}/thumbnails/{name}")
+def get_thumbnail(video_id: str, name: str, request: Request):
+    try:
+        image_path = get_thumbnail_path(video_id, name)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown thumbnail size")
+
+    if not os.path.exists(image_path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    return cached_file_response(request, image_path, "image/jpeg")
 
-    return Response(content=image_content, media_type="image/jpeg")
+
+@router.post("/{video_id}/frame-preview")
+def render_frame_preview_for_video(video_id: str, params: FramePreviewParams):
+    # Renders the hiding and masking of run_data on a single frame, cached by frame and params
+    cache_key = compute_frame_preview_key(video_id, params.timestamp, params.run_data)
+    image_path = get_frame_preview_path(cache_key)
+
+    if os.path.exists(image_path):
+        os.utime(image_path)  # marks the preview as recently used
+        return FileResponse(path=image_path, media_type="image/jpeg")
+
+    video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    frame = extract_frame(video_path, params.timestamp)
+    if frame is None:
+        raise HTTPException(status_code=400, detail="No frame at the given timestamp")
+
+    try:
+        image = render_frame_preview(frame, params.run_data)
+    except Exception as error:
+        print("Rendering frame preview failed")
+        print(error)
+        raise HTTPException(status_code=502, detail="Frame preview worker failed")
+
+    store_frame_preview(cache_key, image)
+    return Response(content=image, media_type="image/jpeg")
+
+
+def schedule_thumbnail_generation(
+    background_tasks: BackgroundTasks, video_id: str, video_path: str
+):
+    video_preview_image_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".jpg")
+    background_tasks.add_task(
+        generate_thumbnails, video_id, video_path, video_preview_image_path
+    )
+
+
+def store_content_hash(video_id: str, video_path: str):
+    # reads the whole video, a missing hash only makes the result cache miss meanwhile
+    video_manager.set_content_hash(video_id, compute_content_hash(video_path))
 
 
 @router.post("/upload/request")
@@ -85,7 +168,9 @@ def request_video_upload(params: RequestVideoUploadParams):
 
 
 @router.post("/upload/finalize")
-def finalize_video_upload(params: FinalizeVideoUploadParams):
+def finalize_video_upload(
+    params: FinalizeVideoUploadParams, background_tasks: BackgroundTasks
+):
     video_path = os.path.join(VIDEOS_BASE_PATH, params.video_id + ".mp4")
 
     if not os.path.exists(video_path):
@@ -93,23 +178,13 @@ def finalize_video_upload(params: FinalizeVideoUploadParams):
             status_code=400, detail="A video with this name does not exist"
         )
 
-    capture = cv2.VideoCapture(video_path)
-
-    frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
-    video_preview_image_path = os.path.join(VIDEOS_BASE_PATH, params.video_id + ".jpg")
-    capture.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count / 2))
-    _, frame = capture.read()
-    preview_image = aspect_preserving_resize_and_crop(frame, 80, 60)
-    cv2.imwrite(video_preview_image_path, preview_image)
+    video_info = get_video_metadata(video_path)
+    video_info.pop("frame_timestamps")
 
-    video_info = extract_video_info_from_capture(video_path, capture)
+    video_manager.set_video_to_valid(params.video_id, video_info)
 
-    capture.release()
-
-    video_manager.set_video_to_valid(
-        params.video_id,
-        video_info,
-    )
+    background_tasks.add_task(store_content_hash, params.video_id, video_path)
+    schedule_thumbnail_generation(background_tasks, params.video_id, video_path)
 
     return {}
 
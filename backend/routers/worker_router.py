@@ -1,10 +1,18 @@
 import os
 import uuid
-import cv2
-
-from fastapi import APIRouter, Request
-
-from models import RunParams, MpKinematicsType, UpdateJobProgressParams, RegisterWorkerParams
+import tarfile
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from models import (
+    RunParams,
+    MpKinematicsType,
+    UpdateJobProgressParams,
+    JobStageTimingsParams,
+    RegisterWorkerParams,
+    WorkerHeartbeatParams,
+)
 from db.job_manager import JobManager
 from db.worker_manager import WorkerManager
 from db.video_manager import VideoManager
@@ -14,9 +22,21 @@ from db.result_blendshapes_manager import ResultBlendshapesManager
 from db.result_audio_files_manager import ResultAudioFilesManager
 from db.result_extra_files_manager import ResultExtraFilesManager
 from db.db_connection import DBConnection
-from config import RESULT_BASE_PATH, VIDEOS_BASE_PATH
-from utils.request_utils import range_requests_response
-from utils.video_utils import extract_video_info_from_capture
+from config import (
+    RESULT_BASE_PATH,
+    VIDEOS_BASE_PATH,
+    JOB_CLAIM_MAX_WAIT_SECONDS,
+    PREVIEW_RESULT_NAME,
+)
+from utils.request_utils import range_requests_response, compute_file_etag
+from utils.video_utils import extract_video_info, get_video_metadata
+from utils.result_bundle import (
+    spool_request_body,
+    read_manifest,
+    extract_bundle_file,
+    read_bundle_bytes,
+    read_bundle_text,
+)
 
 db_connection = DBConnection()
 video_manager = VideoManager(db_connection)
@@ -35,12 +55,24 @@ router = APIRouter(
 
 @router.post("/register")
 def register_worker(worker_id: str, params: RegisterWorkerParams):
-    worker_manager.register_worker(worker_id, params.type)
+    worker_manager.register_worker(
+        worker_id, params.type, params.loaded_models, params.capacity
+    )
+
+
+@router.post("/heartbeat")
+def worker_heartbeat(worker_id: str, params: WorkerHeartbeatParams):
+    worker_manager.update_worker_state(worker_id, params.loaded_models, params.capacity)
 
 
 @router.get("/jobs/next/{job_type}")
-def fetch_next_job(job_type: str, worker_id: str):
-    job = job_manager.fetch_next_job(job_type)
+def fetch_next_job(job_type: str, worker_id: str, wait: float = 0):
+    # with wait (in seconds), the request returns as soon as a job is opened
+    worker = worker_manager.fetch_worker(worker_id)
+    loaded_models = worker.loaded_models if worker else []
+    job = job_manager.wait_for_next_job(
+        job_type, loaded_models, min(wait, JOB_CLAIM_MAX_WAIT_SECONDS)
+    )
 
     if job:
         worker_manager.set_worker_job(worker_id, job.id)
@@ -58,6 +90,7 @@ def create_job(job_type: str, run_params: RunParams):
         run_params.result_video_id,
         run_params.run_data,
         job_type,
+        run_params.bypass_cache,
     )
 
 
@@ -67,6 +100,17 @@ def update_job_progress(worker_id: str, job_id: str, params: UpdateJobProgressPa
     job_manager.update_job_progress(job_id, params.progress)
 
 
+@router.post("/jobs/{job_id}/stage-timings")
+def set_job_stage_timings(worker_id: str, job_id: str, params: JobStageTimingsParams):
+    job_manager.set_job_stage_timings(job_id, params.stage_timings)
+
+
+@router.post("/jobs/{job_id}/start")
+def start_job(worker_id: str, job_id: str):
+    job_manager.mark_job_as_started(job_id)
+    worker_manager.set_worker_job(worker_id, job_id)
+
+
 @router.post("/jobs/{job_id}/finish")
 def finish_job(worker_id: str, job_id: str):
     job_manager.mark_job_as_finished(job_id)
@@ -79,15 +123,53 @@ def fail_job(worker_id: str, job_id: str):
     worker_manager.remove_worker_job(worker_id, job_id)
 
 
+def get_video_etag(video_id: str, video_path: str) -> str:
+    # the content hash identifies the video across uploads, older videos have none
+    content_hash = video_manager.fetch_content_hash(video_id)
+    if content_hash:
+        return '"' + content_hash + '"'
+    return compute_file_etag(video_path)
+
+
 @router.get("/videos/{video_id}")
 def get_video_stream(worker_id: str, video_id: str, request: Request):
     video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
 
     return range_requests_response(
-        request, file_path=video_path, content_type="video/mp4"
+        request,
+        file_path=video_path,
+        content_type="video/mp4",
+        etag=get_video_etag(video_id, video_path),
+    )
+
+
+@router.head("/videos/{video_id}")
+def get_video_etag_for_worker(worker_id: str, video_id: str):
+    # lets workers check their cached copy of the video without downloading it
+    video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    return Response(
+        headers={
+            "etag": get_video_etag(video_id, video_path),
+            "content-length": str(os.path.getsize(video_path)),
+        }
     )
 
 
+@router.get("/videos/{video_id}/metadata")
+def get_video_metadata_for_worker(worker_id: str, video_id: str):
+    video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+
+    if not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    # the workers key their stored masks and landmarks of the video by the ETag
+    return {**get_video_metadata(video_path), "etag": get_video_etag(video_id, video_path)}
+
+
 @router.get("/jobs/{job_id}/status")
 def get_job_status(worker_id: str, job_id: str):
     return {"status": job_manager.get_job_status(job_id)}
@@ -122,15 +204,112 @@ async def upload_result_video(
 
     job = job_manager.fetch_job_by_result_video_id(result_video_id)
 
-    capture = cv2.VideoCapture(video_path)
-    video_info = extract_video_info_from_capture(video_path, capture)
-    capture.release()
+    video_info = extract_video_info(video_path)
 
     result_video_manager.create_result_video(
         result_video_id, video_id, job.id, "Result", video_info
     )
 
 
+def import_result_bundle(
+    bundle_path: str,
+    result_dir: str,
+    video_id: str,
+    result_video_id: str,
+    job_id: str,
+    written_paths: list,
+):
+    # blocking (file extraction, probing and the database), run in the threadpool
+    with tarfile.open(bundle_path, "r:") as bundle, db_connection.transaction() as transaction:
+        manifest = read_manifest(bundle)
+        for artifact in manifest["artifacts"]:
+            kind = artifact["kind"]
+            if kind == "video":
+                video_path = os.path.join(result_dir, result_video_id + ".mp4")
+                extract_bundle_file(bundle, artifact["name"], video_path)
+                written_paths.append(video_path)
+                video_info = manifest.get("video_info") or extract_video_info(
+                    video_path
+                )
+                name = PREVIEW_RESULT_NAME if manifest.get("preview") else "Result"
+                ResultVideoManager(transaction).create_result_video(
+                    result_video_id, video_id, job_id, name, video_info
+                )
+            elif kind == "preview":
+                image_path = os.path.join(result_dir, result_video_id + ".png")
+                extract_bundle_file(bundle, artifact["name"], image_path)
+                written_paths.append(image_path)
+            elif kind == "kinematics":
+                ResultMpKinematicsManager(transaction).create_result_mp_kinematics_entry(
+                    str(uuid.uuid4()),
+                    result_video_id,
+                    video_id,
+                    job_id,
+                    MpKinematicsType(artifact["type"]).value,
+                    read_bundle_text(bundle, artifact["name"]),
+                )
+            elif kind == "blendshapes":
+                ResultBlendshapesManager(transaction).create_result_mp_kinematics_entry(
+                    str(uuid.uuid4()),
+                    result_video_id,
+                    video_id,
+                    job_id,
+                    read_bundle_text(bundle, artifact["name"]),
+                )
+            elif kind == "audio":
+                ResultAudioFilesManager(transaction).create_result_audio_files_entry(
+                    str(uuid.uuid4()),
+                    result_video_id,
+                    video_id,
+                    job_id,
+                    read_bundle_bytes(bundle, artifact["name"]),
+                )
+
+
+@router.post("/videos/{video_id}/results/{result_video_id}/bundle")
+async def upload_result_bundle(
+    worker_id: str, video_id: str, result_video_id: str, request: Request
+):
+    """
+    All results of a job as one tar stream (manifest.json and the artifacts it lists).
+    The database entries are created in one transaction, the files are only kept if
+    it succeeds. JSON results are stored as sent and the video info computed by the
+    worker is used, the result video is only probed if it is missing.
+    """
+    job_id = await run_in_threadpool(
+        job_manager.fetch_job_id_by_result_video_id, result_video_id
+    )
+    if job_id is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    result_dir = os.path.join(RESULT_BASE_PATH, video_id)
+    if not os.path.exists(result_dir):
+        os.mkdir(result_dir)
+
+    bundle_path = os.path.join(result_dir, result_video_id + ".bundle.tar")
+    written_paths = []
+    try:
+        await spool_request_body(request, bundle_path)
+        # the import must not block the event loop, e.g. the job event streams
+        await run_in_threadpool(
+            import_result_bundle,
+            bundle_path,
+            result_dir,
+            video_id,
+            result_video_id,
+            job_id,
+            written_paths,
+        )
+    except Exception:
+        for path in written_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    finally:
+        if os.path.exists(bundle_path):
+            os.remove(bundle_path)
+
+
 @router.post("/videos/{video_id}/results/{result_video_id}/preview")
 async def upload_result_video_preview_image(
     worker_id: str, video_id: str, result_video_id: str, request: Request
@@ -0,0 +1,97 @@
+import os
+import base64
+import hashlib
+import subprocess
+
+import requests
+
+from config import (
+    FRAME_PREVIEW_WORKER_URL,
+    FRAME_PREVIEW_TIMEOUT_SECONDS,
+    FRAME_PREVIEWS_BASE_PATH,
+    FRAME_PREVIEW_CACHE_MAX_BYTES,
+)
+from utils.result_cache_utils import normalize_run_data
+
+
+def compute_frame_preview_key(video_id: str, timestamp: float, run_data: dict) -> str:
+    # Original videos never change, so the frame is identified by video and timestamp
+    cache_key = hashlib.sha256()
+    for value in [video_id, f"{timestamp:.3f}", normalize_run_data(run_data)]:
+        cache_key.update(value.encode("utf-8"))
+        cache_key.update(b"\0")
+    return cache_key.hexdigest()
+
+
+def get_frame_preview_path(cache_key: str) -> str:
+    return os.path.join(FRAME_PREVIEWS_BASE_PATH, cache_key + ".jpg")
+
+
+def extract_frame(video_path: str, timestamp: float) -> bytes:
+    """
+    Decodes the frame at the given timestamp (in seconds) and returns it PNG encoded.
+    Unlike thumbnail_utils.extract_keyframe the seek is accurate, so the frame shown in
+    the player is the one that is rendered.
+    """
+    res = subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-ss",
+            f"{max(timestamp, 0.0):.3f}",
+            "-i",
+            video_path,
+            "-frames:v",
+            "1",
+            "-f",
+            "image2pipe",
+            "-vcodec",
+            "png",
+            "-",
+        ],
+        capture_output=True,
+    )
+    if res.returncode != 0 or not res.stdout:
+        return None
+    return res.stdout
+
+
+def render_frame_preview(frame: bytes, run_data: dict) -> bytes:
+    # Renders the frame with the warm models of the frame preview worker, returns a JPEG
+    response = requests.post(
+        FRAME_PREVIEW_WORKER_URL + "/render",
+        json={"frame": base64.b64encode(frame).decode("ascii"), "run_data": run_data},
+        timeout=FRAME_PREVIEW_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    return response.content
+
+
+def store_frame_preview(cache_key: str, image: bytes):
+    os.makedirs(FRAME_PREVIEWS_BASE_PATH, exist_ok=True)
+    path = get_frame_preview_path(cache_key)
+    # write to a temporary file first, so readers never see partially written images
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+    prune_frame_previews()
+
+
+def prune_frame_previews():
+    # Removes the least recently used previews once they exceed FRAME_PREVIEW_CACHE_MAX_BYTES
+    previews = []
+    for file_name in os.listdir(FRAME_PREVIEWS_BASE_PATH):
+        if file_name.endswith(".jpg"):
+            stat = os.stat(os.path.join(FRAME_PREVIEWS_BASE_PATH, file_name))
+            previews.append(
+                (stat.st_mtime, stat.st_size, os.path.join(FRAME_PREVIEWS_BASE_PATH, file_name))
+            )
+
+    total_size = sum(size for _, size, _ in previews)
+    for _, size, path in sorted(previews):
+        if total_size <= FRAME_PREVIEW_CACHE_MAX_BYTES:
+            break
+        os.remove(path)
+        total_size -= size
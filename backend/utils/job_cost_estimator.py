@@ -0,0 +1,192 @@
+import threading
+
+from config import (
+    JOB_COST_DEFAULT_SECONDS_PER_UNIT,
+    JOB_COST_OVERHEAD_SECONDS,
+    JOB_COST_CALIBRATION_WEIGHT,
+)
+from utils.model_requirements import (
+    get_required_models,
+    MEDIAPIPE_POSE_MODEL,
+    MEDIAPIPE_HAND_MODEL,
+    MEDIAPIPE_FACE_MODEL,
+    YOLO_BODY_MODEL,
+    YOLO_FACE_MODEL,
+    YOLO_SEGMENTATION_MODEL,
+)
+
+# Relative per frame cost (per megapixel) of the models and strategies of a job,
+# the absolute scale is calibrated from the measured durations of finished jobs
+BASE_FRAME_WEIGHT = 1.0  # decoding, hiding and encoding
+MODEL_WEIGHTS = {
+    MEDIAPIPE_POSE_MODEL: 2.0,
+    MEDIAPIPE_HAND_MODEL: 0.5,
+    MEDIAPIPE_FACE_MODEL: 1.0,
+    YOLO_BODY_MODEL: 1.5,
+    YOLO_FACE_MODEL: 1.5,
+    YOLO_SEGMENTATION_MODEL: 2.0,
+}
+STRATEGY_WEIGHTS = {
+    "inpaint": 8.0,
+    "roop": 6.0,
+    "blender": 10.0,
+}
+AUDIO_SECONDS_WEIGHT = 1.0  # voice conversion, per second of audio
+
+DEFAULT_FRAME_COUNT = 30 * 60
+DEFAULT_MEGAPIXELS = 0.9
+
+
+def get_frame_units(video_info: dict) -> float:
+    # frames x megapixels of a video, the main driver of the processing time
+    video_info = video_info or {}
+    frame_count = video_info.get("frame_count")
+    if not frame_count:
+        frame_count = video_info.get("duration", 0) * video_info.get("fps", 0)
+    frame_count = frame_count or DEFAULT_FRAME_COUNT
+
+    megapixels = (
+        video_info.get("frame_width", 0) * video_info.get("frame_height", 0) / 1e6
+    )
+    return frame_count * (megapixels or DEFAULT_MEGAPIXELS)
+
+
+def get_preview_frame_units(video_info: dict, preview_params: dict) -> float:
+    # frames x megapixels actually processed by a preview job
+    video_info = video_info or {}
+    frame_count = video_info.get("duration", 0) * preview_params.get("fps", 1)
+    frame_count = min(max(frame_count, 1), preview_params.get("maxFrames", frame_count))
+
+    width = video_info.get("frame_width", 0)
+    height = video_info.get("frame_height", 0)
+    megapixels = width * height / 1e6 or DEFAULT_MEGAPIXELS
+    max_resolution = preview_params.get("maxResolution")
+    if max_resolution and max(width, height) > max_resolution:
+        megapixels *= (max_resolution / max(width, height)) ** 2
+    return frame_count * megapixels
+
+
+def get_strategy_weight(job_type: str, run_data: dict) -> float:
+    weight = STRATEGY_WEIGHTS.get(job_type, 0.0)
+
+    for part_params in run_data.get("videoMasking", {}).values():
+        hiding_key = part_params.get("hidingStrategy", {}).get("key")
+        weight += STRATEGY_WEIGHTS.get(hiding_key, 0.0)
+        masking_strategy = part_params.get("maskingStrategy", {})
+        masking_model = masking_strategy.get("params", {}).get("maskingModel")
+        if masking_strategy.get("key", "none") != "none":
+            weight += STRATEGY_WEIGHTS.get(masking_model, 0.0)
+
+    if run_data.get("threeDModelCreation", {}).get("blender"):
+        weight += STRATEGY_WEIGHTS["blender"]
+
+    return weight
+
+
+class JobCostEstimator:
+    """
+    Estimates the processing time of a job from its video and run params.
+
+    The cost of a job is expressed in units of frames x megapixels x relative model and
+    strategy weights. The seconds per unit are calibrated per job type with an
+    exponentially weighted average over the measured durations of finished jobs.
+    """
+
+    def __init__(self, default_seconds_per_unit: float, overhead_seconds: float, calibration_weight: float):
+        self.default_seconds_per_unit = default_seconds_per_unit
+        self.overhead_seconds = overhead_seconds
+        self.calibration_weight = calibration_weight
+        self.is_calibrated = False
+        self.__seconds_per_unit = {}
+        self.__lock = threading.Lock()
+
+    def get_cost_units(self, job_type: str, run_data: dict, video_info: dict) -> float:
+        run_data = run_data or {}
+        weight = BASE_FRAME_WEIGHT
+        for model in get_required_models(run_data):
+            weight += MODEL_WEIGHTS.get(model, 0.0)
+
+        if "preview" in run_data:
+            # preview jobs skip inpainting, audio and docker sub jobs
+            return get_preview_frame_units(video_info, run_data["preview"]) * weight
+
+        weight += get_strategy_weight(job_type, run_data)
+        cost_units = get_frame_units(video_info) * weight
+
+        voice_masking = run_data.get("voiceMasking", {}).get("maskingStrategy", {})
+        if voice_masking.get("key") not in [None, "none", "preserve", "remove"]:
+            cost_units += (video_info or {}).get("duration", 0) * AUDIO_SECONDS_WEIGHT
+
+        return cost_units
+
+    def get_seconds_per_unit(self, job_type: str) -> float:
+        with self.__lock:
+            return self.__seconds_per_unit.get(job_type, self.default_seconds_per_unit)
+
+    def estimate_duration(self, job_type: str, run_data: dict, video_info: dict) -> float:
+        # Returns the estimated processing time of a job in seconds
+        cost_units = self.get_cost_units(job_type, run_data, video_info)
+        return self.overhead_seconds + cost_units * self.get_seconds_per_unit(job_type)
+
+    def observe(self, job_type: str, run_data: dict, video_info: dict, duration: float):
+        # Calibrates the estimator with the measured duration (in seconds) of a finished job
+        cost_units = self.get_cost_units(job_type, run_data, video_info)
+        if cost_units <= 0 or duration <= 0:
+            return
+
+        measured = max(duration - self.overhead_seconds, 0.0) / cost_units
+        with self.__lock:
+            current = self.__seconds_per_unit.get(job_type)
+            if current is None:
+                self.__seconds_per_unit[job_type] = measured
+            else:
+                self.__seconds_per_unit[job_type] = (
+                    1 - self.calibration_weight
+                ) * current + self.calibration_weight * measured
+
+    def calibrate(self, finished_jobs: list):
+        # finished_jobs are (type, run_data, video_info, duration in seconds) tuples, oldest first
+        for job_type, run_data, video_info, duration in finished_jobs:
+            self.observe(job_type, run_data, video_info, duration)
+        self.is_calibrated = True
+
+
+def estimate_remaining_duration(job, elapsed_seconds: float) -> float:
+    # remaining time of a running job, extrapolated from its progress once it reported some
+    estimated_duration = job.estimated_duration or 0.0
+    if job.progress >= 10 and elapsed_seconds > 0:
+        return elapsed_seconds * (100 - job.progress) / job.progress
+    return max(estimated_duration - elapsed_seconds, 0.0)
+
+
+def compute_etas(running_jobs: list, open_jobs: list, worker_count: int) -> dict:
+    """
+    Returns the estimated seconds until each open or running job is finished.
+
+    Args:
+        running_jobs (list): (job, elapsed seconds) pairs of the running jobs.
+        open_jobs (list): Open jobs in the order they will be handed out.
+        worker_count (int): Number of workers processing these jobs.
+    """
+    etas = {}
+    worker_free_at = [0.0] * max(worker_count, 1)
+
+    for job, elapsed_seconds in running_jobs:
+        remaining = estimate_remaining_duration(job, elapsed_seconds)
+        etas[job.id] = remaining
+        index = worker_free_at.index(min(worker_free_at))
+        worker_free_at[index] += remaining
+
+    for job in open_jobs:
+        index = worker_free_at.index(min(worker_free_at))
+        worker_free_at[index] += job.estimated_duration or 0.0
+        etas[job.id] = worker_free_at[index]
+
+    return etas
+
+
+job_cost_estimator = JobCostEstimator(
+    JOB_COST_DEFAULT_SECONDS_PER_UNIT,
+    JOB_COST_OVERHEAD_SECONDS,
+    JOB_COST_CALIBRATION_WEIGHT,
+)
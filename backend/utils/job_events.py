@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+from config import JOB_EVENTS_QUEUE_SIZE
+
+
+class JobEventBus:
+    """
+    In-process publish / subscribe for job progress and status changes.
+
+    Events are published from the (threadpool) request handlers that update jobs and
+    delivered to the asyncio queues of the connected event stream clients. A client
+    that does not keep up gets its queue replaced by a single 'resync' event and is
+    expected to fetch the job changes since its last cursor.
+    """
+
+    def __init__(self, max_queue_size: int):
+        self.__max_queue_size = max_queue_size
+        self.__subscribers = {}
+        self.__lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        # has to be called from the event loop that consumes the queue
+        queue = asyncio.Queue(maxsize=self.__max_queue_size)
+        with self.__lock:
+            self.__subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self.__lock:
+            self.__subscribers.pop(queue, None)
+
+    def publish(self, event: dict):
+        with self.__lock:
+            subscribers = list(self.__subscribers.items())
+
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.__deliver, queue, event)
+            except RuntimeError:
+                # event loop already closed
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def __deliver(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+
+
+job_events = JobEventBus(JOB_EVENTS_QUEUE_SIZE)
+
+
+class OpenJobSignal:
+    """
+    Wakes up the requests of idle workers that wait for a job (see
+    JobManager.wait_for_next_job) when jobs are opened, so a new job, e.g. a preview,
+    is claimed right away instead of on the next poll of a worker.
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__generation = 0
+
+    def get_generation(self) -> int:
+        with self.__condition:
+            return self.__generation
+
+    def notify(self):
+        with self.__condition:
+            self.__generation += 1
+            self.__condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        # False if no job was opened since get_generation returned generation
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: self.__generation != generation, timeout
+            )
+
+
+open_job_signal = OpenJobSignal()
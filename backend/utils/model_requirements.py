@@ -0,0 +1,60 @@
+# Model files (as advertised by the workers) used by the basic_masking pipeline
+MEDIAPIPE_POSE_MODEL = "pose_landmarker_heavy.task"
+MEDIAPIPE_HAND_MODEL = "hand_landmarker.task"
+MEDIAPIPE_FACE_MODEL = "face_landmarker.task"
+YOLO_BODY_MODEL = "yolov8n.pt"
+YOLO_FACE_MODEL = "yolov8n-face.pt"
+YOLO_SEGMENTATION_MODEL = "yolov8n-seg.pt"
+
+
+def get_required_models(run_data: dict) -> set:
+    """
+    Returns the model files the detectors and mask extractors of a job will load,
+    mirroring how the worker pipeline derives them from the run params.
+    """
+    required_models = set()
+
+    video_masking = run_data.get("videoMasking", {})
+    for part_name, part_params in video_masking.items():
+        hiding_strategy = part_params.get("hidingStrategy", {})
+        hiding_key = hiding_strategy.get("key", "none")
+        if hiding_key == "inpaint":
+            required_models.add(MEDIAPIPE_POSE_MODEL)
+        elif hiding_key != "none":
+            hiding_settings = hiding_strategy.get("params", {})
+            detection_model = hiding_settings.get("detectionModel")
+            if detection_model == "mediapipe":
+                required_models.add(MEDIAPIPE_POSE_MODEL)
+            elif detection_model == "yolo":
+                required_models.add(YOLO_BODY_MODEL)
+                if hiding_settings.get("subjectDetection") == "silhouette":
+                    required_models.add(YOLO_SEGMENTATION_MODEL)
+                if part_name == "face":
+                    required_models.add(YOLO_FACE_MODEL)
+
+        masking_strategy = part_params.get("maskingStrategy", {})
+        masking_key = masking_strategy.get("key", "none")
+        masking_model = masking_strategy.get("params", {}).get("maskingModel")
+        if masking_key == "none" or masking_model != "mediapipe":
+            continue
+        if part_name == "body" or masking_key == "skeleton":
+            required_models.update([MEDIAPIPE_POSE_MODEL, MEDIAPIPE_HAND_MODEL])
+        if masking_key == "faceMesh":
+            required_models.add(MEDIAPIPE_FACE_MODEL)
+
+    params_3d = run_data.get("threeDModelCreation", {})
+    if params_3d.get("skeleton"):
+        required_models.update([MEDIAPIPE_POSE_MODEL, MEDIAPIPE_HAND_MODEL])
+    if params_3d.get("blendshapes"):
+        required_models.add(MEDIAPIPE_FACE_MODEL)
+
+    return required_models
+
+
+def get_model_affinity(run_data: dict, loaded_models: list[str]) -> float:
+    # Share of the required models of a job that a worker has loaded already
+    required_models = get_required_models(run_data)
+    if not required_models:
+        return 0.0
+
+    return len(required_models & set(loaded_models)) / len(required_models)
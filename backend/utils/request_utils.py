@@ -1,9 +1,10 @@
 import os
+import hashlib
 
 from typing import BinaryIO
 
-from fastapi import HTTPException, Request, status
-from fastapi.responses import StreamingResponse
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
 
 
 def send_bytes_range_requests(
@@ -39,7 +40,9 @@ def _get_range_header(range_header: str, file_size: int) -> tuple[int, int]:
     return start, end
 
 
-def range_requests_response(request: Request, file_path: str, content_type: str):
+def range_requests_response(
+    request: Request, file_path: str, content_type: str, etag: str = None
+):
     """Returns StreamingResponse using Range Requests of a given file"""
 
     file_size = os.stat(file_path).st_size
@@ -55,6 +58,8 @@ def range_requests_response(request: Request, file_path: str, content_type: str)
             "content-range, content-encoding"
         ),
     }
+    if etag is not None:
+        headers["etag"] = etag
     start = 0
     end = file_size - 1
     status_code = status.HTTP_200_OK
@@ -71,3 +76,27 @@ def range_requests_response(request: Request, file_path: str, content_type: str)
         headers=headers,
         status_code=status_code,
     )
+
+
+def compute_file_etag(file_path: str) -> str:
+    """Computes a cheap ETag from the size and modification time of a file"""
+    stat = os.stat(file_path)
+    digest = hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+    return '"' + digest + '"'
+
+
+def cached_file_response(
+    request: Request, file_path: str, media_type: str, max_age: int = 3600
+):
+    """Returns a FileResponse with ETag, or 304 if the client already has the file"""
+
+    etag = compute_file_etag(file_path)
+    headers = {
+        "etag": etag,
+        "cache-control": f"private, max-age={max_age}",
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return FileResponse(path=file_path, media_type=media_type, headers=headers)
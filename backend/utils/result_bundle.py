@@ -0,0 +1,51 @@
+import os
+import json
+import shutil
+import tarfile
+
+from fastapi import HTTPException, Request
+
+# see ResultBundle of the workers
+MANIFEST_NAME = "manifest.json"
+RESULT_KINDS = ["video", "preview", "kinematics", "blendshapes", "audio"]
+
+
+async def spool_request_body(request: Request, path: str) -> int:
+    # the bundle is written to disk as it arrives, it may be larger than the memory
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def read_manifest(bundle: tarfile.TarFile) -> dict:
+    try:
+        manifest = json.load(bundle.extractfile(MANIFEST_NAME))
+    except (KeyError, ValueError) as error:
+        raise HTTPException(status_code=400, detail=f"Invalid result bundle: {error}")
+
+    for artifact in manifest.get("artifacts", []):
+        if artifact.get("kind") not in RESULT_KINDS:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown result kind {artifact.get('kind')}"
+            )
+    return manifest
+
+
+def extract_bundle_file(bundle: tarfile.TarFile, name: str, path: str):
+    # streamed to a partial file, which replaces an existing file once complete
+    with bundle.extractfile(name) as source, open(path + ".partial", "wb") as target:
+        shutil.copyfileobj(source, target)
+    os.replace(path + ".partial", path)
+
+
+def read_bundle_bytes(bundle: tarfile.TarFile, name: str) -> bytes:
+    with bundle.extractfile(name) as f:
+        return f.read()
+
+
+def read_bundle_text(bundle: tarfile.TarFile, name: str) -> str:
+    # JSON results are stored as sent, the database validates them
+    return read_bundle_bytes(bundle, name).decode("utf-8")
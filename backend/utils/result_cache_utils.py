@@ -0,0 +1,38 @@
+import hashlib
+import json
+import threading
+
+# hit / miss counters of the result cache of this backend process
+_cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def normalize_run_data(run_data: dict) -> str:
+    # canonical json, so equal run params hash equally regardless of key order or whitespace
+    return json.dumps(run_data, sort_keys=True, separators=(",", ":"), ensure_ascii=True)
+
+
+def compute_cache_key(content_hash: str, job_type: str, run_data: dict) -> str:
+    if not content_hash:
+        return None
+
+    cache_key = hashlib.sha256()
+    for value in [job_type, content_hash, normalize_run_data(run_data)]:
+        cache_key.update(value.encode("utf-8"))
+        cache_key.update(b"\0")
+    return cache_key.hexdigest()
+
+
+def record_cache_lookup(outcome: str):
+    # outcome is one of hits, misses, bypassed
+    with _cache_stats_lock:
+        _cache_stats[outcome] += 1
+
+
+def get_cache_stats() -> dict:
+    with _cache_stats_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            **_cache_stats,
+            "hit_rate": _cache_stats["hits"] / lookups if lookups else 0.0,
+        }
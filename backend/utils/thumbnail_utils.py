@@ -0,0 +1,215 @@
+import os
+import json
+import math
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from config import THUMBNAILS_BASE_PATH
+from utils.preview_image_utils import aspect_preserving_resize_and_crop
+from utils.video_probe import probe_duration
+
+# name -> (width, height) of the thumbnails generated for every uploaded video
+THUMBNAIL_SIZES = {
+    "xs": (80, 60),
+    "sm": (160, 120),
+    "md": (320, 240),
+    "lg": (640, 360),
+}
+
+SPRITE_TILE_SIZE = (160, 90)
+SPRITE_COLUMNS = 10
+SPRITE_MAX_TILES = 100
+SPRITE_MIN_INTERVAL = 1.0  # seconds between two sprite tiles
+
+MANIFEST_FILE_NAME = "manifest.json"
+SPRITE_FILE_NAME = "sprite.jpg"
+
+_generation_lock = threading.Lock()
+_generations_in_progress = set()
+
+
+def get_thumbnail_dir(cache_key: str) -> str:
+    return os.path.join(THUMBNAILS_BASE_PATH, cache_key)
+
+
+def get_thumbnail_path(cache_key: str, name: str) -> str:
+    if name == "sprite":
+        return os.path.join(get_thumbnail_dir(cache_key), SPRITE_FILE_NAME)
+    if name not in THUMBNAIL_SIZES:
+        raise ValueError(f"Unknown thumbnail size {name}")
+    return os.path.join(get_thumbnail_dir(cache_key), name + ".jpg")
+
+
+def extract_keyframe(video_path: str, timestamp: float, max_width: int = None):
+    """
+    Decodes the keyframe at or before the given timestamp.
+
+    The input is seeked without accurate seeking and the decoder skips all
+    non-keyframes, so at most a single frame is decoded independent of the
+    GOP size of the video.
+
+    Args:
+        video_path (str): Path of the video to extract the frame from.
+        timestamp (float): Position in seconds.
+        max_width (int): If given, the frame is downscaled by ffmpeg to this width.
+
+    Returns:
+        np.array: The decoded BGR frame or None if no frame could be decoded.
+    """
+    command = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-skip_frame",
+        "nokey",
+        "-noaccurate_seek",
+        "-ss",
+        f"{max(timestamp, 0.0):.3f}",
+        "-i",
+        video_path,
+        "-frames:v",
+        "1",
+    ]
+    if max_width:
+        command += ["-vf", f"scale='min({max_width},iw)':-2"]
+    command += ["-f", "image2pipe", "-vcodec", "png", "-"]
+
+    res = subprocess.run(command, capture_output=True)
+    if res.returncode != 0 or not res.stdout:
+        return None
+
+    return cv2.imdecode(np.frombuffer(res.stdout, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _write_jpeg(path: str, image):
+    # write to a temporary file first, so readers never see partially written images
+    tmp_path = path + ".tmp.jpg"
+    cv2.imwrite(tmp_path, image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    os.replace(tmp_path, path)
+
+
+def _source_signature(video_path: str) -> dict:
+    stat = os.stat(video_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_manifest(cache_key: str):
+    manifest_path = os.path.join(get_thumbnail_dir(cache_key), MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def has_fresh_thumbnails(cache_key: str, video_path: str) -> bool:
+    manifest = read_manifest(cache_key)
+    if manifest is None or not os.path.exists(video_path):
+        return False
+
+    return manifest["source"] == _source_signature(video_path)
+
+
+def create_sprite(video_path: str, duration: float) -> tuple:
+    tile_count = max(
+        1, min(SPRITE_MAX_TILES, int(math.ceil(duration / SPRITE_MIN_INTERVAL)))
+    )
+    interval = duration / tile_count if duration > 0 else 0.0
+    rows = int(math.ceil(tile_count / SPRITE_COLUMNS))
+    columns = min(SPRITE_COLUMNS, tile_count)
+    tile_width, tile_height = SPRITE_TILE_SIZE
+
+    sprite = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    last_tile = None
+    for index in range(tile_count):
+        frame = extract_keyframe(video_path, index * interval, max_width=tile_width * 2)
+        if frame is not None:
+            last_tile = aspect_preserving_resize_and_crop(frame, tile_width, tile_height)
+        if last_tile is None:
+            continue
+
+        row, column = divmod(index, SPRITE_COLUMNS)
+        sprite[
+            row * tile_height : (row + 1) * tile_height,
+            column * tile_width : (column + 1) * tile_width,
+        ] = last_tile
+
+    geometry = {
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "columns": columns,
+        "rows": rows,
+        "tile_count": tile_count,
+        "interval": interval,
+    }
+    return sprite, geometry
+
+
+def generate_thumbnails(cache_key: str, video_path: str, legacy_preview_path: str = None):
+    """
+    Creates the multi-resolution thumbnail set and the scrub bar sprite sheet of a
+    video and stores them in the thumbnail cache. Meant to be run as a background
+    task, concurrent calls for the same cache key are dropped.
+    """
+    with _generation_lock:
+        if cache_key in _generations_in_progress:
+            return
+        _generations_in_progress.add(cache_key)
+
+    try:
+        if has_fresh_thumbnails(cache_key, video_path):
+            return
+
+        thumbnail_dir = get_thumbnail_dir(cache_key)
+        os.makedirs(thumbnail_dir, exist_ok=True)
+
+        duration = probe_duration(video_path)
+        frame = extract_keyframe(video_path, duration / 2)
+        if frame is None:
+            print(f"Could not extract a keyframe from {video_path}")
+            return
+
+        for name, (width, height) in THUMBNAIL_SIZES.items():
+            thumbnail = aspect_preserving_resize_and_crop(frame, width, height)
+            _write_jpeg(get_thumbnail_path(cache_key, name), thumbnail)
+
+        if legacy_preview_path:
+            _write_jpeg(
+                legacy_preview_path,
+                aspect_preserving_resize_and_crop(frame, *THUMBNAIL_SIZES["xs"]),
+            )
+
+        sprite, sprite_geometry = create_sprite(video_path, duration)
+        _write_jpeg(get_thumbnail_path(cache_key, "sprite"), sprite)
+
+        manifest = {
+            "source": _source_signature(video_path),
+            "duration": duration,
+            "sizes": {
+                name: {"width": width, "height": height}
+                for name, (width, height) in THUMBNAIL_SIZES.items()
+            },
+            "sprite": sprite_geometry,
+        }
+        manifest_path = os.path.join(thumbnail_dir, MANIFEST_FILE_NAME)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    finally:
+        with _generation_lock:
+            _generations_in_progress.discard(cache_key)
+
+
+def generate_preview_image(
+    video_path: str, preview_image_path: str, width: int, height: int
+):
+    # Writes a single preview image from the keyframe closest to the middle of the video
+    frame = extract_keyframe(video_path, probe_duration(video_path) / 2)
+    if frame is None:
+        print(f"Could not extract a keyframe from {video_path}")
+        return
+
+    _write_jpeg(preview_image_path, aspect_preserving_resize_and_crop(frame, width, height))
@@ -0,0 +1 @@
+../../shared/video_probe.py
\ No newline at end of file
@@ -1,33 +1,35 @@
-import cv2
 import os
+import json
 
+from utils.video_probe import probe_video
 
-def extract_codec_from_capture(capture) -> str:
-    h = int(capture.get(cv2.CAP_PROP_FOURCC))
 
-    codec = (
-            chr(h & 0xFF)
-            + chr((h >> 8) & 0xFF)
-            + chr((h >> 16) & 0xFF)
-            + chr((h >> 24) & 0xFF)
-    )
+def extract_video_info(video_path: str) -> dict:
+    video_info = probe_video(video_path)
+    video_info.pop("frame_timestamps")
+    return video_info
 
-    return codec
 
+def get_metadata_cache_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + ".metadata.json"
 
-def extract_video_info_from_capture(video_path: str, capture) -> dict:
-    frame_width = round(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = round(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = capture.get(cv2.CAP_PROP_FPS)
-    frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
-    duration = frame_count / fps
 
-    return {
-        'frame_width': frame_width,
-        'frame_height': frame_height,
-        'fps': round(fps),
-        'frame_count': round(frame_count),
-        'duration': duration,
-        'codec': extract_codec_from_capture(capture),
-        'size': os.path.getsize(video_path)
-    }
+def get_video_metadata(video_path: str) -> dict:
+    """
+    Returns the probed metadata of an uploaded video (incl. frame timestamps) and
+    caches it next to the video, so it only has to be computed once per video id.
+    """
+    cache_path = get_metadata_cache_path(video_path)
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            metadata = json.load(f)
+        if metadata["size"] == os.path.getsize(video_path):
+            return metadata
+
+    metadata = probe_video(video_path)
+    with open(cache_path + ".tmp", "w") as f:
+        json.dump(metadata, f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+    return metadata
@@ -56,7 +56,12 @@ CREATE TABLE public.jobs (
     created_at timestamp without time zone NOT NULL,
     started_at timestamp without time zone,
     finished_at timestamp without time zone,
-    progress integer DEFAULT 0 NOT NULL
+    progress integer DEFAULT 0 NOT NULL,
+    updated_at timestamp without time zone DEFAULT now() NOT NULL,
+    estimated_duration double precision,
+    cache_key character varying,
+    priority integer DEFAULT 0 NOT NULL,
+    stage_timings jsonb
 );
 
 
@@ -162,7 +167,8 @@ CREATE TABLE public.videos (
     id uuid NOT NULL,
     name character varying NOT NULL,
     status character varying NOT NULL,
-    video_info jsonb
+    video_info jsonb,
+    content_hash character varying
 );
 
 
@@ -176,7 +182,9 @@ CREATE TABLE public.workers (
     id uuid NOT NULL,
     job_id uuid,
     last_activity timestamp without time zone,
-    type character varying NOT NULL
+    type character varying NOT NULL,
+    loaded_models jsonb DEFAULT '[]'::jsonb NOT NULL,
+    capacity integer DEFAULT 1 NOT NULL
 );
 
 
@@ -262,6 +270,20 @@ ALTER TABLE ONLY public.workers
     ADD CONSTRAINT workers_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: jobs_updated_at_idx; Type: INDEX; Schema: public; Owner: dev
+--
+
+CREATE INDEX jobs_updated_at_idx ON public.jobs USING btree (updated_at);
+
+
+--
+-- Name: jobs_cache_key_idx; Type: INDEX; Schema: public; Owner: dev
+--
+
+CREATE INDEX jobs_cache_key_idx ON public.jobs USING btree (cache_key);
+
+
 --
 -- PostgreSQL database dump complete
 --
@@ -3,6 +3,7 @@ import Config from "../config";
 import {
     ApiFetchAllResultsResponse,
     ApiFetchDownloadableResultFilesResponse,
+    ApiFetchJobChangesResponse,
     ApiFetchJobsResponse, ApiFetchPresetsResponse,
     ApiFetchResultVideosResponse,
     ApiFetchVideosResponse, ApiFetchWorkersResponse
@@ -75,6 +76,15 @@ const Api = {
 
         return result.data;
     },
+    fetchJobChanges: async (since: string | null): Promise<ApiFetchJobChangesResponse> => {
+        const result = await sendApiRequest({
+            url: 'jobs/changes',
+            method: 'get',
+            params: since ? { since } : {},
+        });
+
+        return result.data;
+    },
     createBasicMaskingJob: async (
         id: string,
         videoIds: string[],
@@ -92,6 +102,38 @@ const Api = {
             }
         });
     },
+    createPreviewJob: async (
+        id: string,
+        videoIds: string[],
+        resultVideoId: string,
+        runData: RunParams
+    ): Promise<void> => {
+        // processes a few sampled, downscaled frames and is handled before full jobs
+        await sendApiRequest({
+            url: 'jobs/create-preview',
+            method: 'post',
+            data: {
+                id,
+                run_data: asBackendRunData(runData),
+                video_ids: videoIds,
+                result_video_id: resultVideoId
+            }
+        });
+    },
+    renderFramePreview: async (videoId: string, timestamp: number, runData: RunParams): Promise<Blob> => {
+        // single frame (timestamp in seconds) rendered with the given settings, as JPEG
+        const result = await sendApiRequest({
+            url: `videos/${videoId}/frame-preview`,
+            method: 'post',
+            data: {
+                timestamp,
+                run_data: asBackendRunData(runData),
+            },
+            responseType: 'blob',
+        });
+
+        return result.data;
+    },
     requestVideoUpload: async (videoId: string, videoName: string): Promise<void> => {
         await sendApiRequest({
             url: 'videos/upload/request',
@@ -1,3 +1,4 @@
+import { StageTimings } from "../state/types/Job";
 
 export interface ApiFetchVideosResponse {
     videos: {
@@ -62,9 +63,40 @@ export interface ApiFetchJobsResponse {
         started_at: string | null;
         finished_at: string | null;
         progress: number;
+        updated_at: string;
+        priority: number;
+        stage_timings: StageTimings | null;
+        eta: number | null;
     }[];
 }
 
+export interface ApiJobSummary {
+    id: string;
+    video_id: string;
+    type: string;
+    status: 'open' | 'running' | 'finished' | 'failed';
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+    progress: number;
+    updated_at: string;
+    priority: number;
+    stage_timings: StageTimings | null;
+    eta: number | null;
+}
+
+export interface ApiFetchJobChangesResponse {
+    jobs: ApiJobSummary[];
+    cursor: string | null;
+}
+
+export interface ApiJobEvent {
+    type: 'created' | 'progress' | 'status' | 'resync';
+    id?: string;
+    status?: 'open' | 'running' | 'finished' | 'failed';
+    progress?: number;
+}
+
 export interface ApiFetchWorkersResponse {
     workers: {
         id: string;
@@ -0,0 +1,57 @@
+import {Box, Tooltip, Typography} from '@mui/material';
+import {StageTimings} from '../../state/types/Job';
+
+// Spans that contain other stages, they would always dominate the ranking
+const aggregateStages = ['job', 'basic_hiding_masking'];
+const shownStageCount = 3;
+
+const styles = {
+    tooltipRow: {
+        display: 'flex',
+        justifyContent: 'space-between',
+        gap: 2,
+    },
+};
+
+const formatMs = (ms: number) => ms >= 1000 ? `${(ms / 1000).toFixed(1)} s` : `${Math.round(ms)} ms`;
+
+interface JobStageTimingsProps {
+    stageTimings?: StageTimings;
+}
+
+const JobStageTimings = (props: JobStageTimingsProps) => {
+    if (!props.stageTimings) {
+        return null;
+    }
+
+    const stages = Object.entries(props.stageTimings)
+        .filter(([name]) => !aggregateStages.includes(name))
+        .sort(([, a], [, b]) => b.total_ms - a.total_ms);
+    const jobTotalMs = props.stageTimings['job']?.total_ms
+        ?? stages.reduce((sum, [, timing]) => sum + timing.total_ms, 0);
+
+    const tooltip = (
+        <Box component="div">
+            {stages.map(([name, timing]) => (
+                <Box component="div" key={name} sx={styles.tooltipRow}>
+                    <span>{name}</span>
+                    <span>{`${formatMs(timing.total_ms)} (${timing.count}x, max ${formatMs(timing.max_ms)})`}</span>
+                </Box>
+            ))}
+        </Box>
+    );
+
+    return (
+        <Tooltip title={tooltip}>
+            <Box component="div">
+                {stages.slice(0, shownStageCount).map(([name, timing]) => (
+                    <Typography key={name} variant={'caption'} component={'div'}>
+                        {`${name} ${jobTotalMs > 0 ? Math.round(100 * timing.total_ms / jobTotalMs) : 0}%`}
+                    </Typography>
+                ))}
+            </Box>
+        </Tooltip>
+    );
+};
+
+export default JobStageTimings;
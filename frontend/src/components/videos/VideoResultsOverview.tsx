@@ -9,6 +9,7 @@ import VideoResultMenu from "./videoResultsOverview/VideoResultMenu";
 import CreatePresetDialog from "../presets/CreatePresetDialog";
 import Command from "../../state/actions/command";
 import ResultRunParamsDialog from "./videoResultsOverview/ResultRunParamsDialog";
+import { ResultVideo } from "../../state/types/ResultVideo";
 
 interface VideoResultsProps {
     videoId: string;
@@ -26,6 +27,10 @@ const VideoResultsOverview = (props: VideoResultsProps) => {
     const [createResultRunParamsDialogOpen, setCreateResultRunParamsDialogOpen] = useState<boolean>(false);
 
     const resultVideos = resultVideoLists[props.videoId] || [];
+    // the results of preview jobs (a few sampled frames) are listed apart from the full results
+    const isPreview = (resultVideo: ResultVideo) => resultVideo.jobInfo?.preview !== undefined;
+    const processedResultVideos = resultVideos.filter(resultVideo => !isPreview(resultVideo));
+    const previewResultVideos = resultVideos.filter(isPreview);
 
     const selectResultVideo = (resultVideoId: string) => {
         navigate(Paths.makeResultVideoDetailsUrl(props.videoId, resultVideoId));
@@ -66,22 +71,34 @@ const VideoResultsOverview = (props: VideoResultsProps) => {
         setActiveResultVideoId(undefined);
     };
 
+    const renderResultVideoCards = (resultVideoList: ResultVideo[]) => (
+        <Box component={'div'} sx={{ overflowX: 'auto', whiteSpace: 'nowrap', padding: 1.5, margin: '-4px -12px' }}>
+            {resultVideoList.map(resultVideo => (
+                <VideoResultCard
+                    key={resultVideo.videoResultId}
+                    resultVideo={resultVideo}
+                    selected={props.resultVideoId === resultVideo.videoResultId}
+                    onSelect={() => selectResultVideo(resultVideo.videoResultId)}
+                    onOpenMenu={openVideoResultMenu}
+                />
+            ))}
+        </Box>
+    );
+
     return (
         <Box component="div">
             <Box component={'div'}>
                 <Typography variant={"h6"} style={{ marginRight: "10px" }}>Processed Results</Typography>
             </Box>
-            <Box component={'div'} sx={{ overflowX: 'auto', whiteSpace: 'nowrap', padding: 1.5, margin: '-4px -12px' }}>
-                {resultVideos.map(resultVideo => (
-                    <VideoResultCard
-                        key={resultVideo.videoResultId}
-                        resultVideo={resultVideo}
-                        selected={props.resultVideoId === resultVideo.videoResultId}
-                        onSelect={() => selectResultVideo(resultVideo.videoResultId)}
-                        onOpenMenu={openVideoResultMenu}
-                    />
-                ))}
-            </Box>
+            {renderResultVideoCards(processedResultVideos)}
+            {previewResultVideos.length > 0 && (
+                <>
+                    <Box component={'div'}>
+                        <Typography variant={"h6"} style={{ marginRight: "10px" }}>Previews</Typography>
+                    </Box>
+                    {renderResultVideoCards(previewResultVideos)}
+                </>
+            )}
 
             <VideoResultMenu
                 anchorEl={videoResultAnchorEl}
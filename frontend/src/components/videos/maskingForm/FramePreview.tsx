@@ -0,0 +1,80 @@
+import { Box, Button, CircularProgress, Slider, Typography } from "@mui/material";
+import { useEffect, useState } from "react";
+import { useSelector } from "react-redux";
+import Selector from "../../../state/selector";
+import { RunParams } from "../../../state/types/Run";
+import TimerDisplay from "../../common/TimerDisplay";
+import Api from "../../../api";
+
+interface FramePreviewProps {
+    videoId: string;
+    runParams: RunParams;
+}
+
+const styles = {
+    image: {
+        width: '100%',
+        maxHeight: 360,
+        objectFit: 'contain' as const,
+    },
+};
+
+const FramePreview = (props: FramePreviewProps) => {
+    const videoList = useSelector(Selector.Video.videoList);
+    const video = videoList.find(video => video.id === props.videoId);
+    const duration = video?.videoInfo?.duration || 0;
+    const [timestamp, setTimestamp] = useState(0);
+    const [imageUrl, setImageUrl] = useState<string>();
+    const [loading, setLoading] = useState(false);
+    const [error, setError] = useState(false);
+
+    // the rendered JPEG is only shown here, so it is kept in the component and not the store
+    useEffect(() => {
+        return () => {
+            if (imageUrl) {
+                URL.revokeObjectURL(imageUrl);
+            }
+        };
+    }, [imageUrl]);
+
+    const renderFrame = async (frameTimestamp: number) => {
+        setLoading(true);
+        setError(false);
+        try {
+            const image = await Api.renderFramePreview(props.videoId, frameTimestamp, props.runParams);
+            setImageUrl(URL.createObjectURL(image));
+        } catch (e) {
+            console.error(e);
+            setError(true);
+        }
+        setLoading(false);
+    };
+
+    return (
+        <Box component="div" sx={{ padding: '20px 32px' }}>
+            <Typography variant="h6">Frame Preview</Typography>
+            <Box component="div" sx={{ display: 'flex', flexDirection: 'row', alignItems: 'center', gap: 2 }}>
+                <Slider
+                    min={0}
+                    max={duration}
+                    step={0.1}
+                    value={timestamp}
+                    onChange={(_e, newValue) => setTimestamp(newValue as number)}
+                    onChangeCommitted={(_e, newValue) => renderFrame(newValue as number)}
+                    disabled={duration <= 0}
+                />
+                <TimerDisplay timeInSeconds={timestamp} />
+                <Button variant="outlined" onClick={() => renderFrame(timestamp)} disabled={loading}>
+                    Render
+                </Button>
+            </Box>
+            <Box component="div" sx={{ display: 'flex', justifyContent: 'center', minHeight: 40 }}>
+                {loading && <CircularProgress />}
+                {!loading && error && <Typography color="error">The frame preview could not be rendered</Typography>}
+                {!loading && !error && imageUrl && <img src={imageUrl} alt="Frame preview" style={styles.image} />}
+            </Box>
+        </Box>
+    );
+}
+
+export default FramePreview
@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { useDispatch } from "react-redux";
 import { v4 as uuidv4 } from 'uuid';
 import PresetView from "./presets/PresetView";
@@ -9,6 +9,7 @@ import CustomSettingsContainer from "./customSettings/CustomSettingsContainer";
 interface MaskingFormProps {
     videoIds: string[];
     onClose: () => void;
+    onRunParamsChange?: (runParams: RunParams) => void;
 }
 
 const initialRunParams: RunParams = {
@@ -49,6 +50,10 @@ const MaskingForm = (props: MaskingFormProps) => {
     const [runParams, setRunParams] = useState<RunParams>(initialRunParams)
     const [selectedPresetId, setSelectedPresetId] = useState<string>()
 
+    useEffect(() => {
+        props.onRunParamsChange?.(runParams);
+    }, [runParams]);
+
     const handlePresetSelected = (presetId: string, runParams: RunParams) => {
         setRunParams(runParams);
         setSelectedPresetId(presetId);
@@ -73,11 +78,26 @@ const MaskingForm = (props: MaskingFormProps) => {
         props.onClose();
     };
 
+    const previewVideo = () => {
+        if (!props.videoIds) {
+            return;
+        }
+
+        // a few sampled, downscaled frames with the current settings, the form stays open
+        dispatch(Command.Video.previewVideo({
+            id: uuidv4(),
+            videoIds: props.videoIds,
+            resultVideoId: uuidv4(),
+            runData: runParams,
+        }));
+    };
+
     return presetView ? (
         <PresetView
             onPresetSelected={handlePresetSelected}
             onPresetParamRefinementClicked={handlePresetParamRefinementClicked}
             maskVideo={maskVideo}
+            previewVideo={previewVideo}
             selectedPresetId={selectedPresetId}
         />
     ) : (
@@ -85,6 +105,7 @@ const MaskingForm = (props: MaskingFormProps) => {
             onBackClicked={() => setPresetView(true)}
             onParamsChange={setRunParams}
             onRunClicked={maskVideo}
+            onPreviewClicked={previewVideo}
             runParams={runParams}
         />
     );
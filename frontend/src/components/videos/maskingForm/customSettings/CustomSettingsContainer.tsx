@@ -2,6 +2,7 @@ import {Box, Button, DialogActions, DialogContent, IconButton, Step, StepButton,
 import React, { useState } from "react";
 import { RunParams } from "../../../../state/types/Run";
 import ArrowBackIcon from '@mui/icons-material/ArrowBack';
+import VisibilityIcon from '@mui/icons-material/Visibility';
 import HidingStep, { StepProps } from "./steps/HidingStep";
 import VideoMaskingStep from "./steps/VideoMaskingStep";
 import VoiceMaskingStep from "./steps/VoiceMaskingStep";
@@ -42,6 +43,7 @@ interface RunSettingsContainerProps {
     runParams: RunParams
     onParamsChange: (runParams: RunParams) => void
     onRunClicked: () => void
+    onPreviewClicked: () => void
     onBackClicked: () => void
 }
 
@@ -102,6 +104,7 @@ const CustomSettingsContainer = (props: RunSettingsContainerProps) => {
         <DialogActions sx={styles.dialogActions}>
             {activeStep > 0 && <Button onClick={() => handleBack()}>Go back</Button>}
             {activeStep < steps.length - 1 && <Button variant="contained" sx={{ marginLeft: "25px" }} onClick={() => handleNext()}>Next</Button>}
+            {activeStep == steps.length - 1 && <Button startIcon={<VisibilityIcon />} onClick={() => props.onPreviewClicked()} sx={{ marginLeft: "25px" }}>Preview</Button>}
             {activeStep == steps.length - 1 && <Button variant="contained" color="secondary" startIcon={<ShieldLogoIcon />} onClick={() => props.onRunClicked()} sx={{ marginLeft: "25px" }}>Mask Video</Button>}
         </DialogActions>
     </>)
@@ -1,6 +1,7 @@
 import {Button, DialogActions, DialogContent} from "@mui/material"
 import PresetSelection from "./PresetSelection"
 import TuneIcon from '@mui/icons-material/Tune';
+import VisibilityIcon from '@mui/icons-material/Visibility';
 import {Preset, RunParams} from "../../../../state/types/Run";
 import ShieldLogoIcon from "../../../common/ShieldLogoIcon";
 
@@ -16,6 +17,7 @@ interface PresetViewProps {
     onPresetParamRefinementClicked: () => void
     selectedPresetId?: string;
     maskVideo: () => void
+    previewVideo: () => void
 }
 
 const PresetView = (props: PresetViewProps) => {
@@ -32,6 +34,12 @@ const PresetView = (props: PresetViewProps) => {
                 children={props.selectedPresetId ? 'Customize Preset' : 'Use Custom Settings'}
                 onClick={() => setTimeout(() => props.onPresetParamRefinementClicked(), 150)}
             />
+            <Button
+                startIcon={<VisibilityIcon />}
+                onClick={() => props.previewVideo()}
+                children={'Preview'}
+                disabled={!props.selectedPresetId}
+            />
             <Button
                 variant={'contained'}
                 startIcon={<ShieldLogoIcon color={props.selectedPresetId ? undefined : 'rgba(0, 0, 0, 0.26)'} />}
@@ -18,6 +18,7 @@ import {Job} from "../state/types/Job";
 import {Link} from "react-router-dom";
 import Paths from "../paths";
 import JobProgress from "../components/runs/JobProgress";
+import JobStageTimings from "../components/runs/JobStageTimings";
 
 const statusColors: { [status: string] : "info"|"success"|"error" } = {
     'running': 'info',
@@ -25,6 +26,21 @@ const statusColors: { [status: string] : "info"|"success"|"error" } = {
     'failed': 'error',
 }
 
+const formatEta = (job: Job) => {
+  if (job.eta === undefined || (job.status !== 'open' && job.status !== 'running')) {
+    return '';
+  }
+
+  const minutes = Math.round(job.eta / 60);
+  if (minutes < 1) {
+    return '< 1 min';
+  }
+  if (minutes < 60) {
+    return `~${minutes} min`;
+  }
+  return `~${Math.floor(minutes / 60)} h ${minutes % 60} min`;
+}
+
 function descendingComparator<T>(a: T, b: T, orderBy: keyof T) {
   if (b[orderBy] < a[orderBy]) {
     return -1;
@@ -90,6 +106,16 @@ const headCells: readonly HeadCell[] = [
     id: 'progress',
     disablePadding: false,
     label: 'Progress',
+  },
+  {
+    id: 'eta',
+    disablePadding: false,
+    label: 'ETA',
+  },
+  {
+    id: 'stageTimings',
+    disablePadding: false,
+    label: 'Stages',
   }
 ];
 
@@ -223,6 +249,10 @@ const RunsPage = () => {
                     <TableCell sx={{ paddingTop: 1, paddingBottom: 1 }}>
                       <JobProgress value={row.progress} />
                     </TableCell>
+                    <TableCell>{formatEta(row)}</TableCell>
+                    <TableCell>
+                      <JobStageTimings stageTimings={row.stageTimings} />
+                    </TableCell>
                   </TableRow>
                 );
               })}
@@ -232,7 +262,7 @@ const RunsPage = () => {
                     height: (53) * emptyRows,
                   }}
                 >
-                  <TableCell colSpan={6} />
+                  <TableCell colSpan={9} />
                 </TableRow>
               )}
             </TableBody>
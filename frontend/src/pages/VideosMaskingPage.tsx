@@ -1,14 +1,19 @@
 import { Box } from "@mui/material";
+import { useState } from "react";
 import { useLocation } from "react-router";
 import MaskingForm from "../components/videos/maskingForm/MaskingForm";
+import FramePreview from "../components/videos/maskingForm/FramePreview";
+import { RunParams } from "../state/types/Run";
 
 const VideosMaskingPage = () => {
     const { state } = useLocation();
     const { selectedVideos } = state;
+    const [runParams, setRunParams] = useState<RunParams>()
 
     return (
         <Box component="div">
-            {selectedVideos.length != 0 && <MaskingForm videoIds={selectedVideos} onClose={() => {}} />}
+            {selectedVideos.length != 0 && <MaskingForm videoIds={selectedVideos} onClose={() => {}} onRunParamsChange={setRunParams} />}
+            {selectedVideos.length != 0 && runParams && <FramePreview videoId={selectedVideos[0]} runParams={runParams} />}
         </Box>
     )
 }
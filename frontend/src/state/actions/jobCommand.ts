@@ -5,8 +5,12 @@ const createJobCommand = <T>(type: string) => createAction<T>('_C/JO/' + type);
 export interface FetchJobListPayload {
 }
 
+export interface FetchJobListChangesPayload {
+}
+
 const JobCommand = {
     fetchJobList: createJobCommand<FetchJobListPayload>('FETCH_JOB_LIST'),
+    fetchJobListChanges: createJobCommand<FetchJobListChangesPayload>('FETCH_JOB_LIST_CHANGES'),
 };
 
 export default JobCommand;
@@ -7,8 +7,13 @@ export interface JobListFetchedPayload {
     jobList: Job[];
 }
 
+export interface JobListChangedPayload {
+    changes: (Partial<Job> & { id: string })[];
+}
+
 const JobEvent = {
     jobListFetched: createJobEvent<JobListFetchedPayload>('JOB_LIST_FETCHED'),
+    jobListChanged: createJobEvent<JobListChangedPayload>('JOB_LIST_CHANGED'),
 };
 
 export default JobEvent;
@@ -33,6 +33,7 @@ export interface FetchMpKinematicsPayload {
 const VideoCommand = {
     fetchVideoList: createVideoCommand<FetchVideoListPayload>('FETCH_VIDEO_LIST'),
     maskVideo: createVideoCommand<MaskVideoPayload>('MASK_VIDEO'),
+    previewVideo: createVideoCommand<MaskVideoPayload>('PREVIEW_VIDEO'),
     fetchResultsList: createVideoCommand<FetchResultsListPayload>('FETCH_RESULT_VIDEO_LIST'),
     fetchDownloadableResultFiles: createVideoCommand<FetchDownloadableResultFilesPayload>('FETCH_DOWNLOADABLE_RESULT_FILES'),
     fetchBlendshapes: createVideoCommand<FetchBlendshapesPayload>('FETCH_BLENDSHAPES'),
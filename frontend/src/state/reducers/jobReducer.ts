@@ -1,6 +1,6 @@
 import {Action, handleActions} from 'redux-actions';
 import Event from "../actions/event";
-import {JobListFetchedPayload} from "../actions/jobEvent";
+import {JobListChangedPayload, JobListFetchedPayload} from "../actions/jobEvent";
 import {Job} from "../types/Job";
 
 export interface JobState {
@@ -20,6 +20,17 @@ export const jobReducer = handleActions<JobState, any>(
                 jobList: action.payload.jobList,
             };
         },
+        [Event.Job.jobListChanged.toString()]: (state, action: Action<JobListChangedPayload>): JobState => {
+            const changes: Record<string, Partial<Job>> = {};
+            for (const change of action.payload.changes) {
+                changes[change.id] = { ...changes[change.id], ...change };
+            }
+
+            return {
+                ...state,
+                jobList: state.jobList.map(job => changes[job.id] ? { ...job, ...changes[job.id] } : job),
+            };
+        },
     },
     jobInitialState,
 );
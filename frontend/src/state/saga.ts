@@ -2,6 +2,7 @@ import { all, call, delay, spawn } from 'redux-saga/effects';
 import { uploadFilesFlow, uploadProgressWatcherFlow } from "./sagas/upload/uploadFilesFlow";
 import { fetchVideoListFlow } from "./sagas/video/fetchVideoListFlow";
 import { maskVideoFlow } from "./sagas/video/maskVideoFlow";
+import { previewVideoFlow } from "./sagas/video/previewVideoFlow";
 import { fetchJobListFlow } from "./sagas/job/fetchJobListFlow";
 import { enqueueNotificationFlow } from "./sagas/notification/enqueueNotificationFlow";
 import { fetchResultListFlow } from "./sagas/video/fetchResultVideoListFlow";
@@ -43,6 +44,7 @@ const makeRestartable = (saga: any) => {
 const sagas: any[] = [
     fetchVideoListFlow,
     maskVideoFlow,
+    previewVideoFlow,
     fetchResultListFlow,
     fetchDownloadableResultFilesFlow,
     fetchBlendshapesFlow,
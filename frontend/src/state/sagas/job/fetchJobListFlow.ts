@@ -1,13 +1,79 @@
-import { call, fork, put, take, delay, select } from 'redux-saga/effects';
+import { call, cancel, fork, put, take, delay, select } from 'redux-saga/effects';
+import { eventChannel, EventChannel, Task } from 'redux-saga';
 import { Action } from 'redux-actions';
 import Command from "../../actions/command";
 import Api from "../../../api";
 import Event from "../../actions/event";
-import { ApiFetchJobsResponse } from "../../../api/types";
-import { FetchJobListPayload } from "../../actions/jobCommand";
+import Selector from "../../selector";
+import Config from "../../../config";
+import { ApiFetchJobChangesResponse, ApiFetchJobsResponse, ApiJobEvent, ApiJobSummary } from "../../../api/types";
+import { FetchJobListChangesPayload, FetchJobListPayload } from "../../actions/jobCommand";
 import { Job } from "../../types/Job";
 
 let pollingRunning = false;
+let jobListCursor: string | null = null;
+
+const hasActiveJobs = (jobList: Job[]) => jobList.some(job => job.status === 'running' || job.status === 'open');
+
+const mapJobSummary = (job: ApiJobSummary): Partial<Job> & { id: string } => ({
+    id: job.id,
+    videoId: job.video_id,
+    type: job.type,
+    status: job.status,
+    createdAt: new Date(job.created_at),
+    startedAt: job.started_at ? new Date(job.started_at) : undefined,
+    finishedAt: job.finished_at ? new Date(job.finished_at) : undefined,
+    progress: job.progress,
+    eta: job.eta ?? undefined,
+    stageTimings: job.stage_timings ?? undefined,
+});
+
+const createJobEventChannel = (): EventChannel<ApiJobEvent> => eventChannel(emit => {
+    const eventSource = new EventSource(Config.api.baseUrl + '/jobs/events');
+    const onEvent = (event: MessageEvent) => emit(JSON.parse(event.data));
+
+    for (const type of ['created', 'progress', 'status', 'resync']) {
+        eventSource.addEventListener(type, onEvent as EventListener);
+    }
+
+    return () => eventSource.close();
+});
+
+/**
+ * Applies the pushed job progress and status events, the polled delta feed stays as a fallback
+ */
+const onListenToJobEvents = function* () {
+    if (typeof EventSource === 'undefined') {
+        return;
+    }
+
+    const channel: EventChannel<ApiJobEvent> = yield call(createJobEventChannel);
+
+    try {
+        while (true) {
+            const event: ApiJobEvent = yield take(channel);
+
+            if (!event.id || event.type === 'created' || event.type === 'resync') {
+                yield put(Command.Job.fetchJobListChanges({}));
+                continue;
+            }
+
+            yield put(Event.Job.jobListChanged({
+                changes: [{
+                    id: event.id,
+                    ...(event.status !== undefined ? { status: event.status } : {}),
+                    ...(event.progress !== undefined ? { progress: event.progress } : {}),
+                }],
+            }));
+
+            if (event.status === 'finished' || event.status === 'failed') {
+                yield put(Command.Job.fetchJobListChanges({}));
+            }
+        }
+    } finally {
+        channel.close();
+    }
+};
 
 const onStartPollingJobListUpdates = function* () {
     if (pollingRunning) {
@@ -15,15 +81,19 @@ const onStartPollingJobListUpdates = function* () {
     }
 
     pollingRunning = true;
+    const eventListener: Task = yield fork(onListenToJobEvents);
 
     while (pollingRunning) {
         yield delay(10000);
-        yield put(Command.Job.fetchJobList({}));
 
         if (!pollingRunning) {
             break;
         }
+
+        yield put(Command.Job.fetchJobListChanges({}));
     }
+
+    yield cancel(eventListener);
 }
 
 const onFetchJobList = function* (payload: FetchJobListPayload) {
@@ -40,11 +110,18 @@ const onFetchJobList = function* (payload: FetchJobListPayload) {
             startedAt: job.started_at ? new Date(job.started_at) : undefined,
             finishedAt: job.finished_at ? new Date(job.finished_at) : undefined,
             progress: job.progress,
+            eta: job.eta ?? undefined,
+            stageTimings: job.stage_timings ?? undefined,
         }));
 
+        jobListCursor = response.jobs.reduce<string | null>(
+            (cursor, job) => (cursor === null || job.updated_at > cursor ? job.updated_at : cursor),
+            null,
+        );
+
         yield put(Event.Job.jobListFetched({ jobList }));
 
-        if (jobList.some(job => job.status === 'running' || job.status === 'open')) {
+        if (hasActiveJobs(jobList)) {
             yield fork(onStartPollingJobListUpdates);
         } else {
             pollingRunning = false;
@@ -58,9 +135,45 @@ const onFetchJobList = function* (payload: FetchJobListPayload) {
     }
 };
 
+const onFetchJobListChanges = function* (payload: FetchJobListChangesPayload) {
+    try {
+        const response: ApiFetchJobChangesResponse = yield call(Api.fetchJobChanges, jobListCursor);
+        const jobList: Job[] = yield select(Selector.Job.jobList);
+
+        // The delta feed does not contain run params, new jobs are loaded with the full list
+        const knownJobIds = new Set(jobList.map(job => job.id));
+        if (response.jobs.some(job => !knownJobIds.has(job.id))) {
+            yield put(Command.Job.fetchJobList({}));
+            return;
+        }
+
+        jobListCursor = response.cursor ?? jobListCursor;
+
+        if (response.jobs.length > 0) {
+            yield put(Event.Job.jobListChanged({ changes: response.jobs.map(mapJobSummary) }));
+        }
+
+        const updatedJobList: Job[] = yield select(Selector.Job.jobList);
+        if (!hasActiveJobs(updatedJobList)) {
+            pollingRunning = false;
+        }
+    } catch (e) {
+        console.error(e);
+    }
+};
+
 export function* fetchJobListFlow() {
+    yield fork(fetchJobListChangesFlow);
+
     while (true) {
         const action: Action<FetchJobListPayload> = yield take(Command.Job.fetchJobList.toString());
         yield fork(onFetchJobList, action.payload);
     }
 }
+
+function* fetchJobListChangesFlow() {
+    while (true) {
+        const action: Action<FetchJobListChangesPayload> = yield take(Command.Job.fetchJobListChanges.toString());
+        yield fork(onFetchJobListChanges, action.payload);
+    }
+}
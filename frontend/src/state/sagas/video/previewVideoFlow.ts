@@ -0,0 +1,37 @@
+import { call, fork, put, take } from 'redux-saga/effects';
+import { Action } from 'redux-actions';
+import { MaskVideoPayload } from "../../actions/videoCommand";
+import Command from "../../actions/command";
+import Api from "../../../api";
+
+const onPreviewVideo = function* (payload: MaskVideoPayload) {
+    try {
+        yield call(
+            Api.createPreviewJob,
+            payload.id,
+            payload.videoIds,
+            payload.resultVideoId,
+            payload.runData
+        );
+
+        yield put(Command.Job.fetchJobList({}));
+
+        yield put(Command.Notification.enqueueNotification({
+            severity: 'success',
+            message: 'Preview process started',
+        }));
+    } catch (e) {
+        console.error(e);
+        yield put(Command.Notification.enqueueNotification({
+            severity: 'error',
+            message: 'Preview could not be started',
+        }));
+    }
+};
+
+export function* previewVideoFlow() {
+    while (true) {
+        const action: Action<MaskVideoPayload> = yield take(Command.Video.previewVideo.toString());
+        yield fork(onPreviewVideo, action.payload);
+    }
+}
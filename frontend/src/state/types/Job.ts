@@ -1,4 +1,14 @@
 
+export interface StageTiming {
+    count: number;
+    total_ms: number;
+    mean_ms: number;
+    max_ms: number;
+}
+
+// stage name -> aggregated span durations, only recorded for traced runs
+export type StageTimings = { [stage: string]: StageTiming };
+
 export interface Job {
     id: string;
     videoId: string;
@@ -9,4 +19,6 @@ export interface Job {
     startedAt?: Date;
     finishedAt?: Date;
     progress: number;
+    eta?: number; // estimated seconds until the job is finished
+    stageTimings?: StageTimings;
 }
@@ -0,0 +1,256 @@
+# Prometheus metrics of the backend and the workers, both import this file through a
+# symlink (backend/utils/metrics.py, workers/common/utils/metrics.py). docker-compose
+# mounts ./shared at /shared, where the relative symlinks point to in the containers.
+import os
+import math
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of the histogram buckets, +Inf is always added
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600)
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    labels = [
+        f'{name}="{escape_label_value(str(value))}"'
+        for name, value in zip(label_names, label_values)
+    ]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+
+    def label_values(self, labels: dict) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise Exception(
+                f"Metric {self.name} expects the labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self.render_samples()
+
+    def render_samples(self) -> list:
+        return []
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        super().__init__(name, documentation, label_names)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render_samples(self) -> list:
+        with self.lock:
+            values = list(self.values.items())
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Metric):
+    """
+    Gauge set by the code it measures, or computed when the metrics are scraped if
+    a collect function (returning {label values tuple: value}) is given.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple = (), collect=None
+    ):
+        super().__init__(name, documentation, label_names)
+        self.values = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def render_samples(self) -> list:
+        if self.collect is not None:
+            try:
+                values = list(self.collect().items())
+            except Exception as error:
+                print(f"Collecting metric {self.name} failed")
+                print(error)
+                values = []
+        else:
+            with self.lock:
+                values = list(self.values.items())
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.values = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self.values[key] = entry
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render_samples(self) -> list:
+        with self.lock:
+            values = [
+                (key, list(bucket_counts), total, count)
+                for key, (bucket_counts, total, count) in self.values.items()
+            ]
+
+        lines = []
+        for key, bucket_counts, total, count in values:
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative_count += bucket_count
+                le = f'le="{format_value(upper_bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{format_labels(self.label_names, key, le)} {cumulative_count}"
+                )
+            lines.append(
+                f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(total)}"
+            )
+            lines.append(
+                f"{self.name}_count{format_labels(self.label_names, key)} {count}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    # Renders all registered metrics in the Prometheus text exposition format (0.0.4)
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise Exception(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(
+        self, name: str, documentation: str, label_names: tuple = (), collect=None
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names, collect))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def get_process_rss_bytes() -> dict:
+    # current resident set size, falls back to the peak size where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return {(): resident_pages * os.sysconf("SC_PAGE_SIZE")}
+    except (OSError, ValueError, IndexError):
+        return {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+metrics_registry = MetricsRegistry()
+metrics_registry.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory size of the process in bytes",
+    collect=get_process_rss_bytes,
+)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        content = metrics_registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", metrics_registry.content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # scrapes would flood the job logs
+        pass
+
+
+def start_metrics_server(port: int):
+    # Serves GET /metrics from a daemon thread, next to the job loop of the worker
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available on port {port}")
+    return server
@@ -0,0 +1,131 @@
+# ffprobe and content hash of videos for the backend and the workers, both import this
+# file through a symlink (backend/utils/video_probe.py,
+# workers/pipeline_worker/utils/video_probe.py), see shared/metrics.py.
+import os
+import json
+import hashlib
+import subprocess
+from fractions import Fraction
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _parse_rate(rate: str) -> float:
+    try:
+        value = Fraction(rate)
+    except (ValueError, ZeroDivisionError, TypeError):
+        return 0.0
+    return float(value)
+
+
+def _parse_float(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def run_ffprobe(video_path: str, show_entries: str) -> dict:
+    res = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            show_entries,
+            "-of",
+            "json",
+            video_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    if res.returncode != 0:
+        raise Exception(f"ffprobe failed for {video_path}: {res.stderr.strip()}")
+
+    return json.loads(res.stdout)
+
+
+def probe_duration(video_path: str) -> float:
+    try:
+        probe = run_ffprobe(video_path, "format=duration")
+    except Exception:
+        return 0.0
+    return _parse_float(probe.get("format", {}).get("duration"))
+
+
+def probe_video(video_path: str) -> dict:
+    """
+    Reads container and video stream information with ffprobe without decoding
+    any frame. The frame count and timestamps are taken from the packet index,
+    so they are exact for variable frame rate videos as well.
+
+    Returns:
+        dict: video_info as stored in the db plus the presentation timestamps
+        (in ms) of all frames under 'frame_timestamps'.
+    """
+    probe = run_ffprobe(
+        video_path,
+        "stream=codec_name,codec_tag_string,width,height,avg_frame_rate,r_frame_rate,duration"
+        ":format=duration"
+        ":packet=pts_time,dts_time,duration_time",
+    )
+
+    if not probe.get("streams"):
+        raise Exception(f"No video stream found in {video_path}")
+
+    stream = probe["streams"][0]
+    packets = probe.get("packets", [])
+
+    timestamps = []
+    last_packet_duration = 0.0
+    for packet in packets:
+        pts = packet.get("pts_time", packet.get("dts_time"))
+        if pts is None or pts == "N/A":
+            continue
+        timestamps.append(_parse_float(pts) * 1000.0)
+        last_packet_duration = _parse_float(packet.get("duration_time"))
+    # packets are stored in decoding order, frames are shown in presentation order
+    timestamps.sort()
+
+    duration = _parse_float(stream.get("duration"))
+    if duration <= 0:
+        duration = _parse_float(probe.get("format", {}).get("duration"))
+    if duration <= 0 and timestamps:
+        duration = (timestamps[-1] - timestamps[0]) / 1000.0 + last_packet_duration
+
+    frame_count = len(timestamps)
+    avg_frame_rate = _parse_rate(stream.get("avg_frame_rate"))
+    if avg_frame_rate <= 0 and duration > 0:
+        avg_frame_rate = frame_count / duration
+    real_frame_rate = _parse_rate(stream.get("r_frame_rate"))
+
+    codec = stream.get("codec_tag_string", "")
+    if not codec or codec.startswith("["):
+        # codec tags like [0][0][0][0] are not informative, use the codec name instead
+        codec = stream.get("codec_name", "")
+
+    return {
+        "frame_width": int(stream.get("width", 0)),
+        "frame_height": int(stream.get("height", 0)),
+        "fps": round(avg_frame_rate),
+        "avg_frame_rate": avg_frame_rate,
+        "variable_frame_rate": abs(avg_frame_rate - real_frame_rate) > 0.01,
+        "frame_count": frame_count,
+        "duration": duration,
+        "codec": codec,
+        "size": os.path.getsize(video_path),
+        "frame_timestamps": [round(timestamp, 3) for timestamp in timestamps],
+    }
+
+
+def compute_content_hash(file_path: str) -> str:
+    # sha256 over the file content, read in chunks so large videos are not loaded into memory
+    content_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
@@ -1,7 +1,16 @@
 import os
 import uuid
 
+from pipeline_worker.utils.thread_budget import thread_budget
+from config import WORKER_CAPACITY
+
+# before the model libraries are imported, some only read their thread settings on import
+thread_budget.configure(concurrent_jobs=WORKER_CAPACITY)
+
 from pipeline_worker.pipeline.Pipeline import Pipeline
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.utils.tracing import tracer, is_tracing_requested
+from pipeline_worker.utils.video_metadata import get_video_info
 from common.utils.runparams_utils import (
     produces_blendshapes,
     produces_kinematics,
@@ -9,32 +18,79 @@ from common.utils.runparams_utils import (
     produces_out_audio,
 )
 from common.worker import Worker
+from config import RESULT_BASE_PATH
 
 
 def handle_job_basic_masking(job, backend_client, video_manager):
+    # Spans are only recorded if tracing is enabled for the worker or the run
+    tracer.begin_job(is_tracing_requested(job["data"]))
+    try:
+        with tracer.span("job", job_id=job["id"]):
+            run_basic_masking(job, backend_client, video_manager)
+        if tracer.enabled:
+            upload_trace(job, backend_client)
+    finally:
+        tracer.end_job()
+
+
+def run_basic_masking(job, backend_client, video_manager):
     video_id = job["video_id"]
     result_video_id = job["result_video_id"]
 
+    model_registry.begin_job()
     masking_pipeline = Pipeline(backend_client, video_manager)
-    masking_pipeline.run(
-        video_id,
-        job["id"],
-        job["data"],
-    )
+    try:
+        masking_pipeline.run(
+            video_id,
+            job["id"],
+            job["data"],
+        )
+    finally:
+        model_registry.end_job()
+    print("Model registry stats: " + str(model_registry.get_stats()))
 
     run_params = job["data"]
+    kinds = []
     if produces_out_vid(run_params):
-        video_manager.upload_result_video(video_id, result_video_id)
-        video_manager.upload_result_video_preview_image(video_id, result_video_id)
-    if produces_kinematics(run_params):
-        video_manager.upload_result_kinematics(video_id, result_video_id)
-    if produces_blendshapes(run_params):
-        video_manager.upload_result_blendshapes(video_id, result_video_id)
-    if produces_out_audio(run_params):
-        video_manager.upload_result_audio_file(video_id, result_video_id)
-
-
-worker_id = str(uuid.uuid4())
-worker_type = os.environ["WORKER_TYPE"]
-worker = Worker(worker_type, worker_id, handle_job_basic_masking)
-worker.run()  # runs loop waiting for jobs
+        kinds += ["video", "preview"]
+    # previews only produce the video, no timeseries, blendshapes or audio
+    if "preview" not in run_params:
+        if produces_kinematics(run_params):
+            kinds.append("kinematics")
+        if produces_blendshapes(run_params):
+            kinds.append("blendshapes")
+        if produces_out_audio(run_params):
+            kinds.append("audio")
+
+    with tracer.span("upload"):
+        # preview results are listed apart from the results of full jobs
+        metadata = {"preview": "preview" in run_params}
+        video_path = os.path.join(RESULT_BASE_PATH, video_id + ".mp4")
+        if "video" in kinds and os.path.exists(video_path):
+            # saves the backend from probing the uploaded video again
+            metadata["video_info"] = get_video_info(video_path)
+        video_manager.upload_result_bundle(video_id, result_video_id, kinds, metadata)
+
+
+def upload_trace(job, backend_client):
+    # The stage summary is shown on the runs page, the Chrome trace is attached as extra result file
+    backend_client.upload_job_stage_timings(job["id"], tracer.get_summary())
+    backend_client.upload_result_extra_file(
+        job["video_id"],
+        "trace.json",
+        job["result_video_id"],
+        tracer.export_chrome_trace(),
+    )
+
+
+# model processes (PARALLEL_MODEL_PROCESSES) are spawned and import this module again
+if __name__ == "__main__":
+    worker_id = str(uuid.uuid4())
+    worker_type = os.environ["WORKER_TYPE"]
+    worker = Worker(
+        worker_type,
+        worker_id,
+        handle_job_basic_masking,
+        loaded_models_provider=model_registry.get_loaded_models,
+    )
+    worker.run()  # runs loop waiting for jobs
@@ -1,9 +1,25 @@
-from typing import List
+from typing import List, Optional
+import time
 import uuid
 import requests
 from enum import Enum
 
+from common.utils.metrics import metrics_registry
+from common.result_bundle import ResultBundle
+
 BASE_PATH = "http://python:8000/_worker/"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+transfer_bytes = metrics_registry.counter(
+    "worker_transfer_bytes_total",
+    "Bytes of videos and results transferred from and to the backend",
+    ("direction", "kind"),
+)
+transfer_seconds = metrics_registry.counter(
+    "worker_transfer_seconds_total",
+    "Time spent transferring videos and results, throughput is bytes / seconds",
+    ("direction", "kind"),
+)
 
 
 class MpKinematicsType(str, Enum):
@@ -16,18 +32,58 @@ class BackendClient:
 
     def __init__(self, worker_id: str):
         self._worker_id = worker_id
+        # called with (job_id, progress) on every progress update, see Worker
+        self.progress_listener = None
+
+    def register_worker(
+        self,
+        worker_type: str,
+        loaded_models: Optional[List[str]] = None,
+        capacity: int = 1,
+    ):
+        requests.post(
+            self._make_url("register"),
+            json={
+                "type": worker_type,
+                "loaded_models": loaded_models or [],
+                "capacity": capacity,
+            },
+        )
 
-    def register_worker(self, worker_type: str):
-        requests.post(self._make_url("register"), json={"type": worker_type})
+    def send_heartbeat(self, loaded_models: List[str], capacity: int):
+        requests.post(
+            self._make_url("heartbeat"),
+            json={"loaded_models": loaded_models, "capacity": capacity},
+        )
 
-    def fetch_next_job(self, job_type: str):
-        response = requests.get(self._make_url(f"jobs/next/{job_type}"))
+    def fetch_next_job(self, job_type: str, wait_seconds: float = 0):
+        # the backend holds the request up to wait_seconds until a job is opened
+        response = requests.get(
+            self._make_url(f"jobs/next/{job_type}"), params={"wait": wait_seconds}
+        )
         return response.json()["job"]
 
     def fetch_video(self, video_id: str):
-        response = requests.get(self._make_url("videos/" + video_id))
+        return self._download("video", self._make_url("videos/" + video_id))
+
+    def fetch_video_etag(self, video_id: str):
+        # cheap check of a cached video, None if the backend sends no ETag
+        response = requests.head(self._make_url("videos/" + video_id))
+        response.raise_for_status()
+        return response.headers.get("etag")
+
+    def download_video(self, video_id: str, path: str):
+        # streams the video to path instead of holding it in memory, returns its ETag
+        return self._download_to_file("video", self._make_url("videos/" + video_id), path)
+
+    def fetch_video_metadata(self, video_id: str):
+        response = requests.get(self._make_url("videos/" + video_id + "/metadata"))
+        response.raise_for_status()
         return response.content
 
+    def mark_job_as_started(self, job_id: str):
+        requests.post(self._make_url("jobs/" + job_id + "/start"))
+
     def mark_job_as_finished(self, job_id: str):
         requests.post(self._make_url("jobs/" + job_id + "/finish"))
 
@@ -35,7 +91,8 @@ class BackendClient:
         requests.post(self._make_url("jobs/" + job_id + "/fail"))
 
     def upload_result_video(self, video_id: str, result_video_id: str, content):
-        requests.post(
+        self._upload(
+            "video",
             self._make_url("videos/" + video_id + "/results/" + result_video_id),
             data=content,
             headers={"Content-Type": "application/octet-stream"},
@@ -44,7 +101,8 @@ class BackendClient:
     def upload_result_video_preview_image(
         self, video_id: str, result_video_id: str, content
     ):
-        requests.post(
+        self._upload(
+            "preview_image",
             self._make_url(
                 "videos/" + video_id + "/results/" + result_video_id + "/preview"
             ),
@@ -55,7 +113,8 @@ class BackendClient:
     def upload_result_mp_kinematics(
         self, video_id: str, result_video_id: str, data: dict, type: MpKinematicsType
     ):
-        requests.post(
+        self._upload(
+            "kinematics",
             self._make_url(
                 "videos/"
                 + video_id
@@ -70,7 +129,8 @@ class BackendClient:
     def upload_result_blendshapes(
         self, video_id: str, result_video_id: str, data: dict
     ):
-        requests.post(
+        self._upload(
+            "blendshapes",
             self._make_url(
                 "videos/" + video_id + "/results/" + result_video_id + "/blendshapes"
             ),
@@ -80,7 +140,8 @@ class BackendClient:
     def upload_result_audio_file(
         self, video_id: str, result_video_id: str, data: bytes
     ):
-        requests.post(
+        self._upload(
+            "audio",
             self._make_url(
                 "videos/" + video_id + "/results/" + result_video_id + "/audio_files"
             ),
@@ -92,7 +153,8 @@ class BackendClient:
         self, video_id: str, file_ending: str, result_video_id: str, data: bytes
     ):
         print("a4")
-        requests.post(
+        self._upload(
+            "extra_file",
             self._make_url(
                 "videos/"
                 + video_id
@@ -105,12 +167,70 @@ class BackendClient:
             headers={"Content-Type": "application/octet-stream"},
         )
 
+    def upload_result_bundle(
+        self, video_id: str, result_video_id: str, bundle: ResultBundle
+    ):
+        self._upload(
+            "bundle",
+            self._make_url(
+                "videos/" + video_id + "/results/" + result_video_id + "/bundle"
+            ),
+            data=bundle,
+            headers={"Content-Type": "application/x-tar"},
+        )
+
     def update_progress(self, job_id: str, progress: int):
+        if self.progress_listener is not None:
+            self.progress_listener(job_id, progress)
         requests.post(
             self._make_url("jobs/" + job_id + "/progress"),
             json={"progress": progress},
         )
 
+    def upload_job_stage_timings(self, job_id: str, stage_timings: dict):
+        requests.post(
+            self._make_url("jobs/" + job_id + "/stage-timings"),
+            json={"stage_timings": stage_timings},
+        )
+
+    def _upload(self, kind: str, url: str, **kwargs):
+        start_time = time.perf_counter()
+        response = requests.post(url, **kwargs)
+        transfer_seconds.inc(
+            time.perf_counter() - start_time, direction="upload", kind=kind
+        )
+        transfer_bytes.inc(
+            len(response.request.body or b""), direction="upload", kind=kind
+        )
+        # fails the job of the result instead of finishing it without
+        response.raise_for_status()
+        return response
+
+    def _download(self, kind: str, url: str) -> bytes:
+        start_time = time.perf_counter()
+        response = requests.get(url)
+        transfer_seconds.inc(
+            time.perf_counter() - start_time, direction="download", kind=kind
+        )
+        transfer_bytes.inc(len(response.content), direction="download", kind=kind)
+        response.raise_for_status()
+        return response.content
+
+    def _download_to_file(self, kind: str, url: str, path: str):
+        start_time = time.perf_counter()
+        size = 0
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+        transfer_seconds.inc(
+            time.perf_counter() - start_time, direction="download", kind=kind
+        )
+        transfer_bytes.inc(size, direction="download", kind=kind)
+        return response.headers.get("etag")
+
     def _make_url(self, path: str) -> str:
         return BASE_PATH + self._worker_id + "/" + path
 
@@ -130,5 +250,4 @@ class BackendClient:
         return response.json()["status"]
 
     def fetch_result_video(self, job_id: str):
-        response = requests.get(self._make_url("results/video/" + job_id))
-        return response.content
+        return self._download("result_video", self._make_url("results/video/" + job_id))
@@ -0,0 +1,79 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import UPLOADS_BASE_PATH
+from common.utils.metrics import metrics_registry
+
+pending_upload_bytes = metrics_registry.gauge(
+    "worker_pending_upload_bytes",
+    "Size of the staged results of finished jobs that are not uploaded yet",
+)
+
+
+def get_dir_size(dir_path: str) -> int:
+    size = 0
+    for directory, _directories, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            size += os.path.getsize(os.path.join(directory, file_name))
+    return size
+
+
+class BackgroundUploader:
+    """
+    Uploads the results of finished jobs on a background thread, one job after another
+    in the order they were submitted, while the worker processes the next job.
+
+    The results of a job are moved into its staging directory by the VideoManager
+    (see VideoManager.defer_uploads), so the next job starts with empty result
+    directories even if it works on the same video. Once all uploads of a job are done
+    or one of them failed, the callback of the job is called with the error or None.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="uploader")
+        self.condition = threading.Condition()
+        self.pending_bytes = 0
+
+    @staticmethod
+    def get_staging_dir(job_id: str) -> str:
+        return os.path.join(UPLOADS_BASE_PATH, job_id)
+
+    def submit(self, job_id: str, uploads: list, on_done):
+        staging_dir = self.get_staging_dir(job_id)
+        staged_bytes = get_dir_size(staging_dir)
+        with self.condition:
+            self.pending_bytes += staged_bytes
+            pending_upload_bytes.set(self.pending_bytes)
+        self.executor.submit(self.run_uploads, staging_dir, staged_bytes, uploads, on_done)
+
+    def run_uploads(self, staging_dir: str, staged_bytes: int, uploads: list, on_done):
+        error = None
+        try:
+            for upload in uploads:
+                upload()
+        except Exception as upload_error:
+            error = upload_error
+        finally:
+            self.discard(staging_dir, staged_bytes)
+        try:
+            on_done(error)
+        except Exception as callback_error:
+            # e.g. the backend is unreachable, the uploads of the next jobs still run
+            print("Error while completing uploaded job")
+            print(callback_error)
+
+    def discard(self, staging_dir: str, staged_bytes: int = 0):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        with self.condition:
+            self.pending_bytes -= staged_bytes
+            pending_upload_bytes.set(self.pending_bytes)
+            self.condition.notify_all()
+
+    def wait_for_pending_bytes(self, max_bytes: int):
+        # blocks while the staged results exceed max_bytes
+        with self.condition:
+            if self.pending_bytes > max_bytes:
+                print("Waiting for pending uploads, the disk budget is exhausted")
+            self.condition.wait_for(lambda: self.pending_bytes <= max_bytes)
@@ -1,5 +1,6 @@
 import os
 import json
+import shutil
 
 
 class LocalDataManager:
@@ -14,14 +15,19 @@ class LocalDataManager:
             os.makedirs(os.path.join(self.__base_dir, "results"))
             os.makedirs(os.path.join(self.__base_dir, "timeseries"))
 
+    def get_path(self, file_path: str) -> str:
+        return os.path.join(self.__base_dir, file_path)
+
     def path_exists(self, path):
         return os.path.exists(os.path.join(self.__base_dir, path))
 
     def write_binary(self, file_path: str, content):
+        # renamed when complete, readers of an existing file (e.g. a running job) keep the old one
         to_path = os.path.join(self.__base_dir, file_path)
-        file = open(to_path, "wb")
+        file = open(to_path + ".partial", "wb")
         file.write(content)
         file.close()
+        os.replace(to_path + ".partial", to_path)
         return to_path
 
     def read_binary(self, file_path: str):
@@ -35,5 +41,11 @@ class LocalDataManager:
             content = json.load(f)
             return content
 
+    def move_file(self, file_path: str, to_file_path: str):
+        to_path = os.path.join(self.__base_dir, to_file_path)
+        os.makedirs(os.path.dirname(to_path), exist_ok=True)
+        shutil.move(os.path.join(self.__base_dir, file_path), to_path)
+        return to_path
+
     def delete_file(self, file_path: str):
         os.remove(os.path.join(self.__base_dir, file_path))
@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+from contextlib import contextmanager
+
+from common.backend_client import BackendClient
+from common.utils.app_utils import prune_cache_dir
+from common.utils.metrics import metrics_registry
+
+CACHE_EXTENSION = ".mp4"
+LOCK_EXTENSION = ".lock"
+PARTIAL_EXTENSION = ".partial"
+INDEX_LOCK_NAME = ".index.lock"
+
+original_video_cache_lookups = metrics_registry.counter(
+    "worker_original_video_cache_lookups_total",
+    "Lookups of original videos in the shared cache, uncached if the backend sent no ETag",
+    ("outcome",),
+)
+
+
+@contextmanager
+def file_lock(path: str):
+    # flock works across the containers of a host that mount the same volume
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def remove_if_unlocked(lock_path: str, paths: list) -> bool:
+    # Removes paths (and the lock file) if nobody holds the lock, e.g. a worker that is
+    # still downloading the entry. Holders of the lock in this process also block it.
+    try:
+        f = open(lock_path, "a")
+    except OSError:
+        return False
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        for path in paths + [lock_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        return True
+
+
+def link_or_copy(source_path: str, target_path: str):
+    # A hard link keeps the video of a running job when its cache entry is pruned, the
+    # cache volume may be another file system than the local data though. The target is
+    # replaced atomically, a prefetch must not truncate a video that is being read.
+    partial_path = target_path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    try:
+        os.link(source_path, partial_path)
+    except OSError:
+        shutil.copyfile(source_path, partial_path)
+    os.replace(partial_path, target_path)
+
+
+class OriginalVideoCache:
+    """
+    Size-capped LRU cache of the original videos, shared by the workers of a host
+    through a common volume. Entries are keyed by the video id and the ETag of the video,
+    which is checked with a HEAD request before every use, so changed videos are
+    downloaded again. A lock per entry lets only one worker download a video while the
+    others wait for it, the index lock guards adding, using and pruning entries.
+    """
+
+    def __init__(self, backend_client: BackendClient, cache_dir: str, max_bytes: int):
+        self.backend_client = backend_client
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_entry_path(self, video_id: str, etag: str) -> str:
+        # ETags are quoted and may be weak, hashing gives a safe file name
+        etag_hash = hashlib.sha1(etag.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, video_id + "_" + etag_hash + CACHE_EXTENSION)
+
+    def load(self, video_id: str, target_path: str):
+        etag = self.backend_client.fetch_video_etag(video_id)
+        if etag is None:
+            original_video_cache_lookups.inc(outcome="uncached")
+            self.backend_client.download_video(video_id, target_path + ".partial")
+            os.replace(target_path + ".partial", target_path)
+            return
+
+        entry_path = self.get_entry_path(video_id, etag)
+        with file_lock(entry_path + LOCK_EXTENSION):
+            if self.use_entry(entry_path, target_path):
+                original_video_cache_lookups.inc(outcome="hit")
+                return
+
+            original_video_cache_lookups.inc(outcome="miss")
+            # unique, a lock file removed while it was opened lets two workers download
+            partial_path = entry_path + "." + uuid.uuid4().hex + PARTIAL_EXTENSION
+            try:
+                download_etag = self.backend_client.download_video(video_id, partial_path)
+            except Exception:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                raise
+            if download_etag != etag:
+                # the video changed since the HEAD request, the download is not cached
+                os.replace(partial_path, target_path)
+                return
+            with file_lock(os.path.join(self.cache_dir, INDEX_LOCK_NAME)):
+                os.replace(partial_path, entry_path)
+                link_or_copy(entry_path, target_path)
+                self.remove_stale_entries(video_id, entry_path)
+                prune_cache_dir(self.cache_dir, CACHE_EXTENSION, self.max_bytes)
+                self.remove_unused_files()
+
+    def use_entry(self, entry_path: str, target_path: str) -> bool:
+        with file_lock(os.path.join(self.cache_dir, INDEX_LOCK_NAME)):
+            if not os.path.exists(entry_path):
+                return False
+            # the mtime orders the entries for prune_cache_dir
+            now = time.time()
+            os.utime(entry_path, (now, now))
+            link_or_copy(entry_path, target_path)
+            return True
+
+    def remove_stale_entries(self, video_id: str, entry_path: str):
+        # entries of older contents of the video are never used again
+        prefix = video_id + "_"
+        for f in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, f)
+            if f.startswith(prefix) and f.endswith(CACHE_EXTENSION) and path != entry_path:
+                # the lock file is removed with the unused files
+                os.remove(path)
+
+    def remove_unused_files(self):
+        # Lock files of removed entries and partial downloads of workers that were killed,
+        # both only if no worker holds the lock of the entry
+        partial_paths = {}
+        lock_paths = set()
+        for f in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, f)
+            if f.endswith(PARTIAL_EXTENSION):
+                # <entry>.<unique id>.partial
+                entry_path = path[: -len(PARTIAL_EXTENSION)].rsplit(".", 1)[0]
+                partial_paths.setdefault(entry_path, []).append(path)
+            elif f.endswith(CACHE_EXTENSION + LOCK_EXTENSION):
+                lock_paths.add(path)
+
+        for lock_path in lock_paths:
+            entry_path = lock_path[: -len(LOCK_EXTENSION)]
+            if not os.path.exists(entry_path) or entry_path in partial_paths:
+                remove_if_unlocked(lock_path, partial_paths.get(entry_path, []))
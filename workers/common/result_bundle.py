@@ -0,0 +1,49 @@
+import os
+import json
+import tarfile
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_padding(size: int) -> int:
+    return -size % tarfile.BLOCKSIZE
+
+
+class ResultBundle:
+    """
+    The results of a job as one uncompressed tar stream, uploaded in a single request.
+    The first member is the manifest (artifacts and metadata like the video_info),
+    the files follow as they are on disk, they are neither read into memory nor parsed.
+    The length is known in advance, so the upload is sent with a Content-Length.
+    """
+
+    def __init__(self, manifest: dict, files: list):
+        # files: (name in the bundle, path) in the order of manifest["artifacts"]
+        self.manifest_data = json.dumps(manifest).encode("utf-8")
+        self.files = [(name, path, os.path.getsize(path)) for name, path in files]
+
+    def __len__(self) -> int:
+        sizes = [len(self.manifest_data)] + [size for _name, _path, size in self.files]
+        members = sum(tarfile.BLOCKSIZE + size + get_padding(size) for size in sizes)
+        # the end of the archive is marked by two empty blocks
+        return members + 2 * tarfile.BLOCKSIZE
+
+    @staticmethod
+    def create_header(name: str, size: int) -> bytes:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mode = 0o644
+        # GNU headers are a single block for short names and support files above 8 GiB
+        return info.tobuf(format=tarfile.GNU_FORMAT)
+
+    def __iter__(self):
+        yield self.create_header(MANIFEST_NAME, len(self.manifest_data))
+        yield self.manifest_data + b"\0" * get_padding(len(self.manifest_data))
+        for name, path, size in self.files:
+            yield self.create_header(name, size)
+            with open(path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+            yield b"\0" * get_padding(size)
+        yield b"\0" * (2 * tarfile.BLOCKSIZE)
@@ -1,4 +1,6 @@
 import os
+import shutil
+import subprocess
 import cv2
 
 from config import (
@@ -6,8 +8,11 @@ from config import (
     RESULT_BASE_PATH,
     TEMP_PATH,
     TS_BASE_PATH,
+    UPLOADS_BASE_PATH,
     VIDEOS_BASE_PATH,
     DATA_BASE_DIR,
+    MASK_TRACKS_BASE_PATH,
+    LANDMARK_CACHE_BASE_PATH,
 )
 
 
@@ -28,6 +33,17 @@ def init_directories():
     if not os.path.exists(BLENDSHAPES_BASE_PATH):
         os.mkdir(BLENDSHAPES_BASE_PATH)
 
+    if not os.path.exists(MASK_TRACKS_BASE_PATH):
+        os.mkdir(MASK_TRACKS_BASE_PATH)
+
+    if not os.path.exists(LANDMARK_CACHE_BASE_PATH):
+        os.mkdir(LANDMARK_CACHE_BASE_PATH)
+
+    if not os.path.exists(UPLOADS_BASE_PATH):
+        os.mkdir(UPLOADS_BASE_PATH)
+    else:
+        clear_uploads_dir()
+
     if not os.path.exists(TEMP_PATH):
         os.mkdir(TEMP_PATH)
     else:
@@ -49,6 +65,13 @@ def clear_results_dir():
                 os.remove(os.path.join(RESULT_BASE_PATH, f))
 
 
+def clear_uploads_dir():
+    # results of jobs that were not uploaded before the worker stopped, those jobs are not finished
+    print("Cleaning uploads dir")
+    for f in os.listdir(UPLOADS_BASE_PATH):
+        shutil.rmtree(os.path.join(UPLOADS_BASE_PATH, f), ignore_errors=True)
+
+
 def clear_out_dirs():
     print("Cleaning out dirs")
     if os.path.exists(TS_BASE_PATH):
@@ -62,18 +85,87 @@ def clear_out_dirs():
                 os.remove(os.path.join(BLENDSHAPES_BASE_PATH, f))
 
 
+def prune_cache_dir(dir_path: str, extension: str, max_bytes: int):
+    # Removes the least recently used cache files once they exceed max_bytes in total
+    cache_files = []
+    for f in os.listdir(dir_path):
+        if f.endswith(extension):
+            stat = os.stat(os.path.join(dir_path, f))
+            cache_files.append((stat.st_mtime, stat.st_size, os.path.join(dir_path, f)))
+
+    total_size = sum(size for _, size, _ in cache_files)
+    for _, size, path in sorted(cache_files):
+        if total_size <= max_bytes:
+            break
+        os.remove(path)
+        total_size -= size
+
+
 def clear_dirs():
     clear_temp_dir()
     clear_results_dir()
     clear_out_dirs()
 
 
+def probe_duration(video_path: str) -> float:
+    res = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            video_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    try:
+        return float(res.stdout.strip())
+    except ValueError:
+        return 0.0
+
+
+def save_keyframe_image(video_path: str, image_path: str, timestamp: float) -> bool:
+    # Seeks to the keyframe at or before timestamp and only decodes that keyframe
+    res = subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-skip_frame",
+            "nokey",
+            "-noaccurate_seek",
+            "-ss",
+            f"{max(timestamp, 0.0):.3f}",
+            "-i",
+            video_path,
+            "-frames:v",
+            "1",
+            "-y",
+            image_path,
+        ],
+        capture_output=True,
+    )
+    return res.returncode == 0 and os.path.exists(image_path)
+
+
 def save_preview_image(masked_video_path):
     print("Saving preview image of masked video")
-    video_cap = cv2.VideoCapture(masked_video_path)
     file_name = os.path.splitext(os.path.basename(masked_video_path))[0] + ".png"
     preview_img_path = os.path.join(os.path.split(masked_video_path)[0], file_name)
+
+    duration = probe_duration(masked_video_path)
+    if save_keyframe_image(masked_video_path, preview_img_path, duration / 2):
+        return
+
+    # fall back to decoding with OpenCV if ffmpeg can't handle the file
+    video_cap = cv2.VideoCapture(masked_video_path)
     num_frames = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
     video_cap.set(cv2.CAP_PROP_POS_FRAMES, int(num_frames / 2))
     _, frame = video_cap.read()
+    video_cap.release()
     cv2.imwrite(preview_img_path, frame)
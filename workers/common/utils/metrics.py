@@ -0,0 +1 @@
+../../../shared/metrics.py
\ No newline at end of file
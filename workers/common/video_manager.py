@@ -1,24 +1,130 @@
 from common.backend_client import BackendClient
 from common.local_data_manager import LocalDataManager
+from common.original_video_cache import OriginalVideoCache
+from common.result_bundle import ResultBundle
 import os
+from typing import Optional
 
 from config import TS_BASE_PATH
 
+# kind, kinematics type, local path and name in the bundle of the results of a job
+RESULT_BUNDLE_FILES = [
+    ("video", None, os.path.join("results", "{video_id}.mp4"), "video.mp4"),
+    ("preview", None, os.path.join("results", "{video_id}.png"), "preview.png"),
+    ("kinematics", "body", os.path.join("timeseries", "body_{video_id}.json"), "kinematics_body.json"),
+    ("kinematics", "face", os.path.join("timeseries", "face_{video_id}.json"), "kinematics_face.json"),
+    ("blendshapes", None, os.path.join("blendshapes", "{video_id}.json"), "blendshapes.json"),
+    ("audio", None, os.path.join("results", "{video_id}.mp3"), "audio.mp3"),
+]
+
 
 class VideoManager:
     __backend_client: BackendClient
     __local_data_manager: LocalDataManager
 
     def __init__(
-        self, backend_client: BackendClient, local_data_manager: LocalDataManager
+        self,
+        backend_client: BackendClient,
+        local_data_manager: LocalDataManager,
+        original_video_cache: OriginalVideoCache = None,
     ):
         self.__backend_client = backend_client
         self.__local_data_manager = local_data_manager
+        self.__original_video_cache = original_video_cache
+        # uploads of the current job that run later, see defer_uploads
+        self.__deferred_uploads = None
+        self.__staging_dir = None
+
+    def defer_uploads(self, staging_dir: str):
+        # The upload methods move their files into staging_dir and return, the uploads are
+        # returned by take_deferred_uploads and run by the BackgroundUploader
+        self.__deferred_uploads = []
+        self.__staging_dir = staging_dir
+
+    def take_deferred_uploads(self) -> list:
+        uploads = self.__deferred_uploads or []
+        self.__deferred_uploads = None
+        self.__staging_dir = None
+        return uploads
+
+    def __upload_files(self, paths: list, upload):
+        # upload receives the absolute paths of the files, in the staging directory if deferred
+        if self.__deferred_uploads is None:
+            upload([self.__local_data_manager.get_path(path) for path in paths])
+            return
+        # numbered, the results of different kinds may share a file name
+        staged_paths = [
+            self.__local_data_manager.move_file(
+                path,
+                os.path.join(
+                    self.__staging_dir,
+                    f"{len(self.__deferred_uploads)}_{os.path.basename(path)}",
+                ),
+            )
+            for path in paths
+        ]
+        self.__deferred_uploads.append(lambda: upload(staged_paths))
+
+    def __upload_file(self, path: str, read, upload):
+        self.__upload_files([path], lambda paths: upload(read(paths[0])))
+
+    def upload_result_bundle(
+        self,
+        video_id: str,
+        result_video_id: str,
+        kinds: list,
+        metadata: Optional[dict] = None,
+    ):
+        # uploads the existing results of the given kinds in one request, see ResultBundle
+        artifacts = []
+        paths = []
+        for kind, kinematics_type, path, name in RESULT_BUNDLE_FILES:
+            path = path.format(video_id=video_id)
+            if kind in kinds and self.__local_data_manager.path_exists(path):
+                artifact = {"kind": kind, "name": name}
+                if kinematics_type is not None:
+                    artifact["type"] = kinematics_type
+                artifacts.append(artifact)
+                paths.append(path)
+        if not artifacts:
+            return
+
+        self.__upload_files(
+            paths,
+            lambda local_paths: self.__backend_client.upload_result_bundle(
+                video_id,
+                result_video_id,
+                ResultBundle(
+                    {**(metadata or {}), "artifacts": artifacts},
+                    [
+                        (artifact["name"], local_path)
+                        for artifact, local_path in zip(artifacts, local_paths)
+                    ],
+                ),
+            ),
+        )
 
     def load_original_video(self, video_id: str):
-        video_data = self.__backend_client.fetch_video(video_id)
+        video_path = self.__local_data_manager.get_path(
+            os.path.join("original", video_id + ".mp4")
+        )
+        if self.__original_video_cache is not None:
+            self.__original_video_cache.load(video_id, video_path)
+        else:
+            # written to a partial file first, like write_binary
+            self.__backend_client.download_video(video_id, video_path + ".partial")
+            os.replace(video_path + ".partial", video_path)
+        self.load_original_video_metadata(video_id)
+
+    def load_original_video_metadata(self, video_id: str):
+        # the backend probes every upload once, reuse that instead of probing again
+        try:
+            metadata = self.__backend_client.fetch_video_metadata(video_id)
+        except Exception as error:
+            print(f"Could not fetch metadata for video {video_id}: {error}")
+            return
         self.__local_data_manager.write_binary(
-            os.path.join("original", video_id + ".mp4"), video_data
+            os.path.join("original", video_id + ".metadata.json"), metadata
         )
 
     def load_result_video(self, job_id: str):
@@ -32,17 +138,23 @@ class VideoManager:
     def upload_result_video(self, video_id: str, result_video_id: str):
         path = os.path.join("results", video_id + ".mp4")
         if self.__local_data_manager.path_exists(path):
-            video_data = self.__local_data_manager.read_binary(path)
-            self.__backend_client.upload_result_video(
-                video_id, result_video_id, video_data
+            self.__upload_file(
+                path,
+                self.__local_data_manager.read_binary,
+                lambda video_data: self.__backend_client.upload_result_video(
+                    video_id, result_video_id, video_data
+                ),
             )
 
     def upload_result_video_preview_image(self, video_id: str, result_video_id: str):
         path = os.path.join("results", video_id + ".png")
         if self.__local_data_manager.path_exists(path):
-            image_data = self.__local_data_manager.read_binary(path)
-            self.__backend_client.upload_result_video_preview_image(
-                video_id, result_video_id, image_data
+            self.__upload_file(
+                path,
+                self.__local_data_manager.read_binary,
+                lambda image_data: self.__backend_client.upload_result_video_preview_image(
+                    video_id, result_video_id, image_data
+                ),
             )
 
     def upload_result_kinematics(self, video_id: str, result_video_id):
@@ -50,27 +162,34 @@ class VideoManager:
         for part in possible_timeseries:
             path = os.path.join("timeseries", part + "_" + video_id + ".json")
             if self.__local_data_manager.path_exists(path):
-                data = self.__local_data_manager.read_json(path)
-                self.__backend_client.upload_result_mp_kinematics(
-                    video_id, result_video_id, data, part
+                self.__upload_file(
+                    path,
+                    self.__local_data_manager.read_json,
+                    lambda data, part=part: self.__backend_client.upload_result_mp_kinematics(
+                        video_id, result_video_id, data, part
+                    ),
                 )
 
     def upload_result_blendshapes(self, video_id: str, result_video_id):
         path = os.path.join("blendshapes", video_id + ".json")
         if self.__local_data_manager.path_exists(path):
-            data = self.__local_data_manager.read_json(path)
-
-            self.__backend_client.upload_result_blendshapes(
-                video_id, result_video_id, data
+            self.__upload_file(
+                path,
+                self.__local_data_manager.read_json,
+                lambda data: self.__backend_client.upload_result_blendshapes(
+                    video_id, result_video_id, data
+                ),
             )
 
     def upload_result_audio_file(self, video_id: str, result_video_id):
         path = os.path.join("results", video_id + ".mp3")
         if self.__local_data_manager.path_exists(path):
-            data = self.__local_data_manager.read_binary(path)
-
-            self.__backend_client.upload_result_audio_file(
-                video_id, result_video_id, data
+            self.__upload_file(
+                path,
+                self.__local_data_manager.read_binary,
+                lambda data: self.__backend_client.upload_result_audio_file(
+                    video_id, result_video_id, data
+                ),
             )
 
     def upload_result_extra_file(
@@ -80,11 +199,12 @@ class VideoManager:
         path = os.path.join("results", video_id + "." + file_ending)
         if self.__local_data_manager.path_exists(path):
             print("a2")
-            data = self.__local_data_manager.read_binary(path)
-            print("a3")
-
-            self.__backend_client.upload_result_extra_file(
-                video_id, file_ending, result_video_id, data
+            self.__upload_file(
+                path,
+                self.__local_data_manager.read_binary,
+                lambda data: self.__backend_client.upload_result_extra_file(
+                    video_id, file_ending, result_video_id, data
+                ),
             )
 
     def cleanup_result_video_files(self, video_id: str):
@@ -1,68 +1,248 @@
 from common.backend_client import BackendClient
+from common.background_uploader import BackgroundUploader
 from common.local_data_manager import LocalDataManager
-from config import DATA_BASE_DIR
+from common.original_video_cache import OriginalVideoCache
+from config import (
+    DATA_BASE_DIR,
+    ORIGINAL_VIDEO_CACHE_ENABLED,
+    ORIGINAL_VIDEO_CACHE_PATH,
+    ORIGINAL_VIDEO_CACHE_MAX_BYTES,
+    VIDEOS_BASE_PATH,
+    WORKER_CAPACITY,
+    METRICS_PORT,
+    WORKER_POLL_INTERVAL_SECONDS,
+    WORKER_JOB_WAIT_SECONDS,
+    WORKER_PREFETCH_NEXT_JOB,
+    WORKER_PREFETCH_AT_PROGRESS,
+    WORKER_BACKGROUND_UPLOADS,
+    WORKER_DISK_BUDGET_BYTES,
+)
 from common.video_manager import VideoManager
+import os
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from common.utils.app_utils import clear_dirs, init_directories
+from common.utils.metrics import metrics_registry, start_metrics_server
+
+job_claim_seconds = metrics_registry.histogram(
+    "worker_job_claim_seconds",
+    "Duration of requests for the next job",
+    ("type",),
+)
+job_duration_seconds = metrics_registry.histogram(
+    "worker_job_duration_seconds",
+    "Duration of handled jobs, including video download and result upload",
+    ("type", "status"),
+    (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600),
+)
 
 
 class Worker:
-    def __init__(self, worker_type, worker_id, job_handler):
+    def __init__(self, worker_type, worker_id, job_handler, loaded_models_provider=None):
         self.worker_type = worker_type
         self.worker_id = worker_id
         self.job_handler = job_handler
+        # returns the model files this worker has loaded, used for model-affinity scheduling
+        self.loaded_models_provider = loaded_models_provider
         self.backend_client = BackendClient(worker_id)
-        
+
         retry_timeout = 60  # in seconds
         start_time = time.time()
         while True:
             try:
-                self.backend_client.register_worker(worker_type)
+                self.backend_client.register_worker(
+                    worker_type, self.get_loaded_models(), WORKER_CAPACITY
+                )
                 break
             except Exception as e:
                 if time.time() - start_time >= retry_timeout:
-                    raise e 
+                    raise e
                 print(f"Failed to register worker. Retrying in 1 second. Error: {str(e)}")
                 time.sleep(1)
 
+        init_directories()
+
+        # shared by the workers of a host, see ORIGINAL_VIDEO_CACHE_PATH
+        original_video_cache = (
+            OriginalVideoCache(
+                self.backend_client,
+                ORIGINAL_VIDEO_CACHE_PATH,
+                ORIGINAL_VIDEO_CACHE_MAX_BYTES,
+            )
+            if ORIGINAL_VIDEO_CACHE_ENABLED
+            else None
+        )
         self.video_manager = VideoManager(
-            self.backend_client, LocalDataManager(DATA_BASE_DIR)
+            self.backend_client, LocalDataManager(DATA_BASE_DIR), original_video_cache
         )
 
-        init_directories()
+        # the next job is claimed and its video downloaded while the current job is
+        # finishing, claiming it earlier would hold it from idle workers and preview jobs
+        self.prefetch_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+            if WORKER_PREFETCH_NEXT_JOB
+            else None
+        )
+        self.prefetched_job = None
+        self.current_job = None
+        self.backend_client.progress_listener = self.handle_job_progress
+        # the results of a job are uploaded while the next job is processed
+        self.uploader = BackgroundUploader() if WORKER_BACKGROUND_UPLOADS else None
+
+        if METRICS_PORT is not None:
+            start_metrics_server(METRICS_PORT)
 
-    def fetch_next_job(self):
+    def get_loaded_models(self):
+        return self.loaded_models_provider() if self.loaded_models_provider else []
+
+    def send_heartbeat(self):
+        try:
+            self.backend_client.send_heartbeat(self.get_loaded_models(), WORKER_CAPACITY)
+        except Exception as error:
+            print("Error while sending heartbeat")
+            print(error)
+
+    def fetch_next_job(self, wait_seconds: float = 0):
         try:
             print(self.worker_type)
-            return self.backend_client.fetch_next_job(self.worker_type)
+            start_time = time.perf_counter()
+            job = self.backend_client.fetch_next_job(self.worker_type, wait_seconds)
+            if job is not None:
+                # waiting for a job to be opened is not part of the claim
+                job_claim_seconds.observe(
+                    time.perf_counter() - start_time, type=self.worker_type
+                )
+            return job
         except Exception as error:
             print("Error while fetching next job")
             print(error)
+            time.sleep(WORKER_POLL_INTERVAL_SECONDS)
 
         return None
 
-    def handle_job(self, job):
+    def prefetch_next_job(self):
+        # Runs on the prefetch thread, returns the claimed job (or None) and the error of
+        # loading its video, which fails the job once it is its turn. It does not wait
+        # for new jobs, those are left to idle workers.
+        job = self.fetch_next_job()
+        if job is None:
+            return None, None
+        print("Prefetching video of job " + job["id"])
+        try:
+            self.video_manager.load_original_video(job["video_id"])
+        except Exception as error:
+            return job, error
+        return job, None
+
+    def start_prefetch(self, job):
+        if self.prefetch_executor is None or self.prefetched_job is not None:
+            return
+        if not self.has_disk_budget_for_prefetch(job):
+            return
+        self.prefetched_job = self.prefetch_executor.submit(self.prefetch_next_job)
+
+    def handle_job_progress(self, job_id: str, progress: int):
+        # called by the job handler through the backend client
+        if (
+            self.current_job is not None
+            and job_id == self.current_job["id"]
+            and progress >= WORKER_PREFETCH_AT_PROGRESS
+        ):
+            self.start_prefetch(self.current_job)
+
+    def mark_job_as_started(self, job):
+        # a prefetched job was claimed before, its duration starts now
+        try:
+            self.backend_client.mark_job_as_started(job["id"])
+        except Exception as error:
+            print("Error while marking job " + job["id"] + " as started")
+            print(error)
+
+    def has_disk_budget_for_prefetch(self, job) -> bool:
+        # the size of the next video is unknown, the current one is the estimate
+        video_path = os.path.join(VIDEOS_BASE_PATH, job["video_id"] + ".mp4")
+        video_size = os.path.getsize(video_path) if os.path.exists(video_path) else 0
+        pending_bytes = self.uploader.pending_bytes if self.uploader else 0
+        return pending_bytes + 2 * video_size <= WORKER_DISK_BUDGET_BYTES
+
+    def handle_job(self, job, video_loaded: bool = False) -> list:
+        # returns the deferred uploads of the job if uploads run in the background
         print("Start working on job " + job["id"])
         clear_dirs()
 
-        self.video_manager.load_original_video(job["video_id"])
-        self.job_handler(job, self.backend_client, self.video_manager)
+        if not video_loaded:
+            self.video_manager.load_original_video(job["video_id"])
+        if self.uploader is not None:
+            self.video_manager.defer_uploads(self.uploader.get_staging_dir(job["id"]))
+        try:
+            self.job_handler(job, self.backend_client, self.video_manager)
+        except Exception:
+            self.video_manager.take_deferred_uploads()
+            if self.uploader is not None:
+                self.uploader.discard(self.uploader.get_staging_dir(job["id"]))
+            raise
+        return self.video_manager.take_deferred_uploads()
+
+    def complete_job(self, job, start_time: float, error: Exception = None):
+        # called once the results of the job are uploaded or it failed
+        if error is None:
+            self.backend_client.mark_job_as_finished(job["id"])
+            status = "finished"
+        else:
+            print("Handling job with id " + job["id"] + " failed")
+            print(error)
+            self.backend_client.mark_job_as_failed(job["id"])
+            status = "failed"
+        job_duration_seconds.observe(
+            time.perf_counter() - start_time,
+            type=self.worker_type,
+            status=status,
+        )
 
     def run(self):
         while True:
-            job = self.fetch_next_job()
+            self.send_heartbeat()
+            if self.prefetched_job is not None:
+                job, load_error = self.prefetched_job.result()
+                self.prefetched_job = None
+                video_loaded = True
+                if job is not None:
+                    self.mark_job_as_started(job)
+            else:
+                job, load_error = self.fetch_next_job(WORKER_JOB_WAIT_SECONDS), None
+                video_loaded = False
 
             if job is None:
+                # the backend already waited for a job, ask again right away
                 print("No suitable job found")
+                sys.stdout.flush()  # Flush log output
+                continue
+
+            if self.uploader is not None:
+                self.uploader.wait_for_pending_bytes(WORKER_DISK_BUDGET_BYTES)
+            start_time = time.perf_counter()
+            self.current_job = job
+            try:
+                if load_error is not None:
+                    raise load_error
+                uploads = self.handle_job(job, video_loaded)
+            except Exception as error:
+                self.complete_job(job, start_time, error)
             else:
-                try:
-                    self.handle_job(job)
-                    self.backend_client.mark_job_as_finished(job["id"])
-                except Exception as error:
-                    print("Handling job with id " + job["id"] + " failed")
-                    print(error)
-                    self.backend_client.mark_job_as_failed(job["id"])
+                # at the latest, the next job is claimed while the results are uploaded
+                self.start_prefetch(job)
+                if self.uploader is not None:
+                    self.uploader.submit(
+                        job["id"],
+                        uploads,
+                        lambda error, job=job, start_time=start_time: self.complete_job(
+                            job, start_time, error
+                        ),
+                    )
+                else:
+                    self.complete_job(job, start_time)
+            finally:
+                self.current_job = None
 
             sys.stdout.flush()  # Flush log output
-            time.sleep(10)  #
@@ -1,9 +1,42 @@
-RESULT_BASE_PATH = "/local_data/results"
-VIDEOS_BASE_PATH = "/local_data/original"
-TS_BASE_PATH = "/local_data/timeseries"
-BLENDSHAPES_BASE_PATH = "/local_data/blendshapes"
-TEMP_PATH = "/local_data/temp"
+import os
+
+DATA_BASE_DIR = os.environ.get("LOCAL_DATA_DIR", "/local_data")  # overridden for local runs, e.g. by pipeline_worker.bench
+RESULT_BASE_PATH = os.path.join(DATA_BASE_DIR, "results")
+VIDEOS_BASE_PATH = os.path.join(DATA_BASE_DIR, "original")
+TS_BASE_PATH = os.path.join(DATA_BASE_DIR, "timeseries")
+BLENDSHAPES_BASE_PATH = os.path.join(DATA_BASE_DIR, "blendshapes")
+TEMP_PATH = os.path.join(DATA_BASE_DIR, "temp")
+UPLOADS_BASE_PATH = os.path.join(DATA_BASE_DIR, "uploads")  # results of finished jobs until their background upload is done
+ORIGINAL_VIDEO_CACHE_ENABLED = True  # keeps downloaded original videos, so later jobs on the same video skip the download
+ORIGINAL_VIDEO_CACHE_PATH = os.environ.get("ORIGINAL_VIDEO_CACHE_DIR", os.path.join(DATA_BASE_DIR, "original_cache"))  # mount a common volume to share it between the workers of a host
+ORIGINAL_VIDEO_CACHE_MAX_BYTES = 20 * 1024**3  # disk budget of the cached videos, least recently used are removed first
 IMPLEMENTED_VIDEO_PARTS = ["body", "face", "background"]
-DATA_BASE_DIR = "/local_data"
 DOCKER_MODELS_CONFIG_PATH = "/app/docker_worker/configs"
 AVAILABLE_DOCKER_MODELS = ["roop", "blender"]
+DEFAULT_INFERENCE_RESOLUTION = 1280  # max. side length of frames passed to the models, None for full resolution
+MODEL_REGISTRY_MAX_BYTES = 2 * 1024**3  # memory budget for models kept loaded between jobs
+MODEL_REGISTRY_SIZE_FACTOR = 3  # estimated memory of a loaded model relative to its file size
+WORKER_CAPACITY = 1  # number of jobs a worker processes at the same time
+WORKER_POLL_INTERVAL_SECONDS = 10  # wait before asking for a job again when the request failed
+WORKER_JOB_WAIT_SECONDS = 20  # idle workers wait this long in their request for the next job, so new jobs are claimed as soon as they are created
+WORKER_PREFETCH_NEXT_JOB = True  # claims the next job and downloads its video while the current job is finishing
+WORKER_PREFETCH_AT_PROGRESS = 80  # progress (in %) of the current job from which the next job is claimed, at the latest when its results are uploaded
+WORKER_BACKGROUND_UPLOADS = True  # uploads the results of a job on a background thread while the next job is processed
+WORKER_DISK_BUDGET_BYTES = 20 * 1024**3  # disk space for pending uploads and a prefetched video, the worker waits for uploads above it
+THREAD_BUDGET = None  # CPU threads shared by all libraries of a worker (split between processes and jobs), None for the CPUs available to the container
+THREAD_BUDGET_PIN_CPUS = False  # pins the processes of multi process modes to disjoint CPUs, also bounds libraries without thread options (MediaPipe)
+PARALLEL_MODEL_PROCESSES = False  # runs each detector and mask extractor of a video job in its own process, reading the frames from shared memory
+FRAME_RING_SLOTS = 4  # frames in flight between the decoder and the model processes
+MODEL_PROCESS_TIMEOUT_SECONDS = 300  # max. wait for a model process to load its models or return the results of a frame
+MASK_TRACKS_ENABLED = True  # persists the detection masks of a video, so jobs that only change the hiding skip inference
+MASK_TRACKS_BASE_PATH = os.path.join(DATA_BASE_DIR, "mask_tracks")  # kept between jobs
+MASK_TRACKS_MAX_BYTES = 5 * 1024**3  # disk budget of the stored mask tracks, least recently used are removed first
+LANDMARK_CACHE_ENABLED = True  # persists the MediaPipe landmarks of a video, so skeleton, face mesh and blendshapes can be re-rendered without inference
+LANDMARK_CACHE_BASE_PATH = os.path.join(DATA_BASE_DIR, "landmark_cache")  # kept between jobs
+LANDMARK_CACHE_MAX_BYTES = 5 * 1024**3  # disk budget of the landmark caches, least recently used are removed first
+FRAME_PREVIEW_PORT = 8001  # port of the single frame preview server (frame_preview_worker.py)
+FRAME_PREVIEW_JPEG_QUALITY = 85
+TRACING_ENABLED = False  # records per stage timings of every job, can also be requested per run with run params "tracing"
+TRACING_MAX_EVENTS = 500000  # spans kept for the Chrome trace of a job, later spans only count towards the stage summary
+METRICS_PORT = 9100  # port of the /metrics endpoint of each worker, None disables it
+BATCH_PROCESS_MEMORY_BYTES = 3 * 1024**3  # estimated peak memory of one process of the local batch CLI (pipeline_worker.batch), limits the pool size
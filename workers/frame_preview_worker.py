@@ -0,0 +1,74 @@
+import json
+import base64
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import cv2
+import numpy as np
+
+from pipeline_worker.utils.thread_budget import thread_budget
+
+# before the model libraries are imported, some only read their thread settings on import
+thread_budget.configure()
+
+from pipeline_worker.pipeline.FramePreviewRenderer import FramePreviewRenderer
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from config import FRAME_PREVIEW_PORT, FRAME_PREVIEW_JPEG_QUALITY
+
+renderer = FramePreviewRenderer()
+
+
+class FramePreviewRequestHandler(BaseHTTPRequestHandler):
+    # POST /render with {"frame": base64 encoded image, "run_data": {...}}, returns a JPEG
+
+    def do_POST(self):
+        if self.path != "/render":
+            self.send_error(404)
+            return
+
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(content_length))
+            frame_data = np.frombuffer(base64.b64decode(request["frame"]), dtype=np.uint8)
+            frame = cv2.imdecode(frame_data, cv2.IMREAD_COLOR)
+            if frame is None:
+                raise Exception("Could not decode frame")
+            run_data = request["run_data"]
+        except Exception as error:
+            self.send_error(400, str(error))
+            return
+
+        try:
+            output_frame = renderer.render(frame, run_data)
+        except Exception as error:
+            print("Rendering frame preview failed")
+            print(error)
+            self.send_error(500, str(error))
+            return
+
+        _ret, image = cv2.imencode(
+            ".jpg", output_frame, [cv2.IMWRITE_JPEG_QUALITY, FRAME_PREVIEW_JPEG_QUALITY]
+        )
+        content = image.tobytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self.send_error(404)
+            return
+
+        content = json.dumps(model_registry.get_stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+# Requests are handled one after another, the models are not shared between threads
+server = HTTPServer(("0.0.0.0", FRAME_PREVIEW_PORT), FramePreviewRequestHandler)
+print(f"Frame preview worker listening on port {FRAME_PREVIEW_PORT}")
+server.serve_forever()
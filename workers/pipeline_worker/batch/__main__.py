@@ -0,0 +1,136 @@
+"""
+Hiding and masking of a directory of videos without the backend, run from the workers directory:
+
+    python -m pipeline_worker.batch archive/ masked/ --run-data run_data.json
+
+The run data is the JSON of a job ("videoMasking", "voiceMasking", ...). Every video
+below the input directory gets a directory with its results in the output directory,
+mirroring the input structure and named like the video (masked/a/clip.mp4/video.mp4).
+Videos whose output directory exists are skipped, so an interrupted batch continues
+where it stopped. Docker models are not supported.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m pipeline_worker.batch", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("input_dir", help="directory with the videos, searched recursively")
+    parser.add_argument("output_dir", help="directory for the results")
+    parser.add_argument(
+        "--run-data", required=True, help="JSON file with the run data of a job"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        help="size of the process pool, by default sized to the cores and the available memory",
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="directory for intermediate files and stored mask tracks, by default OUTPUT_DIR/.work",
+    )
+    return parser.parse_args(args)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def print_summary(summary: dict):
+    print(
+        f"{summary['done']} done, {summary['skipped']} skipped, {summary['failed']} failed "
+        f"of {summary['videos']} videos in {format_duration(summary['wall_seconds'])} "
+        f"with {summary['processes']} processes"
+    )
+    print(
+        f"{summary['frames']} frames, {summary['fps']} fps "
+        f"({summary['fps_per_process']} fps per process), "
+        f"{summary['videos_per_hour']} videos per hour, "
+        f"{summary['realtime_factor']}x real time"
+    )
+    for relative_path, error in summary["failures"].items():
+        print(f"  failed {relative_path}: {error}")
+
+
+def main(args) -> int:
+    options = parse_args(args)
+    output_dir = os.path.abspath(options.output_dir)
+    # has to be set before config is imported, the pool processes inherit it
+    os.environ["LOCAL_DATA_DIR"] = os.path.abspath(
+        options.work_dir or os.path.join(output_dir, ".work")
+    )
+    os.makedirs(os.environ["LOCAL_DATA_DIR"], exist_ok=True)
+
+    from pipeline_worker.batch.runner import (
+        find_videos,
+        get_output_dir,
+        get_pool_size,
+        init_process,
+        process_video,
+        summarize,
+    )
+    from pipeline_worker.utils.thread_budget import thread_budget
+    from common.utils.app_utils import init_directories
+
+    with open(options.run_data, "r") as f:
+        run_data = json.load(f)
+
+    tasks = []
+    skipped = 0
+    for relative_path in find_videos(options.input_dir, output_dir):
+        video_output_dir = get_output_dir(output_dir, relative_path)
+        if os.path.exists(video_output_dir):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(video_output_dir), exist_ok=True)
+        tasks.append(
+            {
+                "relative_path": relative_path,
+                "input_path": os.path.join(options.input_dir, relative_path),
+                "output_dir": video_output_dir,
+                "run_data": run_data,
+            }
+        )
+    print(f"{len(tasks)} videos to process, {skipped} already processed")
+    if not tasks:
+        return 0
+
+    init_directories()
+    processes = options.processes or get_pool_size(len(tasks))
+    print(f"Starting {processes} processes")
+    # sets the thread variables of the environment the pool processes are started with
+    thread_budget.configure(processes=processes)
+
+    results = []
+    start_time = time.perf_counter()
+    # spawned instead of forked, MediaPipe and torch do not survive a fork with running threads
+    context = multiprocessing.get_context("spawn")
+    process_counter = context.Value("i", 0)
+    with context.Pool(
+        processes, initializer=init_process, initargs=(processes, process_counter)
+    ) as pool:
+        for result in pool.imap_unordered(process_video, tasks):
+            results.append(result)
+            print(
+                f"[{len(results)}/{len(tasks)}] {result['status']} {result['relative_path']} "
+                f"in {result['seconds']:.1f} s"
+            )
+    wall_seconds = time.perf_counter() - start_time
+
+    summary = summarize(results, skipped, wall_seconds, processes)
+    print_summary(summary)
+    with open(os.path.join(output_dir, "batch_summary.json"), "w") as f:
+        json.dump({**summary, "results": results}, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,26 @@
+class LocalBackendClient:
+    """
+    Stands in for the BackendClient when videos are processed locally by the batch CLI.
+    Progress is printed instead of being sent, results stay on the local disk.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.last_progress = None
+
+    def update_progress(self, job_id: str, progress: int):
+        # only every 25%, the log of a batch run would be unreadable otherwise
+        if self.last_progress is None or progress // 25 != self.last_progress // 25:
+            print(f"{self.name}: {progress}%")
+        self.last_progress = progress
+
+    def upload_job_stage_timings(self, job_id: str, stage_timings: dict):
+        pass
+
+    def create_job(self, job_type: str, video_id: str, arguments: dict):
+        raise Exception(
+            f"Docker models ({job_type}) need the backend, they can not run in local batches"
+        )
+
+    def fetch_job_status(self, job_id: str):
+        raise Exception("Local batches have no sub jobs")
@@ -0,0 +1,207 @@
+import os
+import glob
+import time
+import shutil
+import hashlib
+import traceback
+
+from pipeline_worker.utils.thread_budget import thread_budget
+from pipeline_worker.pipeline.Pipeline import Pipeline
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.batch.local_backend_client import LocalBackendClient
+from pipeline_worker.utils.video_metadata import get_video_metadata
+from common.utils.runparams_utils import produces_out_vid
+from config import (
+    BATCH_PROCESS_MEMORY_BYTES,
+    BLENDSHAPES_BASE_PATH,
+    RESULT_BASE_PATH,
+    TEMP_PATH,
+    TS_BASE_PATH,
+    VIDEOS_BASE_PATH,
+)
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+PARTIAL_SUFFIX = ".partial"
+
+# result file in the local data directory -> name in the output directory of a video
+OUTPUT_FILES = {
+    os.path.join(RESULT_BASE_PATH, "{video_id}.mp4"): "video.mp4",
+    os.path.join(RESULT_BASE_PATH, "{video_id}.png"): "preview.png",
+    os.path.join(RESULT_BASE_PATH, "{video_id}.mp3"): "audio.mp3",
+    os.path.join(TS_BASE_PATH, "body_{video_id}.json"): "kinematics_body.json",
+    os.path.join(TS_BASE_PATH, "face_{video_id}.json"): "kinematics_face.json",
+    os.path.join(BLENDSHAPES_BASE_PATH, "{video_id}.json"): "blendshapes.json",
+}
+
+
+def find_videos(input_dir: str, output_dir: str) -> list:
+    # relative paths of all videos below input_dir, the largest first to balance the pool
+    videos = []
+    for directory, directories, file_names in os.walk(input_dir):
+        # the output directory may be inside the input directory
+        directories[:] = [
+            name
+            for name in directories
+            if os.path.abspath(os.path.join(directory, name)) != output_dir
+        ]
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() in VIDEO_EXTENSIONS:
+                path = os.path.join(directory, file_name)
+                videos.append((os.path.getsize(path), os.path.relpath(path, input_dir)))
+    return [relative_path for _size, relative_path in sorted(videos, reverse=True)]
+
+
+def get_output_dir(output_dir: str, relative_path: str) -> str:
+    # mirrors the input directory, with one directory per video named like the video,
+    # the extension keeps clip.mp4 and clip.mov apart
+    return os.path.join(output_dir, relative_path)
+
+
+def get_batch_video_id(relative_path: str, input_path: str) -> str:
+    # stable for an unchanged input file, so stored mask tracks are reused when a batch
+    # is resumed, but not for a replaced file at the same path
+    stat = os.stat(input_path)
+    key = f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}"
+    return "batch-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_available_memory() -> int:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def get_pool_size(video_count: int) -> int:
+    # one process per core, as long as the estimated memory of the processes is available
+    by_cores = os.cpu_count() or 1
+    by_memory = max(1, get_available_memory() // BATCH_PROCESS_MEMORY_BYTES)
+    return max(1, min(by_cores, by_memory, video_count))
+
+
+def init_process(processes: int, process_counter):
+    # the processes share the thread budget, the libraries would otherwise start a thread per core in each
+    with process_counter.get_lock():
+        process_index = process_counter.value
+        process_counter.value += 1
+    thread_budget.configure(processes=processes, process_index=process_index)
+
+
+def link_input_video(input_path: str, video_id: str) -> str:
+    video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+    if os.path.lexists(video_path):
+        os.remove(video_path)
+    try:
+        os.symlink(os.path.abspath(input_path), video_path)
+    except OSError:
+        shutil.copyfile(input_path, video_path)
+    return video_path
+
+
+def remove_intermediate_files(video_id: str):
+    # mask tracks and landmark caches are kept, they are pruned by their disk budget
+    for base_path in [
+        VIDEOS_BASE_PATH,
+        RESULT_BASE_PATH,
+        TS_BASE_PATH,
+        BLENDSHAPES_BASE_PATH,
+        TEMP_PATH,
+    ]:
+        for path in glob.glob(os.path.join(base_path, f"*{video_id}*")):
+            if os.path.isfile(path) or os.path.islink(path):
+                os.remove(path)
+
+
+def collect_outputs(video_id: str, output_dir: str) -> int:
+    """
+    Moves the results of a video into output_dir and returns their size. The files
+    are moved into a partial directory first, which is renamed once all are in place,
+    so an existing output directory always holds complete results.
+    """
+    partial_dir = output_dir + PARTIAL_SUFFIX
+    if os.path.exists(partial_dir):
+        shutil.rmtree(partial_dir)
+    os.makedirs(partial_dir)
+
+    output_bytes = 0
+    for local_path, output_name in OUTPUT_FILES.items():
+        local_path = local_path.format(video_id=video_id)
+        if os.path.exists(local_path):
+            output_bytes += os.path.getsize(local_path)
+            shutil.move(local_path, os.path.join(partial_dir, output_name))
+    os.rename(partial_dir, output_dir)
+    return output_bytes
+
+
+def process_video(task: dict) -> dict:
+    """
+    Runs the Pipeline on one video of the batch. Runs in a pool process, whose model
+    registry keeps the models loaded for the next videos.
+    """
+    relative_path = task["relative_path"]
+    result = {"relative_path": relative_path, "frames": 0, "duration": 0.0}
+    start_time = time.perf_counter()
+    video_id = None
+    try:
+        video_id = get_batch_video_id(relative_path, task["input_path"])
+        video_path = link_input_video(task["input_path"], video_id)
+        video_metadata = get_video_metadata(video_id, video_path)
+        result["frames"] = video_metadata["frame_count"]
+        result["duration"] = video_metadata["duration"]
+
+        model_registry.begin_job()
+        pipeline = Pipeline(LocalBackendClient(relative_path), None)
+        try:
+            pipeline.run(video_id, video_id, task["run_data"])
+        finally:
+            model_registry.end_job()
+        if produces_out_vid(task["run_data"]) and not os.path.exists(
+            os.path.join(RESULT_BASE_PATH, video_id + ".mp4")
+        ):
+            raise Exception("The pipeline did not write a result video")
+
+        result["output_bytes"] = collect_outputs(video_id, task["output_dir"])
+        result["status"] = "done"
+    except Exception as error:
+        traceback.print_exc()
+        result["status"] = "failed"
+        result["error"] = str(error)
+    finally:
+        if video_id is not None:
+            remove_intermediate_files(video_id)
+    result["seconds"] = time.perf_counter() - start_time
+    result["pid"] = os.getpid()
+    return result
+
+
+def summarize(results: list, skipped: int, wall_seconds: float, processes: int) -> dict:
+    done = [result for result in results if result["status"] == "done"]
+    frames = sum(result["frames"] for result in done)
+    duration = sum(result["duration"] for result in done)
+    busy_seconds = sum(result["seconds"] for result in results)
+    return {
+        "videos": len(results) + skipped,
+        "done": len(done),
+        "skipped": skipped,
+        "failed": len(results) - len(done),
+        "processes": processes,
+        "wall_seconds": round(wall_seconds, 2),
+        "frames": frames,
+        "fps": round(frames / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "fps_per_process": round(frames / busy_seconds, 2) if busy_seconds > 0 else 0.0,
+        "videos_per_hour": round(len(done) * 3600 / wall_seconds, 1)
+        if wall_seconds > 0
+        else 0.0,
+        # seconds of video processed per second, above 1 is faster than real time
+        "realtime_factor": round(duration / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "output_bytes": sum(result.get("output_bytes", 0) for result in done),
+        "failures": {
+            result["relative_path"]: result["error"]
+            for result in results
+            if result["status"] == "failed"
+        },
+    }
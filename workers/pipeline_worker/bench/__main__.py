@@ -0,0 +1,141 @@
+"""
+Offline benchmark of the video pipeline, run from the workers directory:
+
+    python -m pipeline_worker.bench --preset blurBody --fake-models
+    python -m pipeline_worker.bench --video clip.mp4 --run-data run_data.json --mode pipeline
+
+Without --video a synthetic video is generated. Results are written to LOCAL_DATA_DIR
+(a temporary directory unless set), the backend is replaced by a stub.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+# has to be set before config is imported
+os.environ.setdefault(
+    "LOCAL_DATA_DIR", os.path.join(tempfile.gettempdir(), "pipeline_bench")
+)
+
+from pipeline_worker.utils.thread_budget import thread_budget
+
+# same thread settings as a worker, before the model libraries are imported
+thread_budget.configure()
+
+from pipeline_worker.bench.presets import BENCH_PRESETS
+from pipeline_worker.bench.runner import run_benchmark
+from pipeline_worker.bench.synthetic_video import generate_synthetic_video
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m pipeline_worker.bench", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--video", help="video to process, a synthetic video if omitted")
+    parser.add_argument("--width", type=int, default=1280, help="synthetic video width")
+    parser.add_argument("--height", type=int, default=720, help="synthetic video height")
+    parser.add_argument("--fps", type=float, default=30, help="synthetic video frame rate")
+    parser.add_argument(
+        "--duration", type=float, default=10, help="synthetic video length in seconds"
+    )
+    run_data_group = parser.add_mutually_exclusive_group()
+    run_data_group.add_argument("--run-data", help="JSON file with the run data of a job")
+    run_data_group.add_argument(
+        "--preset", choices=sorted(BENCH_PRESETS), default="blurBody"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["basic", "pipeline"],
+        default="basic",
+        help="run only BasicHidingMasking or the whole Pipeline (audio, docker wait, preview image)",
+    )
+    parser.add_argument(
+        "--fake-models",
+        action="store_true",
+        help="replace detectors and mask extractors, no model files are needed",
+    )
+    parser.add_argument(
+        "--use-result-caches",
+        action="store_true",
+        help="read and write mask tracks and landmark caches like a worker",
+    )
+    parser.add_argument(
+        "--parallel-models",
+        action="store_true",
+        help="run each model in its own process (PARALLEL_MODEL_PROCESSES)",
+    )
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    return parser.parse_args(args)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GiB"
+
+
+def print_report(report: dict):
+    video = report["video"]
+    print(
+        f"{video['width']}x{video['height']} @ {video['fps']} fps, "
+        f"mode {report['mode']}, fake models {report['fake_models']}, "
+        f"parallel models {report['parallel_models']}"
+    )
+    print(f"{report['frames']} frames in {report['seconds']} s: {report['fps']} fps")
+    print(f"Peak RSS: {format_bytes(report['peak_rss_bytes'])}")
+    print(
+        "Output: "
+        + ", ".join(
+            f"{name} {format_bytes(size)}"
+            for name, size in report["output_bytes"].items()
+        )
+    )
+    print(f"{'stage':<40}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}")
+    for name, stage in report["stages"].items():
+        print(
+            f"{name:<40}{stage['count']:>8}{stage['total_ms']:>12.1f}"
+            f"{stage['mean_ms']:>10.2f}{stage['max_ms']:>10.2f}"
+        )
+
+
+def main(args):
+    options = parse_args(args)
+
+    if options.run_data:
+        with open(options.run_data, "r") as f:
+            run_data = json.load(f)
+    else:
+        run_data = BENCH_PRESETS[options.preset]
+
+    video_path = options.video
+    if video_path is None:
+        video_path = os.path.join(
+            os.environ["LOCAL_DATA_DIR"],
+            f"synthetic_{options.width}x{options.height}_{options.fps:g}fps_{options.duration:g}s.mp4",
+        )
+        if not os.path.exists(video_path):
+            os.makedirs(os.path.dirname(video_path), exist_ok=True)
+            print(f"Generating synthetic video {video_path}")
+            generate_synthetic_video(
+                video_path, options.width, options.height, options.fps, options.duration
+            )
+
+    report = run_benchmark(
+        video_path,
+        run_data,
+        options.mode,
+        options.fake_models,
+        options.use_result_caches,
+        options.parallel_models,
+    )
+    print_report(report)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+main(sys.argv[1:])
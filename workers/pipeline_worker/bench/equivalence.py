@@ -0,0 +1,532 @@
+"""
+Golden output comparison of an optimized configuration with the reference
+BasicHidingMasking on the same video, run from the workers directory:
+
+    python -m pipeline_worker.bench.equivalence --preset blurBody --fake-models --candidate-use-result-caches
+    python -m pipeline_worker.bench.equivalence --video clip.mp4 --candidate-class my_module:FastHidingMasking
+
+Per frame the hiding masks (mask IoU), the hidden frames (pixels changed by the
+reference but left as in the original by the candidate), the landmarks of the
+timeseries (RMSE in pixels) and the output videos (PSNR) are compared. The run exits
+with status 1 if a threshold is violated.
+"""
+import os
+import sys
+import glob
+import json
+import math
+import shutil
+import argparse
+import importlib
+import tempfile
+
+# has to be set before config is imported
+os.environ.setdefault(
+    "LOCAL_DATA_DIR", os.path.join(tempfile.gettempdir(), "pipeline_bench")
+)
+
+import cv2
+import numpy as np
+
+from pipeline_worker.bench.presets import BENCH_PRESETS
+from pipeline_worker.bench.runner import (
+    BenchHidingMasking,
+    BenchPipeline,
+    get_bench_video_id,
+)
+from pipeline_worker.bench.stub_backend_client import StubBackendClient
+from pipeline_worker.bench.synthetic_video import generate_synthetic_video
+from pipeline_worker.pipeline.hiding import Hider
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from common.utils.app_utils import init_directories
+from config import (
+    LANDMARK_CACHE_BASE_PATH,
+    MASK_TRACKS_BASE_PATH,
+    RESULT_BASE_PATH,
+    VIDEOS_BASE_PATH,
+)
+
+DEFAULT_THRESHOLDS = {
+    "min_mask_iou": 0.99,  # per frame, of the union of all hiding masks
+    "max_exposed_pixels": 0,  # per frame, changed by the hiding of the reference but not of the candidate
+    "max_landmark_rmse_px": 1.0,  # per frame, over all landmarks of the timeseries
+    "min_psnr_db": 40.0,  # per frame, of the output videos
+}
+
+
+class FrameRecorder:
+    """
+    Frame observer of a BasicHidingMasking run, keeps the hiding masks and the pixels
+    changed by the hiding (bit packed, in frame resolution) and the landmarks of every
+    frame for the comparison.
+    """
+
+    def __init__(self):
+        self.frames = []
+        self.hider = Hider({})
+
+    def __call__(self, frame_record: dict):
+        frame_shape = frame_record["frame"].shape
+        masks = {}
+        for detection_result in frame_record["detection_results"]:
+            mask = (
+                self.hider.scale_mask(detection_result["mask"], frame_shape) != 0
+            )
+            if mask.ndim == 3:
+                mask = mask.any(axis=2)
+            part_name = detection_result["part_name"]
+            masks[part_name] = mask if part_name not in masks else masks[part_name] | mask
+        # the masks do not show whether the hiding covered them, the hidden frame does
+        changed = (frame_record["hidden_frame"] != frame_record["frame"]).any(axis=2)
+        self.frames.append(
+            {
+                "timestamp_ms": frame_record["timestamp_ms"],
+                "shape": frame_shape[:2],
+                "masks": {
+                    part_name: np.packbits(mask) for part_name, mask in masks.items()
+                },
+                "changed": np.packbits(changed),
+                "landmarks": {
+                    part_name: get_landmark_points(part_timeseries)
+                    for part_name, part_timeseries in frame_record["timeseries"].items()
+                },
+            }
+        )
+
+    @staticmethod
+    def unpack_mask(frame: dict, part_name: str) -> np.ndarray:
+        height, width = frame["shape"]
+        packed_mask = frame["masks"].get(part_name)
+        if packed_mask is None:
+            return np.zeros((height, width), dtype=bool)
+        return unpack_bits(packed_mask, height, width)
+
+    @staticmethod
+    def unpack_changed(frame: dict) -> np.ndarray:
+        height, width = frame["shape"]
+        return unpack_bits(frame["changed"], height, width)
+
+
+def unpack_bits(packed: np.ndarray, height: int, width: int) -> np.ndarray:
+    return np.unpackbits(packed, count=height * width).reshape(height, width).astype(bool)
+
+
+def get_landmark_points(part_timeseries: dict) -> dict:
+    # landmark name -> (x, y) relative to the frame size, body timeseries nest the landmarks
+    landmarks = part_timeseries.get("landmarks", part_timeseries)
+    return {
+        name: (value["x"], value["y"])
+        for name, value in landmarks.items()
+        if isinstance(value, dict)
+    }
+
+
+def mask_iou(reference_mask: np.ndarray, candidate_mask: np.ndarray) -> float:
+    union = np.count_nonzero(reference_mask | candidate_mask)
+    if union == 0:
+        return 1.0
+    return float(np.count_nonzero(reference_mask & candidate_mask)) / union
+
+
+def count_exposed_pixels(reference_hidden: np.ndarray, candidate_hidden: np.ndarray) -> int:
+    # pixels hidden (masked or changed) by the reference but not by the candidate
+    return int(np.count_nonzero(reference_hidden & ~candidate_hidden))
+
+
+def landmark_rmse_px(
+    reference_landmarks: dict, candidate_landmarks: dict, width: int, height: int
+) -> tuple:
+    """
+    Returns the RMSE of the landmarks found in both runs in pixels (None without
+    common landmarks) and the number of landmarks found in only one of the runs.
+    """
+    squared_errors = []
+    mismatches = 0
+    for part_name in set(reference_landmarks) | set(candidate_landmarks):
+        reference_points = reference_landmarks.get(part_name, {})
+        candidate_points = candidate_landmarks.get(part_name, {})
+        mismatches += len(set(reference_points) ^ set(candidate_points))
+        for name in set(reference_points) & set(candidate_points):
+            (reference_x, reference_y), (candidate_x, candidate_y) = (
+                reference_points[name],
+                candidate_points[name],
+            )
+            squared_errors.append(
+                ((reference_x - candidate_x) * width) ** 2
+                + ((reference_y - candidate_y) * height) ** 2
+            )
+    if not squared_errors:
+        return None, mismatches
+    return math.sqrt(sum(squared_errors) / len(squared_errors)), mismatches
+
+
+def psnr(reference_frame: np.ndarray, candidate_frame: np.ndarray) -> float:
+    if reference_frame.shape != candidate_frame.shape:
+        return 0.0
+    mse = np.mean(
+        (reference_frame.astype(np.float32) - candidate_frame.astype(np.float32)) ** 2
+    )
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255.0**2 / mse)
+
+
+def compare_videos(reference_path: str, candidate_path: str) -> list:
+    # PSNR per frame of two result videos, empty if one of them was not written
+    if not (os.path.exists(reference_path) and os.path.exists(candidate_path)):
+        return []
+    reference_cap = cv2.VideoCapture(reference_path)
+    candidate_cap = cv2.VideoCapture(candidate_path)
+    values = []
+    while True:
+        reference_ret, reference_frame = reference_cap.read()
+        candidate_ret, candidate_frame = candidate_cap.read()
+        if not (reference_ret and candidate_ret):
+            break
+        values.append(psnr(reference_frame, candidate_frame))
+    reference_cap.release()
+    candidate_cap.release()
+    return values
+
+
+def load_hiding_masking_class(class_path: str):
+    # "module:Class" of a BasicHidingMasking subclass
+    module_name, _, class_name = class_path.partition(":")
+    hiding_masking_class = getattr(importlib.import_module(module_name), class_name)
+    # keeps the fake models and result cache options of the benchmark
+    bases = (BenchHidingMasking, hiding_masking_class)
+    return type(
+        "Bench" + hiding_masking_class.__name__, bases, {"model_process_bases": bases}
+    )
+
+
+def clear_result_caches(video_id: str):
+    for base_path in [MASK_TRACKS_BASE_PATH, LANDMARK_CACHE_BASE_PATH]:
+        for path in glob.glob(os.path.join(base_path, f"{video_id}_*")):
+            os.remove(path)
+
+
+def run_configuration(
+    video_id: str, configuration: dict, fake_models: bool, result_path: str
+) -> FrameRecorder:
+    """
+    Runs BasicHidingMasking with the run data of the configuration, keeps the result
+    video at result_path and returns the recorded frames.
+    """
+    recorder = FrameRecorder()
+    pipeline = BenchPipeline(
+        StubBackendClient(),
+        fake_models,
+        configuration.get("use_result_caches", False),
+        configuration.get("parallel_models", False),
+    )
+    if configuration.get("hiding_masking_class") is not None:
+        pipeline.basic_hiding_masking_class = configuration["hiding_masking_class"]
+    pipeline.frame_observers = [recorder]
+
+    model_registry.begin_job()
+    pipeline.run_basic_hiding_masking(video_id, "equivalence", configuration["run_data"])
+    output_path = os.path.join(RESULT_BASE_PATH, video_id + ".mp4")
+    if os.path.exists(output_path):
+        shutil.move(output_path, result_path)
+    return recorder
+
+
+def get_stats(values: list) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {"min": min(values), "mean": sum(values) / len(values), "max": max(values)}
+
+
+def compare_recordings(
+    reference: FrameRecorder, candidate: FrameRecorder, psnr_values: list, thresholds: dict
+) -> dict:
+    failures = []
+    if len(reference.frames) != len(candidate.frames):
+        failures.append(
+            f"frame count differs: {len(reference.frames)} reference, {len(candidate.frames)} candidate"
+        )
+
+    frames = []
+    parts = {}
+    total_mismatches = 0
+    for index, (reference_frame, candidate_frame) in enumerate(
+        zip(reference.frames, candidate.frames)
+    ):
+        if reference_frame["timestamp_ms"] != candidate_frame["timestamp_ms"]:
+            failures.append(f"frame {index}: timestamps differ")
+        height, width = reference_frame["shape"]
+        reference_union = np.zeros((height, width), dtype=bool)
+        candidate_union = np.zeros((height, width), dtype=bool)
+        for part_name in set(reference_frame["masks"]) | set(candidate_frame["masks"]):
+            reference_mask = FrameRecorder.unpack_mask(reference_frame, part_name)
+            candidate_mask = FrameRecorder.unpack_mask(candidate_frame, part_name)
+            part = parts.setdefault(part_name, {"iou": [], "exposed_mask_pixels": 0})
+            part["iou"].append(mask_iou(reference_mask, candidate_mask))
+            part["exposed_mask_pixels"] += count_exposed_pixels(
+                reference_mask, candidate_mask
+            )
+            reference_union |= reference_mask
+            candidate_union |= candidate_mask
+
+        rmse, mismatches = landmark_rmse_px(
+            reference_frame["landmarks"], candidate_frame["landmarks"], width, height
+        )
+        total_mismatches += mismatches
+        frames.append(
+            {
+                "index": index,
+                "timestamp_ms": reference_frame["timestamp_ms"],
+                "mask_iou": mask_iou(reference_union, candidate_union),
+                "exposed_pixels": count_exposed_pixels(
+                    FrameRecorder.unpack_changed(reference_frame),
+                    FrameRecorder.unpack_changed(candidate_frame),
+                ),
+                "landmark_rmse_px": rmse,
+                "landmark_mismatches": mismatches,
+                "psnr_db": psnr_values[index] if index < len(psnr_values) else None,
+            }
+        )
+
+    for frame in frames:
+        violations = []
+        if frame["mask_iou"] < thresholds["min_mask_iou"]:
+            violations.append(f"mask IoU {frame['mask_iou']:.4f}")
+        if frame["exposed_pixels"] > thresholds["max_exposed_pixels"]:
+            violations.append(f"{frame['exposed_pixels']} exposed pixels")
+        if (
+            frame["landmark_rmse_px"] is not None
+            and frame["landmark_rmse_px"] > thresholds["max_landmark_rmse_px"]
+        ):
+            violations.append(f"landmark RMSE {frame['landmark_rmse_px']:.2f} px")
+        if frame["landmark_mismatches"] > 0:
+            violations.append(f"{frame['landmark_mismatches']} landmarks missing in one run")
+        if frame["psnr_db"] is not None and frame["psnr_db"] < thresholds["min_psnr_db"]:
+            violations.append(f"PSNR {frame['psnr_db']:.1f} dB")
+        if violations:
+            failures.append(f"frame {frame['index']}: " + ", ".join(violations))
+
+    return {
+        "frames": {
+            "reference": len(reference.frames),
+            "candidate": len(candidate.frames),
+        },
+        "thresholds": thresholds,
+        "summary": {
+            "mask_iou": get_stats([frame["mask_iou"] for frame in frames]),
+            "exposed_pixels": get_stats([frame["exposed_pixels"] for frame in frames]),
+            "landmark_rmse_px": get_stats(
+                [frame["landmark_rmse_px"] for frame in frames]
+            ),
+            "landmark_mismatches": total_mismatches,
+            "psnr_db": get_stats([frame["psnr_db"] for frame in frames]),
+        },
+        "parts": {
+            part_name: {
+                "min_iou": min(part["iou"]),
+                "mean_iou": sum(part["iou"]) / len(part["iou"]),
+                "exposed_mask_pixels": part["exposed_mask_pixels"],
+            }
+            for part_name, part in parts.items()
+        },
+        "per_frame": frames,
+        "failures": failures,
+        "passed": not failures,
+    }
+
+
+def run_equivalence(
+    video_path: str,
+    reference: dict,
+    candidate: dict,
+    fake_models: bool = False,
+    thresholds: dict = None,
+) -> dict:
+    """
+    Runs the reference and the candidate configuration on a local video and compares
+    their outputs frame by frame. A configuration is a dict with the "run_data" of a job
+    and optionally "use_result_caches", "parallel_models" and a "hiding_masking_class" to use.
+    The reference always runs the models, a candidate using the result caches replays
+    the mask tracks and landmarks stored by the reference run.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+    init_directories()
+    video_id = get_bench_video_id(video_path)
+    local_video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+    if not os.path.exists(local_video_path):
+        shutil.copyfile(video_path, local_video_path)
+
+    reference_result_path = os.path.join(RESULT_BASE_PATH, video_id + "_reference.mp4")
+    candidate_result_path = os.path.join(RESULT_BASE_PATH, video_id + "_candidate.mp4")
+    for path in [reference_result_path, candidate_result_path]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    clear_result_caches(video_id)
+    print("Running the reference configuration")
+    reference_recorder = run_configuration(
+        video_id,
+        {
+            **reference,
+            "use_result_caches": candidate.get("use_result_caches", False),
+        },
+        fake_models,
+        reference_result_path,
+    )
+    print("Running the candidate configuration")
+    candidate_recorder = run_configuration(
+        video_id, candidate, fake_models, candidate_result_path
+    )
+
+    psnr_values = compare_videos(reference_result_path, candidate_result_path)
+    report = compare_recordings(
+        reference_recorder, candidate_recorder, psnr_values, thresholds
+    )
+    report["outputs"] = {
+        "reference": reference_result_path,
+        "candidate": candidate_result_path,
+    }
+    return report
+
+
+def format_stats(stats: dict, unit: str = "") -> str:
+    if stats is None:
+        return "n/a"
+    return f"min {stats['min']:.4g}{unit}, mean {stats['mean']:.4g}{unit}, max {stats['max']:.4g}{unit}"
+
+
+def print_report(report: dict):
+    summary = report["summary"]
+    print(
+        f"Frames: {report['frames']['reference']} reference, {report['frames']['candidate']} candidate"
+    )
+    print(f"Mask IoU: {format_stats(summary['mask_iou'])}")
+    print(f"Exposed pixels: {format_stats(summary['exposed_pixels'])}")
+    print(f"Landmark RMSE: {format_stats(summary['landmark_rmse_px'], ' px')}")
+    print(f"Landmark mismatches: {summary['landmark_mismatches']}")
+    print(f"PSNR: {format_stats(summary['psnr_db'], ' dB')}")
+    for part_name, part in report["parts"].items():
+        print(
+            f"  {part_name}: IoU min {part['min_iou']:.4f}, mean {part['mean_iou']:.4f}, "
+            f"{part['exposed_mask_pixels']} mask pixels not masked by the candidate"
+        )
+    if report["passed"]:
+        print("PASSED")
+        return
+    print(f"FAILED, {len(report['failures'])} violations:")
+    for failure in report["failures"][:20]:
+        print(f"  {failure}")
+    if len(report["failures"]) > 20:
+        print(f"  ... and {len(report['failures']) - 20} more")
+
+
+def load_run_data(path: str, preset: str) -> dict:
+    if path:
+        with open(path, "r") as f:
+            return json.load(f)
+    return BENCH_PRESETS[preset]
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m pipeline_worker.bench.equivalence",
+        description=__doc__.split("\n\n")[0],
+    )
+    parser.add_argument("--video", help="video to process, a synthetic video if omitted")
+    parser.add_argument("--width", type=int, default=1280, help="synthetic video width")
+    parser.add_argument("--height", type=int, default=720, help="synthetic video height")
+    parser.add_argument("--fps", type=float, default=30, help="synthetic video frame rate")
+    parser.add_argument(
+        "--duration", type=float, default=3, help="synthetic video length in seconds"
+    )
+    run_data_group = parser.add_mutually_exclusive_group()
+    run_data_group.add_argument(
+        "--run-data", help="JSON file with the run data of the reference"
+    )
+    run_data_group.add_argument(
+        "--preset", choices=sorted(BENCH_PRESETS), default="blurBody"
+    )
+    parser.add_argument(
+        "--candidate-run-data",
+        help="JSON file with the run data of the candidate, the reference run data if omitted",
+    )
+    parser.add_argument(
+        "--candidate-class",
+        help="BasicHidingMasking subclass of the candidate as module:Class",
+    )
+    parser.add_argument(
+        "--candidate-use-result-caches",
+        action="store_true",
+        help="the candidate replays the mask tracks and landmarks of the reference run",
+    )
+    parser.add_argument(
+        "--candidate-parallel-models",
+        action="store_true",
+        help="the candidate runs each model in its own process",
+    )
+    parser.add_argument(
+        "--fake-models",
+        action="store_true",
+        help="replace detectors and mask extractors in both runs, no model files are needed",
+    )
+    for name, value in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=type(value),
+            default=value,
+            help=f"threshold, default {value}",
+        )
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    return parser.parse_args(args)
+
+
+def main(args) -> int:
+    options = parse_args(args)
+
+    video_path = options.video
+    if video_path is None:
+        video_path = os.path.join(
+            os.environ["LOCAL_DATA_DIR"],
+            f"synthetic_{options.width}x{options.height}_{options.fps:g}fps_{options.duration:g}s.mp4",
+        )
+        if not os.path.exists(video_path):
+            os.makedirs(os.path.dirname(video_path), exist_ok=True)
+            print(f"Generating synthetic video {video_path}")
+            generate_synthetic_video(
+                video_path, options.width, options.height, options.fps, options.duration
+            )
+
+    reference_run_data = load_run_data(options.run_data, options.preset)
+    candidate_run_data = (
+        load_run_data(options.candidate_run_data, options.preset)
+        if options.candidate_run_data
+        else reference_run_data
+    )
+    report = run_equivalence(
+        video_path,
+        {"run_data": reference_run_data},
+        {
+            "run_data": candidate_run_data,
+            "use_result_caches": options.candidate_use_result_caches,
+            "parallel_models": options.candidate_parallel_models,
+            "hiding_masking_class": (
+                load_hiding_masking_class(options.candidate_class)
+                if options.candidate_class
+                else None
+            ),
+        },
+        options.fake_models,
+        {name: getattr(options, name) for name in DEFAULT_THRESHOLDS},
+    )
+    print_report(report)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
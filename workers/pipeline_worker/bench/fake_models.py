@@ -0,0 +1,216 @@
+import math
+from typing import List
+
+import cv2
+import numpy as np
+
+from pipeline_worker.pipeline.PipelineTypes import Params3D, PartToDetect, PartToMask
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.detection.BaseDetector import BaseDetector
+from pipeline_worker.pipeline.mask_extraction.BaseMaskExtractor import BaseMaskExtractor
+from pipeline_worker.utils.landmark_cache import CachedLandmark, CachedPoseResult
+from pipeline_worker.utils.timeseries import (
+    create_header_mp,
+    list_positions_mp_body,
+    list_positions_mp_face,
+)
+from pipeline_worker.bench.synthetic_video import get_subject_layout, to_pixels
+
+POSE_LANDMARK_COUNT = 33
+FACE_LANDMARK_COUNT = 478
+BLENDSHAPE_NAMES = [f"blendshape{index:02d}" for index in range(52)]
+
+
+class FakeDetector(BaseDetector):
+    """
+    Detects the subject of the synthetic benchmark video from its known layout instead
+    of running a model, so hiding, overlay and encoding can be measured without model files.
+    """
+
+    def __init__(self, parts_to_detect: List[PartToDetect]):
+        super().__init__(parts_to_detect)
+        self.silhouette_methods = {
+            "body": self.detect_body_silhouette,
+            "face": self.detect_face_silhouette,
+            "background": self.detect_background_silhouette,
+        }
+        self.boundingbox_methods = {
+            "body": self.detect_body_bbox,
+            "face": self.detect_face_bbox,
+            "background": self.detect_background_bbox,
+        }
+
+    def get_layout(self, frame: np.ndarray, timestamp_ms: int) -> dict:
+        height, width = frame.shape[:2]
+        return to_pixels(get_subject_layout(timestamp_ms), width, height)
+
+    def detect_body_silhouette(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+        body = self.get_layout(frame, timestamp_ms)["body"]
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.ellipse(mask, body["center"], body["axes"], 0, 0, 360, (1, 1, 1), -1)
+        return mask
+
+    def detect_face_silhouette(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+        face = self.get_layout(frame, timestamp_ms)["face"]
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.circle(mask, face["center"], face["radius"], (1, 1, 1), -1)
+        return mask
+
+    def detect_background_silhouette(
+        self, frame: np.ndarray, timestamp_ms: int
+    ) -> np.ndarray:
+        subject = np.maximum(
+            self.detect_body_silhouette(frame, timestamp_ms),
+            self.detect_face_silhouette(frame, timestamp_ms),
+        )
+        return 1 - subject
+
+    def detect_body_bbox(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+        body = self.get_layout(frame, timestamp_ms)["body"]
+        (center_x, center_y), (axis_x, axis_y) = body["center"], body["axes"]
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.rectangle(
+            mask,
+            (center_x - axis_x, center_y - axis_y),
+            (center_x + axis_x, center_y + axis_y),
+            (1, 1, 1),
+            -1,
+        )
+        return mask
+
+    def detect_face_bbox(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+        face = self.get_layout(frame, timestamp_ms)["face"]
+        (center_x, center_y), radius = face["center"], face["radius"]
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.rectangle(
+            mask,
+            (center_x - radius, center_y - radius),
+            (center_x + radius, center_y + radius),
+            (1, 1, 1),
+            -1,
+        )
+        return mask
+
+    def detect_background_bbox(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+        return 1 - self.detect_body_bbox(frame, timestamp_ms)
+
+
+def create_pose_landmarks(timestamp_ms: int) -> list:
+    # landmarks on the outline of the body, in coordinates relative to the frame size like MediaPipe
+    body = get_subject_layout(timestamp_ms)["body"]
+    (center_x, center_y), (axis_x, axis_y) = body["center"], body["axes"]
+    angles = [2 * math.pi * index / POSE_LANDMARK_COUNT for index in range(POSE_LANDMARK_COUNT)]
+    return [
+        CachedLandmark(
+            x=center_x + 0.9 * axis_x * math.cos(angle),
+            y=center_y + 0.9 * axis_y * math.sin(angle),
+            z=0.0,
+            visibility=1.0,
+            presence=1.0,
+        )
+        for angle in angles
+    ]
+
+
+def create_face_landmarks(timestamp_ms: int) -> list:
+    # landmarks on a spiral inside the face circle
+    face = get_subject_layout(timestamp_ms)["face"]
+    (center_x, center_y), radius = face["center"], face["radius"]
+    landmarks = []
+    for index in range(FACE_LANDMARK_COUNT):
+        distance = radius * math.sqrt(index / FACE_LANDMARK_COUNT)
+        angle = index * 2.399963  # golden angle
+        landmarks.append(
+            CachedLandmark(
+                x=center_x + distance * math.cos(angle),
+                y=center_y + distance * math.sin(angle),
+                z=0.0,
+            )
+        )
+    return landmarks
+
+
+class FakeMaskExtractor(BaseMaskExtractor):
+    """
+    Produces synthetic skeleton and face mesh landmarks of the benchmark subject in
+    place of the MediaPipe models, including timeseries and blendshapes.
+    """
+
+    def __init__(self, parts_to_mask: List[PartToMask], params_3d: Params3D):
+        super().__init__(parts_to_mask)
+        self.params_3d = params_3d
+        self.part_methods = {"body": self.mask_body, "face": self.mask_face}
+        self.ts_headers = {
+            "body": create_header_mp("body"),
+            "face": create_header_mp("face"),
+        }
+        self.model_3d_only_parts = []
+        self.handle_3d_options()
+
+    def handle_3d_options(self):
+        # same parts as MediaPipeMaskExtractor.handle_3d_options, 3d only parts are not drawn
+        for part_name, required, masking_method in [
+            ("body", self.params_3d["skeleton"], "skeleton"),
+            ("face", self.params_3d["blendshapes"], "faceMesh"),
+        ]:
+            if not required:
+                continue
+            part = self.get_part_to_mask(part_name)
+            if part is None:
+                self.model_3d_only_parts.append(part_name)
+                self.parts_to_mask.append(
+                    {
+                        "part_name": part_name,
+                        "save_timeseries": True,
+                        "params": {},
+                        "masking_method": masking_method,
+                    }
+                )
+            else:
+                part["save_timeseries"] = True
+
+    def mask_body(self, frame_context: FrameContext, timestamp_ms: int) -> np.ndarray:
+        landmarks = create_pose_landmarks(timestamp_ms)
+        if self.get_part_to_mask("body")["save_timeseries"]:
+            self.timeseries["body"] = list_positions_mp_body(
+                CachedPoseResult([landmarks], [landmarks]), timestamp_ms
+            )
+        if "body" in self.model_3d_only_parts:
+            return None
+        return self.draw_landmarks(frame_context.shape, landmarks, True)
+
+    def mask_face(self, frame_context: FrameContext, timestamp_ms: int) -> np.ndarray:
+        face_part = self.get_part_to_mask("face")
+        if face_part["masking_method"] == "skeleton":
+            if self.get_part_to_mask("body"):
+                return None
+            return self.draw_landmarks(
+                frame_context.shape, create_pose_landmarks(timestamp_ms)[:11], True
+            )
+
+        landmarks = create_face_landmarks(timestamp_ms)
+        if face_part["save_timeseries"]:
+            self.timeseries["face"] = list_positions_mp_face([landmarks], timestamp_ms)
+        if self.params_3d["blendshapes"]:
+            self.current_blendshapes = {
+                "blendshapes": {
+                    name: (index * 37 + timestamp_ms) % 100 / 100.0
+                    for index, name in enumerate(BLENDSHAPE_NAMES)
+                },
+                "transformationMatrices": np.eye(4).flatten("F").tolist(),
+            }
+        if "face" in self.model_3d_only_parts:
+            return None
+        return self.draw_landmarks(frame_context.shape, landmarks, False)
+
+    @staticmethod
+    def draw_landmarks(shape: tuple, landmarks: list, connect: bool) -> np.ndarray:
+        height, width = shape[:2]
+        output_image = np.zeros(shape, dtype=np.uint8)
+        points = [(int(lm.x * width), int(lm.y * height)) for lm in landmarks]
+        if connect:
+            for start, end in zip(points, points[1:] + points[:1]):
+                cv2.line(output_image, start, end, (224, 224, 224), 2)
+        for point in points:
+            cv2.circle(output_image, point, 2 if connect else 1, (48, 255, 48), -1)
+        return output_image
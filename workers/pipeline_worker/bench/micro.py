@@ -0,0 +1,525 @@
+"""
+Micro-benchmarks of the per-frame helpers, run from the workers directory:
+
+    python -m pipeline_worker.bench.micro --save-baseline
+    python -m pipeline_worker.bench.micro --max-regression 25
+
+Every case runs on synthetic 720p, 1080p and 4K inputs (size independent cases once).
+Like pytest-benchmark, a case is warmed up and then timed for a number of rounds. The
+rounds are repeated a few times, interleaved with the other cases, and the best median
+of the repeats is compared with the stored baseline, so a short slowdown of the machine
+does not fail the run. The run exits with status 1 if a case is slower than the baseline
+by more than the allowed percentage. Baselines are only comparable on the machine they
+were recorded on.
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from types import SimpleNamespace
+
+# has to be set before config is imported
+os.environ.setdefault(
+    "LOCAL_DATA_DIR", os.path.join(tempfile.gettempdir(), "pipeline_bench")
+)
+
+import cv2
+import numpy as np
+
+from pipeline_worker.bench.synthetic_video import (
+    create_background,
+    draw_subject,
+    get_subject_layout,
+    to_pixels,
+    generate_synthetic_video,
+)
+
+DEFAULT_BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "micro_baselines.json"
+)
+FRAME_SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+MERGE_VIDEO_FRAMES = 5
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def import_or_skip(module_name: str, attribute: str):
+    # cases of helpers with missing dependencies (torch, mediapipe) are skipped
+    try:
+        module = __import__(module_name, fromlist=[attribute])
+    except ImportError as error:
+        raise SkipBenchmark(f"{module_name} can not be imported: {error}")
+    return getattr(module, attribute)
+
+
+def create_frame(width: int, height: int) -> np.ndarray:
+    return draw_subject(create_background(width, height), 0)
+
+
+def create_body_mask(width: int, height: int) -> np.ndarray:
+    # uint8 mask of the synthetic subject, like the masks of the detectors
+    layout = to_pixels(get_subject_layout(0), width, height)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(
+        mask, layout["body"]["center"], layout["body"]["axes"], 0, 0, 360, 1, -1
+    )
+    return mask
+
+
+def create_segmentation_confidence(width: int, height: int) -> np.ndarray:
+    # float confidences in [0, 1] with a soft border, like MediaPipe segmentation masks
+    mask = create_body_mask(width, height).astype(np.float32)
+    kernel_size = max(3, (min(width, height) // 40) | 1)
+    return cv2.GaussianBlur(mask, (kernel_size, kernel_size), 0)
+
+
+def create_mask_image(width: int, height: int) -> np.ndarray:
+    # BGR mask drawing on black, like the results of the mask extractors
+    mask_image = np.zeros((height, width, 3), dtype=np.uint8)
+    layout = to_pixels(get_subject_layout(0), width, height)
+    cv2.circle(
+        mask_image,
+        layout["face"]["center"],
+        layout["face"]["radius"],
+        (255, 255, 255),
+        2,
+    )
+    cv2.ellipse(
+        mask_image,
+        layout["body"]["center"],
+        layout["body"]["axes"],
+        0,
+        0,
+        360,
+        (0, 255, 0),
+        3,
+    )
+    return mask_image
+
+
+def get_inference_size(width: int, height: int) -> tuple:
+    from config import DEFAULT_INFERENCE_RESOLUTION
+    from pipeline_worker.utils.video_decoder import get_output_size
+
+    return get_output_size(width, height, DEFAULT_INFERENCE_RESOLUTION)
+
+
+# Each case gets the frame size (None for size independent cases) and returns
+# (prepare, run): prepare is called untimed before every round, its result is
+# passed to run. Cases may raise SkipBenchmark.
+
+
+def bench_hide_blur(size):
+    from pipeline_worker.pipeline.hiding import Hider
+
+    hider = Hider({})
+    frame, mask = create_frame(*size), create_body_mask(*size)
+    return frame.copy, lambda image: hider.hide_blur(image, mask, {"kernelSize": 23})
+
+
+def bench_hide_blackout(size):
+    from pipeline_worker.pipeline.hiding import Hider
+
+    hider = Hider({})
+    frame, mask = create_frame(*size), create_body_mask(*size)
+    return frame.copy, lambda image: hider.hide_blackout(image, mask, {"color": 0})
+
+
+def bench_hide_contour_laplacian(size):
+    from pipeline_worker.pipeline.hiding import Hider
+
+    hider = Hider({})
+    frame, mask = create_frame(*size), create_body_mask(*size)
+    return frame.copy, lambda image: hider.hide_contour_laplacian(
+        image, mask, {"level": 3}
+    )
+
+
+def bench_scale_mask(size):
+    from pipeline_worker.pipeline.hiding import Hider
+    from pipeline_worker.utils.video_decoder import get_output_size
+
+    hider = Hider({})
+    frame = create_frame(*size)
+    # frames up to the inference resolution are not downscaled, their masks are scaled
+    # from a smaller size here anyway so the resize is measured for every frame size
+    mask_size = get_inference_size(*size)
+    if mask_size == size:
+        mask_size = get_output_size(*size, max(size) // 2)
+    mask = create_body_mask(*mask_size)
+    return None, lambda: hider.scale_mask(mask, frame.shape)
+
+
+def bench_overlay_frames(size):
+    overlay_frames = import_or_skip("pipeline_worker.utils.drawing_utils", "overlay_frames")
+
+    frame, mask_image = create_frame(*size), create_mask_image(*size)
+    return None, lambda: overlay_frames(frame, [mask_image, mask_image])
+
+
+def bench_overlay_segmask(size):
+    overlay_segmask = import_or_skip(
+        "pipeline_worker.utils.drawing_utils", "overlay_segmask"
+    )
+
+    frame, mask = create_frame(*size), create_body_mask(*size)
+    return None, lambda: overlay_segmask(frame, mask, (255, 0, 0), 0.5)
+
+
+def bench_segmentation_interpolation(size):
+    # the mask interpolation of MediaPipeDetector.detect_body_silhouette, at inference resolution
+    MediaPipeDetector = import_or_skip(
+        "pipeline_worker.pipeline.detection.MediaPipeDetector", "MediaPipeDetector"
+    )
+
+    width, height = get_inference_size(*size)
+    confidence = create_segmentation_confidence(width, height)
+    return (
+        lambda: np.zeros((height, width, 3)),
+        lambda output_image: MediaPipeDetector.apply_segmentation_mask(
+            output_image, confidence
+        ),
+    )
+
+
+def bench_list_positions_mp_body(size):
+    from pipeline_worker.bench.fake_models import create_pose_landmarks
+    from pipeline_worker.utils.landmark_cache import CachedPoseResult
+    from pipeline_worker.utils.timeseries import list_positions_mp_body
+
+    landmarks = create_pose_landmarks(0)
+    pose_result = CachedPoseResult([landmarks], [landmarks])
+    return None, lambda: list_positions_mp_body(pose_result, 0)
+
+
+def bench_list_positions_mp_face(size):
+    from pipeline_worker.bench.fake_models import create_face_landmarks
+    from pipeline_worker.utils.timeseries import list_positions_mp_face
+
+    landmarks = [create_face_landmarks(0)]
+    return None, lambda: list_positions_mp_face(landmarks, 0)
+
+
+def bench_write_timeseries(size):
+    # json.dumps writer of a frame with body and face landmarks, into memory instead of files
+    from pipeline_worker.bench.fake_models import (
+        create_face_landmarks,
+        create_pose_landmarks,
+    )
+    from pipeline_worker.utils.landmark_cache import CachedPoseResult
+    from pipeline_worker.utils.timeseries import (
+        list_positions_mp_body,
+        list_positions_mp_face,
+    )
+
+    BasicHidingMasking = import_or_skip(
+        "pipeline_worker.pipeline.BasicHidingMasking", "BasicHidingMasking"
+    )
+
+    landmarks = create_pose_landmarks(0)
+    timeseries = {
+        "body": list_positions_mp_body(CachedPoseResult([landmarks], [landmarks]), 0),
+        "face": list_positions_mp_face([create_face_landmarks(0)], 0),
+    }
+
+    def prepare():
+        return SimpleNamespace(
+            ts_file_handlers={"body": io.StringIO(), "face": io.StringIO()}
+        )
+
+    return prepare, lambda writer: BasicHidingMasking.write_timeseries(
+        writer, timeseries, False
+    )
+
+
+def bench_merge_results(size):
+    # merges short synthetic videos, the cost is dominated by decoding and encoding
+    from pipeline_worker.utils.video_utils import merge_results
+
+    directory = tempfile.mkdtemp(prefix="micro_merge_")
+    width, height = size
+    paths = {
+        name: os.path.join(directory, f"{name}.mp4")
+        for name in ["original", "diff", "hidden_source"]
+    }
+    for path in paths.values():
+        generate_synthetic_video(path, width, height, 30, MERGE_VIDEO_FRAMES / 30)
+    hidden_path = os.path.join(directory, "hidden.mp4")
+
+    def prepare():
+        # merge_results replaces the hidden video, so every round gets a fresh copy
+        shutil.copyfile(paths["hidden_source"], hidden_path)
+
+    return prepare, lambda _: merge_results(
+        paths["original"], paths["diff"], hidden_path
+    )
+
+
+# name -> (case, runs per frame size, rounds)
+BENCHMARKS = {
+    "hide_blur": (bench_hide_blur, True, 20),
+    "hide_blackout": (bench_hide_blackout, True, 20),
+    "hide_contour_laplacian": (bench_hide_contour_laplacian, True, 20),
+    "scale_mask": (bench_scale_mask, True, 20),
+    "overlay_frames": (bench_overlay_frames, True, 20),
+    "overlay_segmask": (bench_overlay_segmask, True, 20),
+    "segmentation_interpolation": (bench_segmentation_interpolation, True, 20),
+    "list_positions_mp_body": (bench_list_positions_mp_body, False, 200),
+    "list_positions_mp_face": (bench_list_positions_mp_face, False, 200),
+    "write_timeseries": (bench_write_timeseries, False, 200),
+    "merge_results": (bench_merge_results, True, 3),
+}
+
+
+def time_case(prepare, run, rounds: int, warmup_rounds: int) -> list:
+    durations = []
+    for round_index in range(warmup_rounds + rounds):
+        if prepare is None:
+            start_time = time.perf_counter()
+            run()
+        else:
+            prepared = prepare()
+            start_time = time.perf_counter()
+            run(prepared)
+        duration = time.perf_counter() - start_time
+        if round_index >= warmup_rounds:
+            durations.append(duration)
+    return durations
+
+
+def get_stats(repeat_durations: list) -> dict:
+    # durations of the rounds of every repeat
+    durations = [duration for repeat in repeat_durations for duration in repeat]
+    return {
+        "rounds": len(durations),
+        "repeats": len(repeat_durations),
+        "min_ms": round(min(durations) * 1000, 4),
+        "median_ms": round(statistics.median(durations) * 1000, 4),
+        # compared with the baseline, the least disturbed repeat
+        "best_median_ms": round(
+            min(statistics.median(repeat) for repeat in repeat_durations) * 1000, 4
+        ),
+        "mean_ms": round(statistics.mean(durations) * 1000, 4),
+        "stddev_ms": round(
+            statistics.stdev(durations) * 1000 if len(durations) > 1 else 0, 4
+        ),
+    }
+
+
+def run_benchmarks(
+    names: list, sizes: list, rounds_factor: float, warmup_rounds: int, repeats: int
+) -> dict:
+    # benchmark id ("hide_blur[1080p]") -> stats, or {"skipped": reason}
+    results = {}
+    cases = []
+    for name in names:
+        case, per_size, rounds = BENCHMARKS[name]
+        for size_name in sizes if per_size else [None]:
+            benchmark_id = f"{name}[{size_name}]" if size_name else name
+            try:
+                prepare, run = case(FRAME_SIZES[size_name] if size_name else None)
+            except SkipBenchmark as error:
+                results[benchmark_id] = {"skipped": str(error)}
+                print(f"{benchmark_id:<40} skipped ({error})")
+                continue
+            cases.append(
+                (benchmark_id, prepare, run, max(1, int(rounds * rounds_factor)))
+            )
+
+    # the repeats of a case are spread over the run, a slowdown of the machine for a
+    # few seconds only affects some of them
+    repeat_durations = {benchmark_id: [] for benchmark_id, *_ in cases}
+    for _repeat in range(repeats):
+        for benchmark_id, prepare, run, rounds in cases:
+            repeat_durations[benchmark_id].append(
+                time_case(prepare, run, rounds, warmup_rounds)
+            )
+
+    for benchmark_id, *_ in cases:
+        results[benchmark_id] = get_stats(repeat_durations[benchmark_id])
+        print(format_result(benchmark_id, results[benchmark_id]))
+    return results
+
+
+def format_result(benchmark_id: str, stats: dict) -> str:
+    return (
+        f"{benchmark_id:<40}{stats['rounds']:>7}{stats['min_ms']:>12.3f}"
+        f"{stats['median_ms']:>12.3f}{stats['best_median_ms']:>12.3f}"
+        f"{stats['mean_ms']:>12.3f}{stats['stddev_ms']:>10.3f}"
+    )
+
+
+def get_machine_info() -> dict:
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_baseline(path: str, results: dict):
+    # merged into an existing baseline, so a filtered run only updates its own cases
+    baseline = load_baseline(path) or {"benchmarks": {}}
+    baseline["machine"] = get_machine_info()
+    baseline["saved_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for benchmark_id, stats in results.items():
+        if "skipped" not in stats:
+            previous = baseline["benchmarks"].get(benchmark_id, {})
+            baseline["benchmarks"][benchmark_id] = dict(stats)
+            # per case thresholds, e.g. for noisy cases, are kept when updating
+            if "max_regression" in previous:
+                baseline["benchmarks"][benchmark_id]["max_regression"] = previous[
+                    "max_regression"
+                ]
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    saved_count = len([stats for stats in results.values() if "skipped" not in stats])
+    print(f"Saved baseline of {saved_count} benchmarks to {path}")
+
+
+def load_baseline(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_with_baseline(results: dict, baseline: dict, max_regression: float) -> list:
+    """
+    Returns the regressions as (benchmark id, baseline median, median, change in percent),
+    comparing the best medians of the repeats. The allowed regression is max_regression
+    percent, unless the baseline entry of a case sets its own "max_regression".
+    """
+    if baseline["machine"] != get_machine_info():
+        print("Warning: the baseline was recorded on a different machine or setup")
+
+    regressions = []
+    print(f"{'benchmark':<40}{'baseline ms':>14}{'median ms':>12}{'change':>10}")
+    for benchmark_id, stats in results.items():
+        reference = baseline["benchmarks"].get(benchmark_id)
+        if "skipped" in stats or reference is None:
+            continue
+        # baselines saved without repeats only have the median
+        reference_median = reference.get("best_median_ms", reference["median_ms"])
+        median = stats["best_median_ms"]
+        change = (median / reference_median - 1) * 100
+        allowed = reference.get("max_regression", max_regression)
+        is_regression = change > allowed
+        print(
+            f"{benchmark_id:<40}{reference_median:>14.3f}{median:>12.3f}"
+            f"{change:>+9.1f}%{'  REGRESSION' if is_regression else ''}"
+        )
+        if is_regression:
+            regressions.append((benchmark_id, reference_median, median, change))
+    return regressions
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="python -m pipeline_worker.bench.micro",
+        description=__doc__.split("\n\n")[0],
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        help="only run benchmarks whose name contains this substring",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=list(FRAME_SIZES),
+        default=list(FRAME_SIZES),
+        help="frame sizes of the size dependent benchmarks",
+    )
+    parser.add_argument(
+        "--rounds-factor",
+        type=float,
+        default=1.0,
+        help="multiplies the number of timed rounds of every benchmark",
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="untimed rounds per case")
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="times the rounds of every benchmark are repeated, the best median counts",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE_PATH,
+        help="baseline file to compare with or save to",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=25.0,
+        help="allowed slowdown of the best median in percent before the run fails",
+    )
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    return parser.parse_args(args)
+
+
+def main(args) -> int:
+    options = parse_args(args)
+    names = [
+        name for name in BENCHMARKS if not options.filter or options.filter in name
+    ]
+    if not names:
+        print(f"No benchmarks match {options.filter}")
+        return 1
+
+    print(
+        f"{'benchmark':<40}{'rounds':>7}{'min ms':>12}{'median ms':>12}"
+        f"{'best median':>12}{'mean ms':>12}{'stddev':>10}"
+    )
+    results = run_benchmarks(
+        names, options.sizes, options.rounds_factor, options.warmup, options.repeats
+    )
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(
+                {"machine": get_machine_info(), "benchmarks": results}, f, indent=2
+            )
+
+    if options.save_baseline:
+        save_baseline(options.baseline, results)
+        return 0
+
+    baseline = load_baseline(options.baseline)
+    if baseline is None:
+        print(f"No baseline at {options.baseline}, run with --save-baseline first")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, options.max_regression)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed:")
+        for benchmark_id, reference, median, change in regressions:
+            print(f"  {benchmark_id}: {reference:.3f} ms -> {median:.3f} ms ({change:+.1f}%)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
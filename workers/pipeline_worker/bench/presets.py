@@ -0,0 +1,101 @@
+# Run data (in the format the backend hands to workers) of the benchmark presets.
+# They only use models the fake detectors and mask extractors can replace and keep no audio.
+
+NO_3D = {
+    "skeleton": False,
+    "skeletonParams": {},
+    "blender": False,
+    "blenderParams": {},
+    "blendshapes": False,
+    "blendshapesParams": {},
+}
+NO_AUDIO = {"maskingStrategy": {"key": "remove", "params": {}}}
+NO_MASKING = {"key": "none", "params": {}}
+DETECTION_PARAMS = {"numPoses": 1, "confidence": 0.5}
+BLUR_PARAMS = {"kernelSize": 23, "extraPixels": 0}
+
+
+def hiding(
+    key: str, detection_model: str, subject_detection: str, hiding_params: dict
+):
+    return {
+        "key": key,
+        "params": {
+            "subjectDetection": subject_detection,
+            "detectionModel": detection_model,
+            "detectionParams": DETECTION_PARAMS,
+            "hidingParams": hiding_params,
+        },
+    }
+
+
+def masking(key: str, timeseries: bool = False):
+    return {
+        "key": key,
+        "params": {
+            "maskingModel": "mediapipe",
+            "numPoses": 1,
+            "confidence": 0.5,
+            "timeseries": timeseries,
+        },
+    }
+
+
+def run_data(video_masking: dict, three_d_model_creation: dict = NO_3D) -> dict:
+    return {
+        "videoMasking": video_masking,
+        "threeDModelCreation": three_d_model_creation,
+        "voiceMasking": NO_AUDIO,
+    }
+
+
+BENCH_PRESETS = {
+    "blurFace": run_data(
+        {
+            "face": {
+                "hidingStrategy": hiding("blur", "yolo", "boundingbox", BLUR_PARAMS),
+                "maskingStrategy": NO_MASKING,
+            }
+        }
+    ),
+    "blurBody": run_data(
+        {
+            "body": {
+                "hidingStrategy": hiding("blur", "mediapipe", "silhouette", BLUR_PARAMS),
+                "maskingStrategy": NO_MASKING,
+            }
+        }
+    ),
+    "contourBodyBlackoutBackground": run_data(
+        {
+            "body": {
+                "hidingStrategy": hiding(
+                    "contour", "mediapipe", "silhouette", {"level": 3}
+                ),
+                "maskingStrategy": NO_MASKING,
+            },
+            "background": {
+                "hidingStrategy": hiding(
+                    "blackout", "mediapipe", "silhouette", {"color": 0}
+                ),
+                "maskingStrategy": NO_MASKING,
+            },
+        }
+    ),
+    "skeletonFaceMesh": run_data(
+        {
+            "body": {
+                "hidingStrategy": hiding("blur", "mediapipe", "silhouette", BLUR_PARAMS),
+                "maskingStrategy": masking("skeleton", timeseries=True),
+            },
+            "face": {
+                "hidingStrategy": {"key": "none", "params": {}},
+                "maskingStrategy": masking("faceMesh", timeseries=True),
+            },
+        }
+    ),
+    "kinematics3d": run_data(
+        {},
+        {**NO_3D, "skeleton": True, "blendshapes": True},
+    ),
+}
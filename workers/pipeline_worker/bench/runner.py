@@ -0,0 +1,199 @@
+import os
+import sys
+import glob
+import time
+import shutil
+import hashlib
+import resource
+
+from pipeline_worker.pipeline.Pipeline import Pipeline
+from pipeline_worker.pipeline.BasicHidingMasking import BasicHidingMasking
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.utils.tracing import tracer
+from pipeline_worker.utils.thread_budget import thread_budget
+from pipeline_worker.utils.video_metadata import get_video_metadata
+from pipeline_worker.bench.fake_models import FakeDetector, FakeMaskExtractor
+from pipeline_worker.bench.stub_backend_client import StubBackendClient
+from common.utils.app_utils import init_directories
+from config import (
+    BLENDSHAPES_BASE_PATH,
+    RESULT_BASE_PATH,
+    TS_BASE_PATH,
+    VIDEOS_BASE_PATH,
+)
+
+
+class BenchHidingMasking(BasicHidingMasking):
+    # Optionally replaces all detectors and mask extractors with the fake models
+    fake_models = False
+    use_result_caches = False
+    model_process_attributes = ("fake_models",)
+
+    def init_models(self, video_id: str = None, video_metadata: dict = None):
+        # without a video id no mask tracks or landmark caches are read or written
+        if not self.use_result_caches:
+            video_id = None
+        super().init_models(video_id, video_metadata)
+
+    def create_detector(self, model_name: str, parts_to_detect: list):
+        if self.fake_models:
+            return FakeDetector(parts_to_detect)
+        return super().create_detector(model_name, parts_to_detect)
+
+    def create_mask_extractor(
+        self, parts_to_mask: list, params_3d, video_id: str, video_metadata: dict
+    ):
+        if self.fake_models:
+            return FakeMaskExtractor(parts_to_mask, params_3d)
+        return super().create_mask_extractor(
+            parts_to_mask, params_3d, video_id, video_metadata
+        )
+
+
+class BenchPipeline(Pipeline):
+    basic_hiding_masking_class = BenchHidingMasking
+
+    def __init__(
+        self,
+        backend_client,
+        fake_models: bool,
+        use_result_caches: bool,
+        parallel_models: bool = False,
+    ):
+        super().__init__(backend_client, None)
+        self.fake_models = fake_models
+        self.use_result_caches = use_result_caches
+        self.parallel_models = parallel_models
+        self.basic_hiding_masking = None
+        # passed on to the BasicHidingMasking, see BasicHidingMasking.frame_observers
+        self.frame_observers = []
+
+    def init_basic_hiding_masking(
+        self, run_params: dict, required_detectors, required_maskers, hiding_strategies
+    ):
+        basic_hiding_masking = super().init_basic_hiding_masking(
+            run_params, required_detectors, required_maskers, hiding_strategies
+        )
+        basic_hiding_masking.fake_models = self.fake_models
+        basic_hiding_masking.use_result_caches = self.use_result_caches
+        basic_hiding_masking.parallel_models = self.parallel_models
+        basic_hiding_masking.frame_observers = list(self.frame_observers)
+        self.basic_hiding_masking = basic_hiding_masking
+        return basic_hiding_masking
+
+    def run_basic_hiding_masking(self, video_id: str, job_id: str, run_params: dict):
+        # BasicHidingMasking.run only, without docker models, audio and preview image
+        (
+            required_detectors,
+            required_maskers,
+            hiding_strategies,
+        ) = self.identify_required_models(run_params)
+        params_3d = run_params["threeDModelCreation"]
+        basic_mask_extractors, _docker_mask_extractors = self.split_mask_extractors(
+            required_maskers, params_3d
+        )
+        self.check_tasks(run_params, basic_mask_extractors, {}, params_3d)
+
+        basic_hiding_masking = self.init_basic_hiding_masking(
+            run_params, required_detectors, basic_mask_extractors, hiding_strategies
+        )
+        with tracer.span("basic_hiding_masking"):
+            basic_hiding_masking.run(
+                os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4"),
+                os.path.join(RESULT_BASE_PATH, video_id + ".mp4"),
+                job_id,
+                video_id,
+            )
+
+
+def get_bench_video_id(video_path: str) -> str:
+    # stable for an unchanged file, so mask tracks and landmark caches can be reused
+    stat = os.stat(video_path)
+    key = f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return "bench-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_peak_rss_bytes() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def get_output_sizes(video_id: str) -> dict:
+    outputs = {
+        "video": [os.path.join(RESULT_BASE_PATH, video_id + ".mp4")],
+        "timeseries": glob.glob(os.path.join(TS_BASE_PATH, f"*_{video_id}.json")),
+        "blendshapes": [os.path.join(BLENDSHAPES_BASE_PATH, video_id + ".json")],
+    }
+    return {
+        name: sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        for name, paths in outputs.items()
+    }
+
+
+def run_benchmark(
+    video_path: str,
+    run_data: dict,
+    mode: str = "basic",
+    fake_models: bool = False,
+    use_result_caches: bool = False,
+    parallel_models: bool = False,
+) -> dict:
+    """
+    Runs Pipeline.run (mode "pipeline") or only BasicHidingMasking.run (mode "basic")
+    on a local video with a stub backend and returns the report of the run.
+    """
+    if mode not in ["basic", "pipeline"]:
+        raise Exception(f"Unknown benchmark mode {mode}")
+
+    init_directories()
+    video_id = get_bench_video_id(video_path)
+    local_video_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
+    if not os.path.exists(local_video_path):
+        shutil.copyfile(video_path, local_video_path)
+    video_metadata = get_video_metadata(video_id, local_video_path)
+
+    backend_client = StubBackendClient()
+    pipeline = BenchPipeline(
+        backend_client, fake_models, use_result_caches, parallel_models
+    )
+    model_registry.begin_job()
+    tracer.begin_job(True)
+    try:
+        start_time = time.perf_counter()
+        with tracer.span("job"):
+            if mode == "pipeline":
+                pipeline.run(video_id, "bench", run_data)
+            else:
+                pipeline.run_basic_hiding_masking(video_id, "bench", run_data)
+        elapsed_time = time.perf_counter() - start_time
+        stages = tracer.get_summary()
+    finally:
+        tracer.end_job()
+
+    frames = (
+        pipeline.basic_hiding_masking.processed_frames
+        if pipeline.basic_hiding_masking is not None
+        else 0
+    )
+    return {
+        "mode": mode,
+        "fake_models": fake_models,
+        "use_result_caches": use_result_caches,
+        "parallel_models": parallel_models,
+        "video": {
+            "path": video_path,
+            "width": video_metadata["frame_width"],
+            "height": video_metadata["frame_height"],
+            "fps": video_metadata["fps"],
+            "frame_count": video_metadata["frame_count"],
+        },
+        "frames": frames,
+        "seconds": round(elapsed_time, 3),
+        "fps": round(frames / elapsed_time, 2) if elapsed_time > 0 else 0.0,
+        "stages": stages,
+        "peak_rss_bytes": get_peak_rss_bytes(),
+        "output_bytes": get_output_sizes(video_id),
+        "model_registry": model_registry.get_stats(),
+        "thread_budget": thread_budget.settings,
+    }
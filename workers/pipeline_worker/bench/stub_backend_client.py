@@ -0,0 +1,28 @@
+class StubBackendClient:
+    """
+    Stands in for the BackendClient in offline benchmarks. Progress updates and uploads
+    are recorded instead of being sent, so the results stay on the local disk.
+    """
+
+    def __init__(self):
+        self.progress_updates = []
+        self.uploads = []
+
+    def update_progress(self, job_id: str, progress: int):
+        self.progress_updates.append(progress)
+
+    def upload_job_stage_timings(self, job_id: str, stage_timings: dict):
+        self.uploads.append(("stage_timings", len(stage_timings)))
+
+    def upload_result_extra_file(
+        self, video_id: str, file_ending: str, result_video_id: str, data: bytes
+    ):
+        self.uploads.append((file_ending, len(data)))
+
+    def create_job(self, job_type: str, video_id: str, arguments: dict):
+        raise Exception(
+            f"Docker models ({job_type}) can not run in offline benchmarks, remove them from the run data"
+        )
+
+    def fetch_job_status(self, job_id: str):
+        raise Exception("Offline benchmarks have no sub jobs")
@@ -0,0 +1,83 @@
+import math
+
+import cv2
+import numpy as np
+
+SUBJECT_COLOR = (70, 110, 200)
+FACE_COLOR = (120, 170, 235)
+
+
+def get_subject_layout(timestamp_ms: float) -> dict:
+    """
+    Position of the synthetic subject at a timestamp, in coordinates relative to the
+    frame size. The subject walks from side to side, so masks change every frame.
+    """
+    phase = math.sin(2 * math.pi * timestamp_ms / 4000.0)
+    center_x = 0.5 + 0.25 * phase
+    return {
+        "body": {"center": (center_x, 0.6), "axes": (0.12, 0.32)},
+        "face": {"center": (center_x, 0.22), "radius": 0.07},
+    }
+
+
+def to_pixels(layout: dict, width: int, height: int) -> dict:
+    body, face = layout["body"], layout["face"]
+    return {
+        "body": {
+            "center": (int(body["center"][0] * width), int(body["center"][1] * height)),
+            "axes": (int(body["axes"][0] * width), int(body["axes"][1] * height)),
+        },
+        "face": {
+            "center": (int(face["center"][0] * width), int(face["center"][1] * height)),
+            "radius": int(face["radius"] * min(width, height)),
+        },
+    }
+
+
+def create_background(width: int, height: int) -> np.ndarray:
+    # Textured background, a flat color would make blurring and encoding unrealistically cheap
+    random_state = np.random.RandomState(0)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+    noise = random_state.randint(0, 40, (height, width, 3)).astype(np.float32)
+    background = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    for y in range(0, height, max(height // 12, 1)):
+        cv2.line(background, (0, y), (width, y), (90, 90, 90), 1)
+    return background
+
+
+def draw_subject(frame: np.ndarray, timestamp_ms: float) -> np.ndarray:
+    height, width = frame.shape[:2]
+    layout = to_pixels(get_subject_layout(timestamp_ms), width, height)
+    cv2.ellipse(
+        frame,
+        layout["body"]["center"],
+        layout["body"]["axes"],
+        0,
+        0,
+        360,
+        SUBJECT_COLOR,
+        -1,
+    )
+    cv2.circle(frame, layout["face"]["center"], layout["face"]["radius"], FACE_COLOR, -1)
+    return frame
+
+
+def generate_synthetic_video(
+    video_path: str, width: int, height: int, fps: float, duration: float
+) -> int:
+    """
+    Writes a video of a subject moving in front of a textured background and returns
+    its frame count. The fake detectors of the benchmark find the subject exactly.
+    """
+    writer = cv2.VideoWriter(
+        video_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    if not writer.isOpened():
+        raise Exception(f"Could not create synthetic video {video_path}")
+
+    background = create_background(width, height)
+    frame_count = max(1, int(round(duration * fps)))
+    for index in range(frame_count):
+        writer.write(draw_subject(background.copy(), index * 1000.0 / fps))
+    writer.release()
+    return frame_count
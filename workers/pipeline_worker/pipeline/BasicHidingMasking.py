@@ -3,24 +3,54 @@ import time
 import cv2
 import os
 import json
+import math
 
 from pipeline_worker.pipeline.PipelineTypes import DetectionResult, MaskingResult
 from pipeline_worker.pipeline.detection.STTNMaskCreator import STTNMaskCreator
 from pipeline_worker.pipeline.detection.STTNVideoInpainter import STTNVideoInpainter
 from pipeline_worker.pipeline.detection.YoloDetector import YoloDetector
 from pipeline_worker.pipeline.detection.MediaPipeDetector import MediaPipeDetector
+from pipeline_worker.pipeline.detection.StoredMaskDetector import StoredMaskDetector
+from pipeline_worker.pipeline.detection.BaseDetector import get_inference_resolution
 from pipeline_worker.pipeline.mask_extraction.MediaPipeMaskExtractor import (
     MediaPipeMaskExtractor,
 )
 from pipeline_worker.pipeline.hiding import Hider
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.ModelProcessGroup import ModelProcessGroup
 
-from pipeline_worker.utils.video_utils import setup_video_processing
+from pipeline_worker.utils.video_utils import create_video_writer
+from pipeline_worker.utils.video_metadata import get_video_metadata
+from pipeline_worker.utils.video_decoder import VideoDecoder
 from pipeline_worker.utils.drawing_utils import overlay_frames
+from pipeline_worker.utils.tracing import tracer
+from common.utils.metrics import metrics_registry
+from pipeline_worker.utils.mask_tracks import (
+    MaskTrackWriter,
+    compute_track_key,
+    get_mask_track_path,
+)
+
+from config import BLENDSHAPES_BASE_PATH, TS_BASE_PATH, MASK_TRACKS_ENABLED
 
-from config import BLENDSHAPES_BASE_PATH, TS_BASE_PATH
+frames_processed = metrics_registry.counter(
+    "pipeline_frames_total", "Frames processed by the basic hiding and masking"
+)
+frames_seconds = metrics_registry.counter(
+    "pipeline_frames_seconds_total",
+    "Time spent processing frames in the basic hiding and masking",
+)
+frames_fps = metrics_registry.gauge(
+    "pipeline_fps", "Frames per second of the last basic hiding and masking run"
+)
 
 
 class BasicHidingMasking:
+    # attributes of subclasses the models depend on, copied to the model processes
+    model_process_attributes = ()
+    # bases of a subclass created at runtime, which can not be pickled for the model processes
+    model_process_bases = None
+
     def __init__(
         self,
         inpainting_num_poses,
@@ -31,9 +61,38 @@ class BasicHidingMasking:
         backend_client,
         masks_audio,
         creates_basic_video,
+        preview_params=None,
+        image_mode=False,
     ):
-        self.detectors = self.init_detectors(required_detectors)
-        self.mask_extractors = self.init_maskers(required_maskers, params_3d)
+        # recreates this instance in the model processes, see ModelProcessGroup
+        self.init_args = (
+            inpainting_num_poses,
+            required_detectors,
+            required_maskers,
+            hiding_strategies,
+            params_3d,
+            None,  # the backend client stays in this process
+            masks_audio,
+            creates_basic_video,
+            preview_params,
+            image_mode,
+        )
+        # runs every model in its own process, enabled by the Pipeline for video jobs
+        self.parallel_models = False
+        self.model_processes = None
+        # preview jobs process a few sampled, downscaled frames with the lightest models
+        self.preview_params = preview_params
+        self.is_preview = preview_params is not None
+        # MediaPipe models in IMAGE mode, for frames that are not part of a continuous video
+        self.image_mode = image_mode
+        # detectors are created in run, they may be replaced by stored mask tracks of the video
+        self.required_detectors = required_detectors
+        self.detectors = []
+        self.mask_track_writers = []
+        # mask extractors are created in run as well, they may replay cached landmarks of the video
+        self.required_maskers = required_maskers
+        self.params_3d = params_3d
+        self.mask_extractors = []
         self.hider = self.init_hider(hiding_strategies)
 
         self.is_inpainting = inpainting_num_poses != 0
@@ -48,22 +107,140 @@ class BasicHidingMasking:
         self.progress_update_interval = 5
         self.masks_audio = masks_audio
         self.creates_basic_video = creates_basic_video
+        self.processed_frames = 0
+        # callables receiving a dict of every processed frame, e.g. to compare code paths
+        self.frame_observers = []
+        self.current_detection_results = []
 
     # required_detectors are of form: {"modelName": {"partToDetect": params, ...}, ...}
-    def init_detectors(self, required_detectors: dict):
+    def init_detectors(self, required_detectors: dict, video_id: str, video_metadata: dict):
         detectors = []
-        if "mediapipe" in required_detectors:
-            parts_to_detect = required_detectors["mediapipe"]
-            detectors.append(MediaPipeDetector(parts_to_detect))
-        if "yolo" in required_detectors:
-            parts_to_detect = required_detectors["yolo"]
-            detectors.append(YoloDetector(parts_to_detect))
+        for model_name in ["mediapipe", "yolo"]:
+            if model_name not in required_detectors:
+                continue
+            parts_to_detect = required_detectors[model_name]
+
+            # the sampled frames of a preview can not be stored as or replayed from a track
+            if not MASK_TRACKS_ENABLED or self.is_preview or video_id is None:
+                detectors.append(self.start_detector(model_name, parts_to_detect))
+                continue
+
+            track_key = compute_track_key(
+                model_name,
+                parts_to_detect,
+                get_inference_resolution(
+                    [part.get("detection_params") for part in parts_to_detect]
+                ),
+                video_metadata,
+            )
+            track_path = get_mask_track_path(video_id, track_key)
+            stored_detector = self.open_stored_detector(
+                parts_to_detect, track_path, video_metadata["frame_count"]
+            )
+            if stored_detector is not None:
+                print(f"Using stored {model_name} detection masks of video {video_id}")
+                detectors.append(stored_detector)
+            else:
+                detector = self.start_detector(model_name, parts_to_detect)
+                part_names = [part["part_name"] for part in parts_to_detect]
+                self.mask_track_writers.append(
+                    (detector, MaskTrackWriter(track_path, part_names))
+                )
+                detectors.append(detector)
         return detectors
 
+    def open_stored_detector(
+        self, parts_to_detect: list, track_path: str, frame_count: int
+    ):
+        # None if there is no usable track, e.g. it was pruned by another job or is truncated
+        if not os.path.exists(track_path):
+            return None
+        try:
+            return StoredMaskDetector(parts_to_detect, track_path, frame_count)
+        except Exception as error:
+            print(f"Could not use stored detection masks, running the detector: {error}")
+            return None
+
+    def init_models(self, video_id: str = None, video_metadata: dict = None):
+        # Without a video (single frame previews) no mask tracks or landmark caches are used
+        if self.parallel_models:
+            self.model_processes = ModelProcessGroup()
+        self.detectors = self.init_detectors(
+            self.required_detectors, video_id, video_metadata
+        )
+        self.mask_extractors = self.init_maskers(
+            self.required_maskers, self.params_3d, video_id, video_metadata
+        )
+        if self.model_processes is not None:
+            try:
+                self.model_processes.wait_ready()
+            except Exception:
+                self.close_result_caches(complete=False)
+                raise
+
+    def get_model_process_spec(self, kind: str, model_args: dict) -> dict:
+        process_count = len(
+            [name for name in ["mediapipe", "yolo"] if name in self.required_detectors]
+        )
+        if (
+            "mediapipe" in self.required_maskers
+            or self.params_3d["blendshapes"]
+            or self.params_3d["skeleton"]
+        ):
+            process_count += 1
+        return {
+            "kind": kind,
+            "owner_class": None if self.model_process_bases else type(self),
+            "owner_bases": self.model_process_bases,
+            "owner_args": self.init_args,
+            "owner_attributes": {
+                name: getattr(self, name) for name in self.model_process_attributes
+            },
+            # the models share the thread budget with this process
+            "process_count": process_count + 1,
+            "process_index": len(self.model_processes.models) + 1,
+            **model_args,
+        }
+
+    def start_detector(self, model_name: str, parts_to_detect: list):
+        if self.model_processes is None:
+            return self.create_detector(model_name, parts_to_detect)
+        return self.model_processes.start_detector(
+            self.get_model_process_spec(
+                "detector", {"model_name": model_name, "parts": parts_to_detect}
+            )
+        )
+
+    def create_detector(self, model_name: str, parts_to_detect: list):
+        if model_name == "mediapipe":
+            return MediaPipeDetector(
+                parts_to_detect,
+                use_lite_model=self.is_preview,
+                image_mode=self.image_mode,
+            )
+        return YoloDetector(parts_to_detect)
+
+    def close_result_caches(self, complete: bool):
+        for _detector, writer in self.mask_track_writers:
+            writer.close(complete)
+        self.mask_track_writers = []
+        for detector in self.detectors:
+            if isinstance(detector, StoredMaskDetector):
+                detector.close()
+        for mask_extractor in self.mask_extractors:
+            if isinstance(mask_extractor, MediaPipeMaskExtractor):
+                mask_extractor.close_landmark_caches(complete)
+        # the model processes close their landmark caches themselves
+        if self.model_processes is not None:
+            self.model_processes.close(complete)
+            self.model_processes = None
+
     def init_hider(self, hiding_strategies):
         return Hider(hiding_strategies)
 
-    def init_maskers(self, required_maskers: dict, params_3d):
+    def init_maskers(
+        self, required_maskers: dict, params_3d, video_id: str, video_metadata: dict
+    ):
         mask_extractors = []
         if (
             "mediapipe" in required_maskers
@@ -74,9 +251,45 @@ class BasicHidingMasking:
                 parts_to_mask = required_maskers["mediapipe"]
             else:
                 parts_to_mask = []
-            mask_extractors.append(MediaPipeMaskExtractor(parts_to_mask, params_3d))
+            mask_extractors.append(
+                self.start_mask_extractor(
+                    parts_to_mask, params_3d, video_id, video_metadata
+                )
+            )
         return mask_extractors
 
+    def start_mask_extractor(
+        self, parts_to_mask: list, params_3d, video_id: str, video_metadata: dict
+    ):
+        if self.model_processes is None:
+            return self.create_mask_extractor(
+                parts_to_mask, params_3d, video_id, video_metadata
+            )
+        return self.model_processes.start_mask_extractor(
+            self.get_model_process_spec(
+                "mask_extractor",
+                {
+                    "parts": parts_to_mask,
+                    "params_3d": params_3d,
+                    "video_id": video_id,
+                    "video_metadata": video_metadata,
+                },
+            )
+        )
+
+    def create_mask_extractor(
+        self, parts_to_mask: list, params_3d, video_id: str, video_metadata: dict
+    ):
+        return MediaPipeMaskExtractor(
+            parts_to_mask,
+            params_3d,
+            # landmarks of sampled preview frames are not cached
+            None if self.is_preview else video_id,
+            video_metadata,
+            use_lite_model=self.is_preview,
+            image_mode=self.image_mode,
+        )
+
     def setup_inpainting(self, inpainting_num_poses, video_id, video_in_path):
         sttn_mask_creator = STTNMaskCreator()
         inpaint_mask_dir = sttn_mask_creator.run(video_id, inpainting_num_poses)
@@ -101,7 +314,7 @@ class BasicHidingMasking:
 
     def send_progress_update(self, job_id: str, current_index: int):
         if self.should_send_progress_message(current_index):
-            progress = int((float(current_index) / float(self.num_frames)) * 100.0)
+            progress = int((float(current_index) / float(max(self.num_frames, 1))) * 100.0)
             if self.masks_audio:
                 progress = int(progress / 2)
             self.backend_client.update_progress(job_id, progress)
@@ -136,10 +349,14 @@ class BasicHidingMasking:
         for key in self.ts_file_handlers:
             self.ts_file_handlers[key].write("]")
             self.ts_file_handlers[key].close()
+        self.ts_file_handlers = {}
 
     def close_bs_file_handle(self):
+        if self.blendshapes_file_handle is None:
+            return
         self.blendshapes_file_handle.write("]")
         self.blendshapes_file_handle.close()
+        self.blendshapes_file_handle = None
 
     def write_blendshapes(self, blendshapes_dict):
         if blendshapes_dict:
@@ -150,76 +367,185 @@ class BasicHidingMasking:
             self.is_first_blendshape_res = False
 
     def run(self, video_in_path, video_out_path, job_id, video_id):
-        video_cap, out = setup_video_processing(video_in_path, video_out_path)
-
-        inpainted_video_in_cap = (
-            self.setup_inpainting(self.inpainting_num_poses, video_id, video_in_path)
-            if self.is_inpainting
-            else None
-        )
-
-        self.num_frames = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.init_ts_file_handlers(video_id)
-        self.init_blendshapes_file_handle(video_id)
-        index = 0
-        while True:
-            ret, frame = video_cap.read()
-            if not ret:
-                break
+        video_metadata = get_video_metadata(video_id, video_in_path)
+        self.init_models(video_id, video_metadata)
+        # the model processes and result caches are started, every failure must close them
+        decoder = None
+        out = None
+        inpainted_video_in_cap = None
+        try:
+            if self.is_preview:
+                self.max_frames = self.preview_params["maxFrames"]
+                decoder = VideoDecoder(
+                    video_in_path,
+                    max_resolution=self.preview_params["maxResolution"],
+                    target_fps=self.get_preview_sample_fps(video_metadata),
+                    frame_timestamps=video_metadata["frame_timestamps"],
+                    seek_sampling=True,
+                )
+                # the samples are played back at the preview rate, not their real rate
+                out_fps = self.preview_params["fps"]
+            else:
+                decoder = VideoDecoder(
+                    video_in_path, frame_timestamps=video_metadata["frame_timestamps"]
+                )
+                self.max_frames = None
+                out_fps = decoder.fps
+            out = create_video_writer(
+                video_out_path, out_fps, (decoder.width, decoder.height)
+            )
+
+            if self.is_inpainting:
+                with tracer.span("inpainting"):
+                    inpainted_video_in_cap = self.setup_inpainting(
+                        self.inpainting_num_poses, video_id, video_in_path
+                    )
 
-            inpainted_frame = None
+            self.num_frames = video_metadata["frame_count"]
+            if self.is_preview:
+                self.num_frames = min(
+                    self.max_frames,
+                    math.ceil(video_metadata["duration"] * decoder.fps) or 1,
+                )
+            self.init_ts_file_handlers(video_id)
+            self.init_blendshapes_file_handle(video_id)
+            self.process_frames(decoder, out, inpainted_video_in_cap, job_id)
+        except Exception:
+            self.close_result_caches(complete=False)
+            raise
+        else:
+            self.close_result_caches(complete=True)
+        finally:
+            self.close_ts_file_handles()
+            self.close_bs_file_handle()
+            if out is not None:
+                out.release()
+            if decoder is not None:
+                decoder.close()
             if inpainted_video_in_cap is not None:
-                _ret, inpainted_frame = inpainted_video_in_cap.read()
-
-            frame_timestamp_ms = int(video_cap.get(cv2.CAP_PROP_POS_MSEC))
-            if index != 0 and frame_timestamp_ms == 0:
-                continue
+                inpainted_video_in_cap.release()
 
-            # Detect all relevant body/video parts (as pixelMasks)
-            detection_results: List[DetectionResult] = []
-            for detector in self.detectors:
-                detection_result = detector.detect(frame, frame_timestamp_ms)
+        print(f"Finished basic_masking and hiding of video {video_id}")
 
-                detection_results.extend(detection_result)
+    def get_preview_sample_fps(self, video_metadata) -> float:
+        # the preview frames are spread over the whole video, at most at the preview rate
+        duration = video_metadata["duration"]
+        if not duration:
+            return self.preview_params["fps"]
+        return min(self.preview_params["fps"], self.max_frames / duration)
 
-            if inpainted_frame is not None:
-                hidden_frame = inpainted_frame.copy()
-            else:
-                # applies the hiding method on each detected part of the frame and combines them into one frame
-                hidden_frame = frame.copy()
-                for detection_result in detection_results:
+    def render_frame(
+        self, frame_context: FrameContext, frame_timestamp_ms: int, inpainted_frame=None
+    ):
+        # Returns the hidden frame and the masks extracted from it
+        # Detect all relevant body/video parts (as pixelMasks)
+        detection_results: List[DetectionResult] = []
+        for detector in self.detectors:
+            with tracer.span("detect." + type(detector).__name__):
+                detection_result = detector.detect(frame_context, frame_timestamp_ms)
+
+            detection_results.extend(detection_result)
+        self.current_detection_results = detection_results
+
+        for detector, writer in self.mask_track_writers:
+            writer.write_frame(detector.current_results)
+
+        if inpainted_frame is not None:
+            hidden_frame = inpainted_frame.copy()
+        else:
+            # applies the hiding method on each detected part of the frame and combines them into one frame
+            hidden_frame = frame_context.frame.copy()
+            for detection_result in detection_results:
+                with tracer.span("hide." + detection_result["part_name"]):
                     hidden_frame = self.hider.hide_frame_part(
                         hidden_frame, detection_result
                     )
 
-            # Extracts the masks for each desired bodypart
-            mask_results = []
+        # Extracts the masks for each desired bodypart
+        mask_results = []
 
-            for mask_extractor in self.mask_extractors:
+        for mask_extractor in self.mask_extractors:
+            with tracer.span("mask." + type(mask_extractor).__name__):
                 masking_results: List[MaskingResult] = mask_extractor.extract_mask(
-                    frame, frame_timestamp_ms
-                )
-                mask_results.extend([result["mask"] for result in masking_results])
-                self.write_timeseries(
-                    mask_extractor.get_newest_timeseries(), index == 0
-                )
-                self.write_blendshapes(
-                    mask_extractor.get_newest_blendshapes()
+                    frame_context, frame_timestamp_ms
                 )
+            mask_results.extend([result["mask"] for result in masking_results])
 
-            if self.creates_basic_video:
-                out_frame = overlay_frames(hidden_frame, mask_results)
-                out.write(out_frame)
+        return hidden_frame, mask_results
 
-            self.send_progress_update(job_id, index)
+    def notify_frame_observers(
+        self, index: int, frame_timestamp_ms: int, frame, hidden_frame, out_frame
+    ):
+        timeseries = {}
+        for mask_extractor in self.mask_extractors:
+            timeseries.update(mask_extractor.get_newest_timeseries())
+        frame_record = {
+            "index": index,
+            "timestamp_ms": frame_timestamp_ms,
+            "frame": frame,
+            "detection_results": self.current_detection_results,
+            "hidden_frame": hidden_frame,
+            "out_frame": out_frame,
+            "timeseries": timeseries,
+        }
+        for frame_observer in self.frame_observers:
+            frame_observer(frame_record)
+
+    def read_frames(self, decoder, inpainted_video_in_cap):
+        # yields (frame, timestamp_ms, inpainted frame or None), at most max_frames
+        index = 0
+        frames = iter(decoder)
+        while self.max_frames is None or index < self.max_frames:
+            with tracer.span("decode"):
+                next_frame = next(frames, None)
+                inpainted_frame = None
+                if next_frame is not None and inpainted_video_in_cap is not None:
+                    _ret, inpainted_frame = inpainted_video_in_cap.read()
+            if next_frame is None:
+                break
+            yield next_frame[0], next_frame[1], inpainted_frame
             index += 1
 
-        self.close_ts_file_handles()
-        self.close_bs_file_handle()
-        out.release()
-        video_cap.release()
+    def process_frames(self, decoder, out, inpainted_video_in_cap, job_id):
+        start_time = time.perf_counter()
+        index = 0
+        frames = self.read_frames(decoder, inpainted_video_in_cap)
+        if self.model_processes is not None:
+            # the models process the next frames while this one is hidden and encoded
+            frames = self.model_processes.prefetch(frames)
+        for frame, frame_timestamp_ms, inpainted_frame in frames:
+            # Shared by all models, so downscaling happens at most once per frame
+            frame_context = FrameContext(frame)
+            hidden_frame, mask_results = self.render_frame(
+                frame_context, frame_timestamp_ms, inpainted_frame
+            )
+
+            with tracer.span("timeseries_write"):
+                for mask_extractor in self.mask_extractors:
+                    self.write_timeseries(
+                        mask_extractor.get_newest_timeseries(), index == 0
+                    )
+                    self.write_blendshapes(
+                        mask_extractor.get_newest_blendshapes()
+                    )
+
+            out_frame = None
+            if self.creates_basic_video:
+                with tracer.span("overlay"):
+                    out_frame = overlay_frames(hidden_frame, mask_results)
+                with tracer.span("encode"):
+                    out.write(out_frame)
+
+            if self.frame_observers:
+                self.notify_frame_observers(
+                    index, frame_timestamp_ms, frame, hidden_frame, out_frame
+                )
 
-        if inpainted_video_in_cap is not None:
-            inpainted_video_in_cap.release()
+            self.send_progress_update(job_id, index)
+            index += 1
 
-        print(f"Finished basic_masking and hiding of video {video_id}")
+        self.processed_frames = index
+        elapsed_time = time.perf_counter() - start_time
+        frames_processed.inc(index)
+        frames_seconds.inc(elapsed_time)
+        frames_fps.set(index / elapsed_time if elapsed_time > 0 else 0)
@@ -0,0 +1,67 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from pipeline_worker.utils.video_decoder import get_output_size
+
+
+class FrameContext:
+    # Holds a decoded (BGR) frame and lazily computes derived views of it (downscaled,
+    # RGB, grayscale, MediaPipe image). Every view is computed at most once per frame and
+    # shared by all detectors, mask extractors and hiders that read from the context.
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self.shape = frame.shape
+        self._views = {}
+
+    def get_scaled_size(self, max_resolution: Optional[int]):
+        return get_output_size(self.width, self.height, max_resolution)
+
+    def _get_view(self, kind: str, size: tuple, compute):
+        key = (kind, size)
+        if key not in self._views:
+            self._views[key] = compute()
+        return self._views[key]
+
+    def get_scaled(self, max_resolution: Optional[int] = None) -> np.ndarray:
+        # Returns the BGR frame downscaled so that its longer side is at most max_resolution
+        size = self.get_scaled_size(max_resolution)
+        if size == (self.width, self.height):
+            return self.frame
+
+        return self._get_view(
+            "bgr",
+            size,
+            lambda: cv2.resize(self.frame, size, interpolation=cv2.INTER_AREA),
+        )
+
+    def get_rgb(self, max_resolution: Optional[int] = None) -> np.ndarray:
+        size = self.get_scaled_size(max_resolution)
+        return self._get_view(
+            "rgb",
+            size,
+            lambda: cv2.cvtColor(self.get_scaled(max_resolution), cv2.COLOR_BGR2RGB),
+        )
+
+    def get_gray(self, max_resolution: Optional[int] = None) -> np.ndarray:
+        size = self.get_scaled_size(max_resolution)
+        return self._get_view(
+            "gray",
+            size,
+            lambda: cv2.cvtColor(self.get_scaled(max_resolution), cv2.COLOR_BGR2GRAY),
+        )
+
+    def get_mp_image(self, max_resolution: Optional[int] = None):
+        # MediaPipe models expect SRGB input, the decoded frames are BGR
+        import mediapipe as mp
+
+        size = self.get_scaled_size(max_resolution)
+        return self._get_view(
+            "mp_image",
+            size,
+            lambda: mp.Image(
+                image_format=mp.ImageFormat.SRGB, data=self.get_rgb(max_resolution)
+            ),
+        )
@@ -0,0 +1,55 @@
+import numpy as np
+
+from pipeline_worker.pipeline.Pipeline import Pipeline, replace_inpainting_for_preview
+from pipeline_worker.pipeline.BasicHidingMasking import BasicHidingMasking
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.utils.drawing_utils import overlay_frames
+
+
+class FramePreviewRenderer:
+    """
+    Renders the video hiding and masking of run params on a single frame.
+
+    Models are taken from the process wide model registry, so they stay loaded between
+    requests. MediaPipe models run in IMAGE mode, frames can be requested in any order.
+    Audio and docker models only work on whole videos and are skipped, inpainted parts
+    are blurred instead.
+    """
+
+    def __init__(self):
+        # only used to derive the required models from the run params
+        self.pipeline = Pipeline(None, None)
+
+    def render(self, frame: np.ndarray, run_params: dict) -> np.ndarray:
+        run_params = replace_inpainting_for_preview(run_params)
+        (
+            required_detectors,
+            required_maskers,
+            hiding_strategies,
+        ) = self.pipeline.identify_required_models(run_params)
+        params_3d = run_params["threeDModelCreation"]
+        basic_mask_extractors, _docker_mask_extractors = (
+            self.pipeline.split_mask_extractors(required_maskers, params_3d)
+        )
+
+        model_registry.begin_job()
+        basic_hiding_masking = BasicHidingMasking(
+            0,
+            required_detectors,
+            basic_mask_extractors,
+            hiding_strategies,
+            params_3d,
+            None,
+            False,
+            True,
+            image_mode=True,
+        )
+        try:
+            basic_hiding_masking.init_models()
+            hidden_frame, mask_results = basic_hiding_masking.render_frame(
+                FrameContext(frame), 0
+            )
+        finally:
+            model_registry.end_job()
+        return overlay_frames(hidden_frame, mask_results)
@@ -0,0 +1,319 @@
+import copy
+import queue
+import traceback
+import multiprocessing
+from collections import deque
+
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.utils.frame_ring import SharedFrameRing
+from pipeline_worker.utils.mask_tracks import encode_mask, decode_mask
+from pipeline_worker.utils.thread_budget import thread_budget
+from config import FRAME_RING_SLOTS, MODEL_PROCESS_TIMEOUT_SECONDS
+
+
+def create_model(spec: dict):
+    # The model is created by the BasicHidingMasking (subclass) of the job, so subclasses
+    # replacing create_detector or create_mask_extractor run in the model processes as well
+    owner_class = spec["owner_class"]
+    if owner_class is None:
+        owner_class = type("ModelProcessOwner", spec["owner_bases"], {})
+    owner = owner_class(*spec["owner_args"])
+    for name, value in spec["owner_attributes"].items():
+        setattr(owner, name, value)
+    if spec["kind"] == "detector":
+        return owner.create_detector(spec["model_name"], spec["parts"])
+    return owner.create_mask_extractor(
+        spec["parts"], spec["params_3d"], spec["video_id"], spec["video_metadata"]
+    )
+
+
+def encode_detection_results(detection_results: list) -> list:
+    # masks are sent with 1 bit per pixel, which is all the hider uses
+    return [
+        (result["part_name"], result["detection_type"], encode_mask(result["mask"]))
+        for result in detection_results
+    ]
+
+
+def encode_masking_results(masking_results: list, result_ring, slot: int) -> list:
+    # frame sized masks are written to the result ring, others are sent through the queue
+    encoded_results = []
+    for index, result in enumerate(masking_results):
+        mask = result["mask"]
+        if (
+            result_ring is not None
+            and index < result_ring.slot_shape[0]
+            and mask.shape == result_ring.slot_shape[1:]
+            and mask.dtype == result_ring.dtype
+        ):
+            result_ring.slots[slot][index] = mask
+            encoded_results.append((result["part_name"], "ring", index))
+        else:
+            encoded_results.append((result["part_name"], "array", mask))
+    return encoded_results
+
+
+def run_model_process(spec: dict, request_queue, result_queue):
+    """
+    Runs one detector or mask extractor of a job in its own process. Frames are read
+    from the shared frame ring of the job, the results are sent back with the index of
+    their frame.
+    """
+    frame_ring = None
+    result_ring = None
+    try:
+        thread_budget.configure(
+            processes=spec["process_count"], process_index=spec["process_index"]
+        )
+        model = create_model(spec)
+        result_queue.put(("ready", {"parts_to_mask": getattr(model, "parts_to_mask", None)}))
+
+        while True:
+            message = request_queue.get()
+            if message[0] == "frame":
+                _, frame_index, slot, timestamp_ms = message
+                frame_context = FrameContext(frame_ring.read(slot))
+                if spec["kind"] == "detector":
+                    payload = encode_detection_results(
+                        model.detect(frame_context, timestamp_ms)
+                    )
+                else:
+                    # copied, the queue pickles in a background thread while the
+                    # model already updates its results with the next frame
+                    payload = copy.deepcopy(
+                        (
+                            encode_masking_results(
+                                model.extract_mask(frame_context, timestamp_ms),
+                                result_ring,
+                                slot,
+                            ),
+                            model.get_newest_timeseries(),
+                            model.get_newest_blendshapes(),
+                        )
+                    )
+                frame_context = None
+                result_queue.put(("result", frame_index, payload))
+            elif message[0] == "attach":
+                frame_ring = SharedFrameRing.attach(message[1])
+                if message[2] is not None:
+                    result_ring = SharedFrameRing.attach(message[2])
+            elif message[0] == "close":
+                if hasattr(model, "close_landmark_caches"):
+                    model.close_landmark_caches(message[1])
+                result_queue.put(("closed", None))
+                break
+    except Exception:
+        result_queue.put(("error", traceback.format_exc()))
+    finally:
+        for ring in [frame_ring, result_ring]:
+            if ring is not None:
+                ring.close()
+
+
+class RemoteModel:
+    # Stands in for a model running in its own process, results are received in frame order
+
+    def __init__(self, context, spec: dict, name: str):
+        self.name = name
+        self.request_queue = context.Queue()
+        self.result_queue = context.Queue()
+        self.process = context.Process(
+            target=run_model_process,
+            args=(spec, self.request_queue, self.result_queue),
+            name=name,
+            daemon=True,
+        )
+        self.process.start()
+        self.submitted_frames = deque()
+        self.ready_info = None
+
+    def get_message(self, timeout: float = MODEL_PROCESS_TIMEOUT_SECONDS):
+        waited = 0
+        while True:
+            try:
+                message = self.result_queue.get(timeout=1)
+                break
+            except queue.Empty:
+                waited += 1
+                if not self.process.is_alive():
+                    raise Exception(
+                        f"Model process {self.name} exited with code {self.process.exitcode}"
+                    )
+                if waited >= timeout:
+                    raise Exception(f"Model process {self.name} did not respond in {timeout} s")
+        if message[0] == "error":
+            raise Exception(f"Model process {self.name} failed:\n{message[1]}")
+        return message
+
+    def wait_ready(self):
+        message = self.get_message()
+        self.ready_info = message[1]
+
+    def attach(self, frame_ring_spec: dict, result_ring_spec: dict = None):
+        self.request_queue.put(("attach", frame_ring_spec, result_ring_spec))
+
+    def submit(self, frame_index: int, slot: int, timestamp_ms: int):
+        self.request_queue.put(("frame", frame_index, slot, timestamp_ms))
+        self.submitted_frames.append((frame_index, slot))
+
+    def receive(self) -> tuple:
+        frame_index, slot = self.submitted_frames.popleft()
+        message = self.get_message()
+        if message[0] != "result" or message[1] != frame_index:
+            raise Exception(
+                f"Model process {self.name} sent {message[0]} {message[1]}, expected frame {frame_index}"
+            )
+        return slot, message[2]
+
+    def close(self, complete: bool):
+        if self.process.is_alive():
+            try:
+                self.request_queue.put(("close", complete))
+                # results of frames that were submitted but not received
+                while self.get_message()[0] != "closed":
+                    pass
+            except Exception as error:
+                print(f"Closing model process {self.name} failed: {error}")
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.request_queue.close()
+        self.result_queue.close()
+
+
+class RemoteDetector(RemoteModel):
+    def __init__(self, context, spec: dict, name: str):
+        super().__init__(context, spec, name)
+        self.parts_to_detect = spec["parts"]
+        self.current_results = []
+
+    def detect(self, frame_context: FrameContext, timestamp_ms: int) -> list:
+        # the frame was submitted by ModelProcessGroup.prefetch
+        _slot, encoded_results = self.receive()
+        self.current_results = [
+            {
+                "part_name": part_name,
+                "detection_type": detection_type,
+                "mask": decode_mask(*encoded_mask),
+            }
+            for part_name, detection_type, encoded_mask in encoded_results
+        ]
+        return self.current_results
+
+
+class RemoteMaskExtractor(RemoteModel):
+    def __init__(self, context, spec: dict, name: str):
+        super().__init__(context, spec, name)
+        self.parts_to_mask = spec["parts"]
+        self.result_ring = None
+        self.timeseries = {}
+        self.current_blendshapes = {}
+
+    def wait_ready(self):
+        super().wait_ready()
+        # the extractor may add parts, e.g. for the 3D options
+        self.parts_to_mask = self.ready_info["parts_to_mask"]
+
+    def extract_mask(self, frame_context: FrameContext, timestamp_ms: int) -> list:
+        slot, (encoded_results, self.timeseries, self.current_blendshapes) = self.receive()
+        # masks in the result ring are only valid until its slot is reused, which is
+        # after the frame was written (see ModelProcessGroup.prefetch)
+        return [
+            {
+                "part_name": part_name,
+                "mask": self.result_ring.read(slot)[mask] if storage == "ring" else mask,
+            }
+            for part_name, storage, mask in encoded_results
+        ]
+
+    def get_newest_timeseries(self):
+        return self.timeseries
+
+    def get_newest_blendshapes(self):
+        return self.current_blendshapes
+
+
+class ModelProcessGroup:
+    """
+    Runs the detectors and mask extractors of a job in parallel, each in its own process.
+
+    The frames are written once into a shared memory ring, which all model processes
+    read without copying. Up to FRAME_RING_SLOTS frames are processed ahead of the
+    frame the BasicHidingMasking renders, the remote models return the results of the
+    frames in order. Mask images of the extractors come back through a shared result
+    ring per extractor, detection masks are small enough for the queues.
+    """
+
+    def __init__(self, slot_count: int = FRAME_RING_SLOTS):
+        self.slot_count = slot_count
+        # spawned, MediaPipe and torch do not survive a fork with running threads
+        self.context = multiprocessing.get_context("spawn")
+        self.models = []
+        self.frame_ring = None
+        self.result_rings = []
+
+    def start_detector(self, spec: dict) -> RemoteDetector:
+        detector = RemoteDetector(
+            self.context, spec, f"detector-{spec['model_name']}-{len(self.models)}"
+        )
+        self.models.append(detector)
+        return detector
+
+    def start_mask_extractor(self, spec: dict) -> RemoteMaskExtractor:
+        mask_extractor = RemoteMaskExtractor(
+            self.context, spec, f"mask-extractor-{len(self.models)}"
+        )
+        self.models.append(mask_extractor)
+        return mask_extractor
+
+    def wait_ready(self):
+        # the processes load their models at the same time
+        for model in self.models:
+            model.wait_ready()
+
+    def attach(self, frame_shape: tuple):
+        self.frame_ring = SharedFrameRing(self.slot_count, frame_shape)
+        for model in self.models:
+            result_ring = None
+            if isinstance(model, RemoteMaskExtractor) and model.parts_to_mask:
+                result_ring = SharedFrameRing(
+                    self.slot_count, (len(model.parts_to_mask),) + tuple(frame_shape)
+                )
+                self.result_rings.append(result_ring)
+                model.result_ring = result_ring
+            model.attach(
+                self.frame_ring.get_spec(),
+                result_ring.get_spec() if result_ring is not None else None,
+            )
+
+    def prefetch(self, frames):
+        """
+        Submits the frames of the (frame, timestamp_ms, ...) iterator to all models and
+        yields them unchanged, once all following slots of the ring are in flight.
+        """
+        pending_frames = deque()
+        for frame_index, item in enumerate(frames):
+            frame, timestamp_ms = item[0], item[1]
+            if self.frame_ring is None:
+                self.attach(frame.shape)
+            if len(pending_frames) == self.slot_count:
+                # the results of the yielded frame are received before its slot is reused
+                yield pending_frames.popleft()
+            slot = frame_index % self.slot_count
+            self.frame_ring.write(slot, frame)
+            for model in self.models:
+                model.submit(frame_index, slot, timestamp_ms)
+            pending_frames.append(item)
+        while pending_frames:
+            yield pending_frames.popleft()
+
+    def close(self, complete: bool):
+        for model in self.models:
+            model.close(complete)
+        self.models = []
+        for ring in [self.frame_ring] + self.result_rings:
+            if ring is not None:
+                ring.close()
+        self.frame_ring = None
+        self.result_rings = []
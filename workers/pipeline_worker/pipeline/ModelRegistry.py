@@ -0,0 +1,229 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+from common.utils.metrics import metrics_registry
+from config import MODEL_REGISTRY_MAX_BYTES, MODEL_REGISTRY_SIZE_FACTOR
+
+model_load_seconds = metrics_registry.histogram(
+    "model_load_seconds",
+    "Time to load a model that was not cached by the model registry",
+    ("model",),
+)
+
+
+class VideoModeModel:
+    """
+    Wraps a MediaPipe task created in VIDEO running mode. Such a task requires strictly
+    increasing timestamps over its whole lifetime, so every video (or pass over a video)
+    gets its timestamps shifted behind the last timestamp of the previous one.
+    """
+
+    # gap between two videos, large enough for the trackers to drop the previous ROI
+    RESET_GAP_MS = 10_000
+
+    def __init__(self, model):
+        self.model = model
+        self.__offset_ms = 0
+        self.__last_timestamp_ms = -1
+
+    def reset(self):
+        if self.__last_timestamp_ms >= 0:
+            self.__offset_ms = self.__last_timestamp_ms + self.RESET_GAP_MS
+
+    def detect_for_video(self, image, timestamp_ms: int):
+        timestamp_ms = int(timestamp_ms) + self.__offset_ms
+        if timestamp_ms <= self.__last_timestamp_ms:
+            timestamp_ms = self.__last_timestamp_ms + 1
+        self.__last_timestamp_ms = timestamp_ms
+        return self.model.detect_for_video(image, timestamp_ms)
+
+    def close(self):
+        self.model.close()
+
+
+class ImageModeModel:
+    """
+    Wraps a MediaPipe task created in IMAGE running mode behind the VIDEO mode interface,
+    so frames can be processed in any order (e.g. single frame previews).
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def detect_for_video(self, image, timestamp_ms: int):
+        return self.model.detect(image)
+
+    def close(self):
+        self.model.close()
+
+
+class ModelRegistry:
+    """
+    Process wide cache of loaded models, so consecutive jobs of a worker reuse them.
+
+    Models are keyed by their model file and the options they were created with and are
+    evicted in least recently used order once the estimated memory of all cached models
+    exceeds max_bytes. A model is only handed out once per job, further requests for the
+    same key within a job get a separate (uncached) instance, since MediaPipe VIDEO mode
+    tasks can not be shared between consumers. Those are closed when the job ends.
+    """
+
+    def __init__(self, max_bytes: int, size_factor: float):
+        self.max_bytes = max_bytes
+        self.size_factor = size_factor
+        self.__models = OrderedDict()  # key -> (model, estimated size in bytes)
+        self.__leased_keys = set()
+        self.__pending_close = []  # evicted models still used and uncached instances of the job
+        self.__lock = threading.Lock()
+        self.stats = {
+            "loads": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "load_time": 0.0,
+        }
+
+    @staticmethod
+    def get_key(model_path: str, options: dict) -> tuple:
+        return (os.path.abspath(model_path), tuple(sorted(options.items())))
+
+    def estimate_size(self, model_path: str) -> int:
+        try:
+            return int(os.path.getsize(model_path) * self.size_factor)
+        except OSError:
+            return 0
+
+    def begin_job(self):
+        # Called before every job, models handed out for the previous job are free again
+        self.end_job()
+
+    def end_job(self):
+        # Closes the models of the job that are not cached, the cached ones stay loaded
+        with self.__lock:
+            self.__leased_keys.clear()
+            pending_close = self.__pending_close
+            self.__pending_close = []
+
+        for model in pending_close:
+            self.__close(model)
+
+    def get(
+        self,
+        model_path: str,
+        options: dict,
+        loader: Callable[[], Any],
+        video_mode: bool = False,
+        image_mode: bool = False,
+    ):
+        """
+        Returns the cached model for model_path and options or loads it with loader.
+
+        Args:
+            model_path (str): Model file, part of the cache key and used for the size estimate.
+            options (dict): Options the model is created with, part of the cache key.
+            loader (Callable): Creates the model.
+            video_mode (bool): Wraps the model as VideoModeModel, which is reset on every hand out.
+            image_mode (bool): Wraps the model (created in IMAGE running mode) as ImageModeModel.
+        """
+        key = self.get_key(model_path, options)
+
+        with self.__lock:
+            if key in self.__leased_keys:
+                cached = None
+                cacheable = False
+            else:
+                cached = self.__models.get(key)
+                cacheable = True
+                self.__leased_keys.add(key)
+                if cached is not None:
+                    self.__models.move_to_end(key)
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+
+        if cached is not None:
+            model = cached[0]
+            if isinstance(model, VideoModeModel):
+                model.reset()
+            return model
+
+        model = self.__load(model_path, loader, video_mode, image_mode)
+        if cacheable:
+            self.__insert(key, model, self.estimate_size(model_path))
+        else:
+            with self.__lock:
+                self.__pending_close.append(model)
+        return model
+
+    def __load(
+        self,
+        model_path: str,
+        loader: Callable[[], Any],
+        video_mode: bool,
+        image_mode: bool,
+    ):
+        start_time = time.time()
+        model = loader()
+        load_time = time.time() - start_time
+        with self.__lock:
+            self.stats["loads"] += 1
+            self.stats["load_time"] += load_time
+        model_load_seconds.observe(load_time, model=os.path.basename(model_path))
+
+        if image_mode:
+            return ImageModeModel(model)
+        return VideoModeModel(model) if video_mode else model
+
+    def __insert(self, key: tuple, model, size: int):
+        evicted = []
+        with self.__lock:
+            self.__models[key] = (model, size)
+            while (
+                len(self.__models) > 1
+                and sum(size for _, size in self.__models.values()) > self.max_bytes
+            ):
+                evicted_key, (evicted_model, _) = self.__models.popitem(last=False)
+                self.stats["evictions"] += 1
+                if evicted_key in self.__leased_keys:
+                    # still used by the running job, close it once the job is done
+                    self.__pending_close.append(evicted_model)
+                else:
+                    evicted.append(evicted_model)
+
+        for evicted_model in evicted:
+            self.__close(evicted_model)
+
+    @staticmethod
+    def __close(model):
+        if hasattr(model, "close"):
+            try:
+                model.close()
+            except Exception as error:
+                print("Failed to close model")
+                print(error)
+
+    def get_loaded_models(self) -> list:
+        # file names of the cached models, advertised to the backend for job scheduling
+        with self.__lock:
+            return sorted(set(os.path.basename(key[0]) for key in self.__models))
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "cached_models": len(self.__models),
+                "cached_bytes": sum(size for _, size in self.__models.values()),
+            }
+
+
+model_registry = ModelRegistry(MODEL_REGISTRY_MAX_BYTES, MODEL_REGISTRY_SIZE_FACTOR)
+metrics_registry.gauge(
+    "model_registry_cached_bytes",
+    "Estimated memory of the models kept loaded between jobs",
+    collect=lambda: {(): model_registry.get_stats()["cached_bytes"]},
+)
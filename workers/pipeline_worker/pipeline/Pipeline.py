@@ -1,4 +1,5 @@
 import os
+import copy
 import shutil
 import time
 import ffmpeg
@@ -9,6 +10,7 @@ from config import (
     RESULT_BASE_PATH,
     VIDEOS_BASE_PATH,
     AVAILABLE_DOCKER_MODELS,
+    PARALLEL_MODEL_PROCESSES,
 )
 
 from common.backend_client import BackendClient
@@ -24,10 +26,46 @@ from pipeline_worker.pipeline.PipelineTypes import (
     PartToMask,
 )
 from pipeline_worker.utils.video_utils import merge_results
+from pipeline_worker.utils.tracing import tracer
+from pipeline_worker.utils.thread_budget import thread_budget
 from common.utils.app_utils import save_preview_image
 
 
+# Hiding of inpainted parts in previews, inpainting only works on the whole video
+PREVIEW_INPAINT_FALLBACK = {
+    "key": "blur",
+    "params": {
+        "subjectDetection": "silhouette",
+        "detectionModel": "mediapipe",
+        "detectionParams": {"numPoses": 1, "confidence": 0.5},
+        "hidingParams": {"kernelSize": 23, "extraPixels": 0},
+    },
+}
+
+
+def replace_inpainting_for_preview(run_params: dict) -> dict:
+    # Previews blur the inpainted parts instead of showing them unhidden
+    video_masking = {}
+    for video_part, video_part_params in run_params["videoMasking"].items():
+        hiding_strategy = video_part_params.get("hidingStrategy", {})
+        if hiding_strategy.get("key") == "inpaint":
+            fallback = copy.deepcopy(PREVIEW_INPAINT_FALLBACK)
+            num_poses = (
+                hiding_strategy.get("params", {})
+                .get("detectionParams", {})
+                .get("numPoses")
+            )
+            if num_poses:
+                fallback["params"]["detectionParams"]["numPoses"] = num_poses
+            video_part_params = {**video_part_params, "hidingStrategy": fallback}
+        video_masking[video_part] = video_part_params
+    return {**run_params, "videoMasking": video_masking}
+
+
 class Pipeline:
+    # replaced by the offline benchmark (pipeline_worker.bench) to swap in fake models
+    basic_hiding_masking_class = BasicHidingMasking
+
     def __init__(
         self,
         backend_client: BackendClient,
@@ -43,6 +81,7 @@ class Pipeline:
         self.creates_3d_out = False
         self.creates_video_out = False
         self.is_inpainting = False
+        self.preview_params = None
 
     def check_tasks(
         self,
@@ -89,6 +128,16 @@ class Pipeline:
         if self.creates_docker_video or self.creates_basic_video or self.masks_audio:
             self.creates_video_out = True
 
+    def restrict_to_preview(self):
+        # previews only show the video hiding and masking, audio and 3d outputs
+        # are too slow for a few sampled frames and are skipped, inpainting is
+        # replaced before (replace_inpainting_for_preview)
+        self.masks_audio = False
+        self.keeps_audio = False
+        self.is_inpainting = False
+        self.creates_3d_out = False
+        self.creates_video_out = self.creates_basic_video
+
     def identify_required_models(self, run_params: dict):
         # extract arguments from request and create initialization arguments for maskers, detectors and hider
         hiding_strategies: HidingStategies = {}
@@ -224,7 +273,7 @@ class Pipeline:
             else 0
         )
 
-        return BasicHidingMasking(
+        basic_hiding_masking = self.basic_hiding_masking_class(
             inpaining_num_poses,
             required_detectors,
             required_maskers,
@@ -233,10 +282,19 @@ class Pipeline:
             self.backend_client,
             self.masks_audio,
             self.creates_basic_video,
+            self.preview_params,
+        )
+        # previews process too few frames to make up for starting the model processes
+        basic_hiding_masking.parallel_models = (
+            PARALLEL_MODEL_PROCESSES and not self.preview_params
         )
+        return basic_hiding_masking
 
     def run(self, video_id: str, job_id: str, run_params: dict):
         print(f"Running job on video {video_id}")
+        self.preview_params = run_params.get("preview")
+        if self.preview_params:
+            run_params = replace_inpainting_for_preview(run_params)
 
         video_in_path = os.path.join(VIDEOS_BASE_PATH, video_id + ".mp4")
         video_out_path = os.path.join(RESULT_BASE_PATH, video_id + ".mp4")
@@ -253,9 +311,16 @@ class Pipeline:
         basic_mask_extractors, docker_mask_extractors = self.split_mask_extractors(
             required_maskers, params_3d
         )
+
+        # Preview jobs skip docker sub jobs and audio
+        if self.preview_params:
+            docker_mask_extractors = {}
+
         self.check_tasks(
             run_params, basic_mask_extractors, docker_mask_extractors, params_3d
         )
+        if self.preview_params:
+            self.restrict_to_preview()
 
         docker_job_id = None
 
@@ -276,23 +341,27 @@ class Pipeline:
                 run_params, required_detectors, basic_mask_extractors, hiding_strategies
             )
             print(f"Started basic masking of {video_id}")
-            basic_hiding_masking.run(video_in_path, video_out_path, job_id, video_id)
+            with tracer.span("basic_hiding_masking"):
+                basic_hiding_masking.run(
+                    video_in_path, video_out_path, job_id, video_id
+                )
             print(f"Finished basic masking of {video_id}")
 
         # Wait for custom docker model to finish
         if docker_mask_extractors:
             print(f"Waiting for sub job to complete for {video_id}")
-            count = 0
-            timeout_max = 2160  # 6hours
-            job_status = self.backend_client.fetch_job_status(docker_job_id)
-            while count < timeout_max:
-                if job_status == "finished":
-                    break
-                if job_status == "failed":
-                    raise Exception("Sub job failed to complete.")
-                time.sleep(1)
-                count = count + 1
+            with tracer.span("docker_wait", sub_job_id=docker_job_id):
+                count = 0
+                timeout_max = 2160  # 6hours
                 job_status = self.backend_client.fetch_job_status(docker_job_id)
+                while count < timeout_max:
+                    if job_status == "finished":
+                        break
+                    if job_status == "failed":
+                        raise Exception("Sub job failed to complete.")
+                    time.sleep(1)
+                    count = count + 1
+                    job_status = self.backend_client.fetch_job_status(docker_job_id)
 
             self.handle_docker_model_finished(
                 docker_job_id, video_in_path, video_out_path
@@ -312,12 +381,19 @@ class Pipeline:
                 video_path = os.path.join(RESULT_BASE_PATH, video_id + "_old.mp4")
                 os.rename(video_out_path, video_path)
 
-            masked_audio_path = audio_masker.mask(video_id)
-            input_video = ffmpeg.input(video_path)
-            input_audio = ffmpeg.input(masked_audio_path)
-            output = ffmpeg.output(input_video.video, input_audio.audio, video_out_path)
-
-            ffmpeg.run(output, overwrite_output=True)
+            with tracer.span("audio_masking"):
+                masked_audio_path = audio_masker.mask(video_id)
+            with tracer.span("audio_merge"):
+                input_video = ffmpeg.input(video_path)
+                input_audio = ffmpeg.input(masked_audio_path)
+                encoder_options = {}
+                if thread_budget.get("encoder_threads"):
+                    encoder_options["threads"] = thread_budget.get("encoder_threads")
+                output = ffmpeg.output(
+                    input_video.video, input_audio.audio, video_out_path, **encoder_options
+                )
+
+                ffmpeg.run(output, overwrite_output=True)
             print(f"Finished audio masking of {video_id}")
 
         # if a docker model produces a result and audio should be removed
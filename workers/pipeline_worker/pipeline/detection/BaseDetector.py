@@ -6,9 +6,25 @@ from pipeline_worker.pipeline.PipelineTypes import (
     PartDetectionMethods,
     PartToDetect,
 )
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from config import DEFAULT_INFERENCE_RESOLUTION
 import numpy as np
 
 
+def get_inference_resolution(params_list: List[dict]):
+    # The most demanding part decides, 0/None requests the full frame resolution
+    resolutions = [
+        params["inferenceResolution"]
+        for params in params_list
+        if params and "inferenceResolution" in params
+    ]
+    if not resolutions:
+        return DEFAULT_INFERENCE_RESOLUTION
+    if any(not resolution for resolution in resolutions):
+        return None
+    return max(int(resolution) for resolution in resolutions)
+
+
 class BaseDetector:
     def __init__(self, parts_to_detect: List[PartToDetect]):
         self.silhouette_methods: PartDetectionMethods = (
@@ -18,11 +34,22 @@ class BaseDetector:
         self.silhouette_methods = {}
         self.parts_to_detect: List[PartToDetect] = parts_to_detect
         self.current_results: List[DetectionResult] = []
+        self.frame_context: FrameContext = None
+        self.inference_resolution = get_inference_resolution(
+            [part.get("detection_params") for part in parts_to_detect]
+        )
 
-    def detect(self, frame: np.ndarray, timestamp_ms: int) -> List[DetectionResult]:
+    def detect(
+        self, frame_context: FrameContext, timestamp_ms: int
+    ) -> List[DetectionResult]:
         # Runs the adequate detection method for each body part.
         # During part processing results from other parts can be used via self.current_results
         # (e.g use the detection of the body silhouette, to find the background, without re_computing this silhouette
+        # Detection runs on the frame downscaled to the inference resolution, the resulting masks
+        # are only upscaled to the output resolution where they are applied (see Hider)
+        # Models that need another color space read it from self.frame_context (converted once per frame)
+        self.frame_context = frame_context
+        frame = frame_context.get_scaled(self.inference_resolution)
         self.current_results = []
         for part_to_detect in self.parts_to_detect:
             part_result: np.ndarray = self.detect_part(
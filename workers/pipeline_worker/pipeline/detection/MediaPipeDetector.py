@@ -1,24 +1,39 @@
 from typing import List
 import os
-import cv2
 import mediapipe as mp
 import numpy as np
 
 from pipeline_worker.pipeline.detection.BaseDetector import BaseDetector
+from pipeline_worker.pipeline.ModelRegistry import model_registry
 from pipeline_worker.pipeline.PipelineTypes import PartToDetect
 
 standard_model_path = os.path.join("models", "pose_landmarker_heavy.task")
+lite_model_path = os.path.join("models", "pose_landmarker_lite.task")
+
+
+def get_pose_model_path(use_lite_model: bool) -> str:
+    # The lite model is optional, without it the standard model is used
+    if use_lite_model and os.path.exists(lite_model_path):
+        return lite_model_path
+    return standard_model_path
 
 
 class MediaPipeDetector(BaseDetector):
-    def __init__(self, parts_to_detect: List[PartToDetect]):
+    def __init__(
+        self,
+        parts_to_detect: List[PartToDetect],
+        use_lite_model: bool = False,
+        image_mode: bool = False,
+    ):
         super().__init__(parts_to_detect)
         self.reorder_parts_to_detect()
         self.silhouette_methods = {
             "body": self.detect_body_silhouette,
             "background": self.detect_background_silhouette,
         }
-        self.model_path = standard_model_path
+        self.model_path = get_pose_model_path(use_lite_model)
+        # IMAGE running mode processes frames independently, in any order
+        self.image_mode = image_mode
         self.init_mp_model()
 
     def reorder_parts_to_detect(self) -> List[PartToDetect]:
@@ -52,40 +67,60 @@ class MediaPipeDetector(BaseDetector):
 
         options = PoseLandmarkerOptions(
             base_options=BaseOptions(model_asset_path=self.model_path),
-            running_mode=VisionRunningMode.VIDEO,
+            running_mode=(
+                VisionRunningMode.IMAGE if self.image_mode else VisionRunningMode.VIDEO
+            ),
             output_segmentation_masks=True,
             num_poses=detection_params["numPoses"],
             min_pose_detection_confidence=detection_params["confidence"],
         )
 
-        self.model = PoseLandmarker.create_from_options(options)
+        self.model = model_registry.get(
+            self.model_path,
+            {
+                "task": "pose",
+                "segmentation": True,
+                "num_poses": detection_params["numPoses"],
+                "confidence": detection_params["confidence"],
+                "image_mode": self.image_mode,
+            },
+            lambda: PoseLandmarker.create_from_options(options),
+            video_mode=not self.image_mode,
+            image_mode=self.image_mode,
+        )
 
     def detect_body_silhouette(
         self, frame: np.ndarray, timestamp_ms: int
     ) -> np.ndarray:
         # Returns the segmentation mask for the body [black / white]
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+        mp_image = self.frame_context.get_mp_image(self.inference_resolution)
 
         results = self.model.detect_for_video(mp_image, timestamp_ms)
 
         output_image = np.zeros((mp_image.height, mp_image.width, mp_image.channels))
         if results.segmentation_masks:
             for segmentation_mask in results.segmentation_masks:
-                mask = segmentation_mask.numpy_view()
-                seg_mask = np.repeat(mask[:, :, np.newaxis], 3, axis=2)
-
-                output_image[seg_mask > 0.3] = 1
-                interpolation_mask = (seg_mask > 0.1) & (seg_mask <= 0.3)
-                interpolation_factor = (seg_mask - 0.1) / (0.3 - 0.1)
-                output_image[interpolation_mask] = (
-                    1
-                    - (1 - interpolation_factor[interpolation_mask])
-                    * output_image[interpolation_mask]
-                    + interpolation_factor[interpolation_mask] * 0
+                output_image = self.apply_segmentation_mask(
+                    output_image, segmentation_mask.numpy_view()
                 )
         return output_image
 
+    @staticmethod
+    def apply_segmentation_mask(output_image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        # Marks confident pixels (> 0.3) and interpolates the uncertain border (0.1 - 0.3)
+        seg_mask = np.repeat(mask[:, :, np.newaxis], 3, axis=2)
+
+        output_image[seg_mask > 0.3] = 1
+        interpolation_mask = (seg_mask > 0.1) & (seg_mask <= 0.3)
+        interpolation_factor = (seg_mask - 0.1) / (0.3 - 0.1)
+        output_image[interpolation_mask] = (
+            1
+            - (1 - interpolation_factor[interpolation_mask])
+            * output_image[interpolation_mask]
+            + interpolation_factor[interpolation_mask] * 0
+        )
+        return output_image
+
     def detect_background_silhouette(
         self, frame: np.ndarray, timestamp_ms: int
     ) -> np.ndarray:
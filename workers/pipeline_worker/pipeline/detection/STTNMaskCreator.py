@@ -11,6 +11,10 @@ from config import (
     TS_BASE_PATH,
     VIDEOS_BASE_PATH,
 )
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.utils.video_decoder import VideoDecoder
+from pipeline_worker.utils.video_metadata import get_video_metadata
 
 
 model_path = os.getcwd() + '/models/pose_landmarker_heavy.task'
@@ -42,40 +46,40 @@ class STTNMaskCreator:
             output_segmentation_masks=True,
             num_poses=num_poses)
 
-        frame_count = 0
-        with PoseLandmarker.create_from_options(options) as landmarker:
-            video_cap = cv2.VideoCapture(video_in_path)
-
-            while True:
-                ret, frame = video_cap.read()
-                if not ret:
-                    break
+        landmarker = model_registry.get(
+            model_path,
+            {"task": "pose", "segmentation": True, "num_poses": num_poses},
+            lambda: PoseLandmarker.create_from_options(options),
+            video_mode=True,
+        )
 
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_timestamp_ms = video_cap.get(cv2.CAP_PROP_POS_MSEC)
+        frame_count = 0
+        decoder = VideoDecoder(
+            video_in_path,
+            frame_timestamps=get_video_metadata(video_id, video_in_path)["frame_timestamps"],
+        )
 
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+        for frame, frame_timestamp_ms in decoder:
+            mp_image = FrameContext(frame).get_mp_image()
 
-                pose_landmarker_result = landmarker.detect_for_video(mp_image, int(frame_timestamp_ms))
+            pose_landmarker_result = landmarker.detect_for_video(mp_image, frame_timestamp_ms)
 
-                output_image = cv2.cvtColor(mp_image.numpy_view(), cv2.COLOR_RGB2BGR)
-                output_image[True] = 0
+            output_image = np.zeros(frame.shape, dtype=np.uint8)
 
-                if pose_landmarker_result.segmentation_masks:
-                    mask_index = 0
-                    for segmentation_mask in pose_landmarker_result.segmentation_masks:
-                        mask = segmentation_mask.numpy_view()
+            if pose_landmarker_result.segmentation_masks:
+                mask_index = 0
+                for segmentation_mask in pose_landmarker_result.segmentation_masks:
+                    mask = segmentation_mask.numpy_view()
 
-                        output_image[mask > 0.1] = self._mask_colors[mask_index]
-                        mask_index += 1
+                    output_image[mask > 0.1] = self._mask_colors[mask_index]
+                    mask_index += 1
 
-                # Save the frame as a PNG image
-                image_path = os.path.join(mask_out_dir, f"{frame_count:05d}.png")
-                cv2.imwrite(image_path, output_image, [cv2.IMWRITE_PNG_COMPRESSION, 0])  # Use PNG format
+            # Save the frame as a PNG image
+            image_path = os.path.join(mask_out_dir, f"{frame_count:05d}.png")
+            cv2.imwrite(image_path, output_image, [cv2.IMWRITE_PNG_COMPRESSION, 0])  # Use PNG format
 
-                frame_count += 1
+            frame_count += 1
 
-            # Release the video capture object
-            video_cap.release()
+        decoder.close()
 
         return mask_out_dir
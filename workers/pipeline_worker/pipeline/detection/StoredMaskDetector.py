@@ -0,0 +1,36 @@
+from typing import List
+
+from pipeline_worker.pipeline.PipelineTypes import DetectionResult, PartToDetect
+from pipeline_worker.pipeline.detection.BaseDetector import BaseDetector
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.utils.mask_tracks import MaskTrackReader
+
+
+class StoredMaskDetector(BaseDetector):
+    # Replays the detection masks persisted by an earlier job on the same video with the
+    # same detection model and params, no model is loaded and no inference is run
+    def __init__(
+        self,
+        parts_to_detect: List[PartToDetect],
+        track_path: str,
+        expected_frame_count: int = None,
+    ):
+        super().__init__(parts_to_detect)
+        self.reader = MaskTrackReader(track_path, expected_frame_count)
+
+    def detect(
+        self, frame_context: FrameContext, timestamp_ms: int
+    ) -> List[DetectionResult]:
+        masks = self.reader.read_frame()
+        self.current_results = [
+            {
+                "part_name": part_to_detect["part_name"],
+                "detection_type": part_to_detect["detection_type"],
+                "mask": masks[part_to_detect["part_name"]],
+            }
+            for part_to_detect in self.parts_to_detect
+        ]
+        return self.current_results
+
+    def close(self):
+        self.reader.close()
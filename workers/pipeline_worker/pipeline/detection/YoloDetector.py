@@ -9,6 +9,7 @@ from pipeline_worker.utils.drawing_utils import (
 )
 from pipeline_worker.pipeline.PipelineTypes import PartToDetect
 from pipeline_worker.pipeline.detection.BaseDetector import BaseDetector
+from pipeline_worker.pipeline.ModelRegistry import model_registry
 
 from ultralytics import YOLO
 
@@ -42,8 +43,11 @@ class YoloDetector(BaseDetector):
             self.parts_to_detect.pop(index)
             self.parts_to_detect.append(background_part)
 
+    def load_yolo_model(self, model_path: str):
+        return model_registry.get(model_path, {}, lambda: YOLO(model_path))
+
     def init_model(self):
-        self.models["body"] = YOLO(body_bbox_model_path)
+        self.models["body"] = self.load_yolo_model(body_bbox_model_path)
         if any(
             [
                 True
@@ -53,11 +57,11 @@ class YoloDetector(BaseDetector):
         ):
             # detection_params = self.get_part_to_detect("body")["detection_params"]
             # @ToDo use custom detection_params
-            self.models["silhouette"] = YOLO(seg_model_path)
+            self.models["silhouette"] = self.load_yolo_model(seg_model_path)
         if any([True for part in self.parts_to_detect if part["part_name"] == "face"]):
             # detection_params = self.get_part_to_detect("face")["detection_params"]
             # @ToDo use custom detection_params
-            self.models["face"] = YOLO(face_bbox_model_path)
+            self.models["face"] = self.load_yolo_model(face_bbox_model_path)
 
     def detect_body_bbox(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
         # Returns the segmentation mask for the body [black / white]
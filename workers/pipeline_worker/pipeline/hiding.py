@@ -49,17 +49,14 @@ class Hider:
         self, base_image: np.ndarray, detection_result: DetectionResult
     ) -> np.ndarray:
         hiding_strategy = self.hiding_strategies[detection_result["part_name"]]
+        mask = self.scale_mask(detection_result["mask"], base_image.shape)
         if hiding_strategy["key"] == "blur":
-            result = self.hide_blur(
-                base_image, detection_result["mask"], hiding_strategy["params"]
-            )
+            result = self.hide_blur(base_image, mask, hiding_strategy["params"])
         elif hiding_strategy["key"] == "blackout":
-            result = self.hide_blackout(
-                base_image, detection_result["mask"], hiding_strategy["params"]
-            )
+            result = self.hide_blackout(base_image, mask, hiding_strategy["params"])
         elif hiding_strategy["key"] == "contour":
             result = self.hide_contour_laplacian(
-                base_image, detection_result["mask"], hiding_strategy["params"]
+                base_image, mask, hiding_strategy["params"]
             )
         else:
             raise Exception(
@@ -67,6 +64,16 @@ class Hider:
             )
         return result
 
+    def scale_mask(self, mask: np.ndarray, shape: tuple) -> np.ndarray:
+        # Detection masks are computed in the inference resolution of the detector.
+        # Linear interpolation slightly grows the (mask != 0) area, which errs on the side of hiding.
+        height, width = shape[:2]
+        if mask.shape[:2] == (height, width):
+            return mask
+        if mask.dtype == bool or mask.dtype == np.uint8:
+            mask = mask.astype(np.float32)
+        return cv2.resize(mask, (width, height), interpolation=cv2.INTER_LINEAR)
+
     def hide_blur(
         self, base_image: np.ndarray, mask: np.ndarray, params: dict
     ) -> np.ndarray:
@@ -93,7 +100,7 @@ class Hider:
             0,
         )
 
-        gray_image = cv2.cvtColor(blurred_image, cv2.COLOR_RGB2GRAY)
+        gray_image = cv2.cvtColor(blurred_image, cv2.COLOR_BGR2GRAY)
         edge_image = cv2.Laplacian(
             gray_image,
             -1,
@@ -102,7 +109,7 @@ class Hider:
             delta=level_settings["laplacian_delta"],
             borderType=cv2.BORDER_DEFAULT,
         )
-        final_image = cv2.cvtColor(edge_image, cv2.COLOR_GRAY2RGB)
+        final_image = cv2.cvtColor(edge_image, cv2.COLOR_GRAY2BGR)
 
         base_image[mask != 0] = final_image[mask != 0]
         return base_image
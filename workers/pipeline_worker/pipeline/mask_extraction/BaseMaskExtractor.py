@@ -1,5 +1,7 @@
 from typing import List
 from pipeline_worker.pipeline.PipelineTypes import MaskingResult, PartToMask
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.detection.BaseDetector import get_inference_resolution
 
 import numpy as np
 
@@ -7,17 +9,24 @@ import numpy as np
 class BaseMaskExtractor:
     def __init__(self, parts_to_mask: List[PartToMask]):
         self.parts_to_mask: List[PartToMask] = parts_to_mask
+        self.inference_resolution = get_inference_resolution(
+            [part.get("params") for part in parts_to_mask]
+        )
         self.part_methods = {}
         self.current_results: List[MaskingResult] = []
         self.current_blendshapes = {}
         self.timeseries = {}
         self.ts_headers = {}
 
-    def extract_mask(self, frame: np.ndarray, timestamp_ms: int) -> List[MaskingResult]:
+    def extract_mask(
+        self, frame_context: FrameContext, timestamp_ms: int
+    ) -> List[MaskingResult]:
+        # Part methods run their models on frame_context.get_scaled(self.inference_resolution)
+        # but draw their masks in the output resolution (frame_context.shape)
         results: List[MaskingResult] = []
         for part in self.parts_to_mask:
             part_name = part["part_name"]
-            mask = self.part_methods[part_name](frame, timestamp_ms)
+            mask = self.part_methods[part_name](frame_context, timestamp_ms)
             if not mask is None:
                 part_result: MaskingResult = {"part_name": part_name, "mask": mask}
                 results.append(part_result)
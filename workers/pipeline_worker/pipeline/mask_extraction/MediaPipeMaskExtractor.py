@@ -13,16 +13,41 @@ from mediapipe import solutions
 from mediapipe.framework.formats import landmark_pb2
 
 from pipeline_worker.pipeline.PipelineTypes import Params3D, PartToMask
+from pipeline_worker.pipeline.FrameContext import FrameContext
+from pipeline_worker.pipeline.ModelRegistry import model_registry
+from pipeline_worker.pipeline.detection.MediaPipeDetector import get_pose_model_path
+from pipeline_worker.utils.landmark_cache import (
+    LandmarkCacheReader,
+    LandmarkCacheWriter,
+    compute_landmark_cache_key,
+    get_landmark_cache_path,
+)
+
+from config import LANDMARK_CACHE_ENABLED
 
 face_model_path = os.path.join("models", "face_landmarker.task")
-pose_model_path = os.path.join("models", "pose_landmarker_heavy.task")
 hand_model_path = os.path.join("models", "hand_landmarker.task")
 
 
+# Landmark models whose results are cached per video
+CACHED_LANDMARK_TASKS = ["pose", "faceMesh"]
+
+
 class MediaPipeMaskExtractor(BaseMaskExtractor):
-    def __init__(self, parts_to_mask: List[PartToMask], params_3d: Params3D):
+    def __init__(
+        self,
+        parts_to_mask: List[PartToMask],
+        params_3d: Params3D,
+        video_id: str = None,
+        video_metadata: dict = None,
+        use_lite_model: bool = False,
+        image_mode: bool = False,
+    ):
         super().__init__(parts_to_mask)
         self.params_3d = params_3d
+        self.pose_model_path = get_pose_model_path(use_lite_model)
+        # IMAGE running mode processes frames independently, in any order
+        self.image_mode = image_mode
         self.part_methods = {"body": self.mask_body, "face": self.mask_face}
         self.models = {}
         self.timeseries = {}
@@ -32,7 +57,11 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             "face": create_header_mp("face"),
         }
         self.model_3d_only_parts = []
+        self.landmark_cache_readers = {}
+        self.landmark_cache_writers = {}
         self.handle_3d_options()
+        if LANDMARK_CACHE_ENABLED and video_id is not None:
+            self.open_landmark_caches(video_id, video_metadata)
         self.init_models()
 
     def handle_3d_options(self):
@@ -80,7 +109,8 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             self.parts_to_detect.pop(index)
             self.parts_to_detect.append(face_part)
 
-    def init_models(self):
+    def get_model_specs(self) -> dict:
+        # task -> (model path, options, loader) of the models required by the parts to mask
         BaseOptions = mp.tasks.BaseOptions
         VisionRunningMode = mp.tasks.vision.RunningMode
         PoseLandmarker = mp.tasks.vision.PoseLandmarker
@@ -88,6 +118,10 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
         HandLandmarker = mp.tasks.vision.HandLandmarker
         HandLandmarkerOptions = mp.tasks.vision.HandLandmarkerOptions
 
+        running_mode = (
+            VisionRunningMode.IMAGE if self.image_mode else VisionRunningMode.VIDEO
+        )
+        model_specs = {}
         body_part = self.get_part_to_mask("body")
         face_part = self.get_part_to_mask("face")
         pose_params = None
@@ -97,18 +131,31 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             pose_params = face_part["params"]
         if pose_params:
             pose_options = PoseLandmarkerOptions(
-                base_options=BaseOptions(model_asset_path=pose_model_path),
-                running_mode=VisionRunningMode.VIDEO,
+                base_options=BaseOptions(model_asset_path=self.pose_model_path),
+                running_mode=running_mode,
                 output_segmentation_masks=False,
                 num_poses=pose_params["numPoses"],
                 min_pose_detection_confidence=pose_params["confidence"],
             )
             hand_options = HandLandmarkerOptions(
                 base_options=BaseOptions(model_asset_path=hand_model_path),
-                running_mode=VisionRunningMode.VIDEO,
+                running_mode=running_mode,
+            )
+            model_specs["pose"] = (
+                self.pose_model_path,
+                {
+                    "task": "pose",
+                    "segmentation": False,
+                    "num_poses": pose_params["numPoses"],
+                    "confidence": pose_params["confidence"],
+                },
+                lambda: PoseLandmarker.create_from_options(pose_options),
+            )
+            model_specs["hand"] = (
+                hand_model_path,
+                {"task": "hand"},
+                lambda: HandLandmarker.create_from_options(hand_options),
             )
-            self.models["pose"] = PoseLandmarker.create_from_options(pose_options)
-            self.models["hand"] = HandLandmarker.create_from_options(hand_options)
 
         if face_part and face_part["masking_method"] == "faceMesh":
             face_params = face_part["params"]
@@ -116,18 +163,73 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
             face_options = FaceLandmarkerOptions(
                 base_options=BaseOptions(model_asset_path=face_model_path),
-                running_mode=VisionRunningMode.VIDEO,
+                running_mode=running_mode,
                 output_face_blendshapes=True,
                 output_facial_transformation_matrixes=True,
                 num_faces=face_params["numFaces"] if "numFaces" in face_params else face_params["numPoses"],
                 min_face_detection_confidence=face_params["confidence"],
             )
-            self.models["faceMesh"] = FaceLandmarker.create_from_options(face_options)
+            model_specs["faceMesh"] = (
+                face_model_path,
+                {
+                    "task": "faceMesh",
+                    "num_faces": face_options.num_faces,
+                    "confidence": face_options.min_face_detection_confidence,
+                },
+                lambda: FaceLandmarker.create_from_options(face_options),
+            )
+        return model_specs
+
+    def open_landmark_caches(self, video_id: str, video_metadata: dict):
+        # Replays the landmarks of an earlier job on the same video with the same model params,
+        # otherwise records them for the next one
+        for task, (model_path, options, _loader) in self.get_model_specs().items():
+            if task not in CACHED_LANDMARK_TASKS:
+                continue
+            cache_key = compute_landmark_cache_key(
+                task,
+                {**options, "model": os.path.basename(model_path)},
+                self.inference_resolution,
+                video_metadata,
+            )
+            cache_path = get_landmark_cache_path(video_id, cache_key)
+            if os.path.exists(cache_path):
+                print(f"Using cached {task} landmarks of video {video_id}")
+                self.landmark_cache_readers[task] = LandmarkCacheReader(cache_path)
+            else:
+                self.landmark_cache_writers[task] = LandmarkCacheWriter(cache_path)
+
+    def close_landmark_caches(self, complete: bool):
+        for reader in self.landmark_cache_readers.values():
+            reader.close()
+        for writer in self.landmark_cache_writers.values():
+            writer.close(complete)
+        self.landmark_cache_readers = {}
+        self.landmark_cache_writers = {}
 
-    def compute_pose_landmarks(self, frame: np.ndarray, timestamp_ms: int):
-        frame_mp = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+    def init_models(self):
+        for task, (model_path, options, loader) in self.get_model_specs().items():
+            # the hand model only complements the pose model, not needed when replaying poses
+            cached_task = "pose" if task == "hand" else task
+            if cached_task in self.landmark_cache_readers:
+                continue
+            self.models[task] = model_registry.get(
+                model_path,
+                {**options, "image_mode": self.image_mode},
+                loader,
+                video_mode=not self.image_mode,
+                image_mode=self.image_mode,
+            )
+
+    def compute_pose_landmarks(self, frame_context: FrameContext, timestamp_ms: int):
+        if "pose" in self.landmark_cache_readers:
+            return self.landmark_cache_readers["pose"].read_pose_result()
+
+        frame_mp = frame_context.get_mp_image(self.inference_resolution)
         pose_result = self.models["pose"].detect_for_video(frame_mp, timestamp_ms)
 
+        if "pose" in self.landmark_cache_writers:
+            self.landmark_cache_writers["pose"].write_pose_result(pose_result)
         return pose_result
 
     def is_face_required(self):
@@ -136,8 +238,8 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             for part in self.parts_to_mask
         )
 
-    def compute_hand_landmarks(self, frame: np.ndarray, timestamp_ms: int):
-        frame_mp = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+    def compute_hand_landmarks(self, frame_context: FrameContext, timestamp_ms: int):
+        frame_mp = frame_context.get_mp_image(self.inference_resolution)
         hand_result = self.models["hand"].detect_for_video(frame_mp, timestamp_ms)
         return hand_result.hand_landmarks
 
@@ -153,12 +255,12 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
         for lm in landmarks_to_hide:
             lm.visibility = 0.0
 
-    def mask_body(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
-        pose_landmark_data = self.compute_pose_landmarks(frame, timestamp_ms)
+    def mask_body(self, frame_context: FrameContext, timestamp_ms: int) -> np.ndarray:
+        pose_landmark_data = self.compute_pose_landmarks(frame_context, timestamp_ms)
         pose_landmarks_list = pose_landmark_data.pose_landmarks
         hand_landmark_list = (
             []
-        )  # (deactivated for now) self.compute_hand_landmarks(frame, timestamp_ms)
+        )  # (deactivated for now) self.compute_hand_landmarks(frame_context, timestamp_ms)
 
         # Hide hand points from pose, since if already have the detailed ones
         if hand_landmark_list:
@@ -175,39 +277,47 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
         # only draw an output frame, if we require an output video and do not
         # just want to extract a 3d model
         if not "body" in self.model_3d_only_parts:
-            output_image = np.zeros(frame.shape, dtype=np.uint8)
+            output_image = np.zeros(frame_context.shape, dtype=np.uint8)
             output_image = self.draw_pose_landmarks(output_image, pose_landmarks_list)
             output_image = self.draw_hand_landmarks(output_image, hand_landmark_list)
             return output_image
         return
 
-    def mask_face(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+    def mask_face(self, frame_context: FrameContext, timestamp_ms: int) -> np.ndarray:
         face_part = self.get_part_to_mask("face")
         if face_part["masking_method"] == "skeleton":
-            return self.mask_face_skeleton(frame, timestamp_ms)
+            return self.mask_face_skeleton(frame_context, timestamp_ms)
         elif face_part["masking_method"] == "faceMesh":
-            return self.mask_face_mesh(frame, timestamp_ms)
+            return self.mask_face_mesh(frame_context, timestamp_ms)
         else:
             raise Exception("Invalid face masking method specified")
 
-    def mask_face_skeleton(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
+    def mask_face_skeleton(
+        self, frame_context: FrameContext, timestamp_ms: int
+    ) -> np.ndarray:
         body_result = self.get_part_to_mask("body")
 
         # if landmarks of body pose were already included this includes the facial points already
         if body_result:
             return
 
-        pose_landmark_data = self.compute_pose_landmarks(frame, timestamp_ms)
+        pose_landmark_data = self.compute_pose_landmarks(frame_context, timestamp_ms)
         body_result = pose_landmark_data.pose_landmarks
         self.hide_pose_face_landmarks(body_result)
 
-        output_image = np.zeros((frame.shape), dtype=np.uint8)
+        output_image = np.zeros((frame_context.shape), dtype=np.uint8)
         output_image = self.draw_pose_landmarks(output_image, body_result)
         return output_image
 
-    def compute_face_results(self, frame: np.ndarray, timestamp_ms: int):
-        frame_mp = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
+    def compute_face_results(self, frame_context: FrameContext, timestamp_ms: int):
+        if "faceMesh" in self.landmark_cache_readers:
+            return self.landmark_cache_readers["faceMesh"].read_face_result()
+
+        frame_mp = frame_context.get_mp_image(self.inference_resolution)
         face_result = self.models["faceMesh"].detect_for_video(frame_mp, timestamp_ms)
+
+        if "faceMesh" in self.landmark_cache_writers:
+            self.landmark_cache_writers["faceMesh"].write_face_result(face_result)
         return face_result
 
     def store_blendshapes(self, blendshapes, transformation_matrixes):
@@ -224,8 +334,10 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             "transformationMatrices": processed_matrices,
         }
 
-    def mask_face_mesh(self, frame: np.ndarray, timestamp_ms: int) -> np.ndarray:
-        face_results = self.compute_face_results(frame, timestamp_ms)
+    def mask_face_mesh(
+        self, frame_context: FrameContext, timestamp_ms: int
+    ) -> np.ndarray:
+        face_results = self.compute_face_results(frame_context, timestamp_ms)
         face_landmarks_list = face_results.face_landmarks
         if self.get_part_to_mask("face")["save_timeseries"] == True:
             self.store_ts("face", face_landmarks_list, timestamp_ms)
@@ -236,7 +348,7 @@ class MediaPipeMaskExtractor(BaseMaskExtractor):
             )
 
         if not "face" in self.model_3d_only_parts:
-            output_image = np.zeros(frame.shape, dtype=np.uint8)
+            output_image = np.zeros(frame_context.shape, dtype=np.uint8)
             output_image = self.draw_face_mesh_landmarks(
                 output_image, face_landmarks_list
             )
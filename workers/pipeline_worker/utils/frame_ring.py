@@ -0,0 +1,59 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """
+    Fixed size slots for frames (or frame sized images) in one shared memory block.
+
+    The process creating the ring owns the block and unlinks it on close, other
+    processes attach with get_spec() and read the slots as numpy views without copying.
+    The owner decides which slots are in use, e.g. slot = frame index % slot_count as
+    long as at most slot_count frames are in flight.
+    """
+
+    def __init__(self, slot_count: int, slot_shape: tuple, dtype="uint8", name: str = None):
+        self.slot_count = slot_count
+        self.slot_shape = tuple(slot_shape)
+        self.dtype = np.dtype(dtype)
+        slot_bytes = int(np.prod(self.slot_shape)) * self.dtype.itemsize
+        self.is_owner = name is None
+        if self.is_owner:
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=max(1, slot_bytes * slot_count)
+            )
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.slots = np.ndarray(
+            (slot_count,) + self.slot_shape, dtype=self.dtype, buffer=self.memory.buf
+        )
+
+    @classmethod
+    def attach(cls, spec: dict):
+        return cls(spec["slot_count"], spec["slot_shape"], spec["dtype"], spec["name"])
+
+    def get_spec(self) -> dict:
+        return {
+            "name": self.memory.name,
+            "slot_count": self.slot_count,
+            "slot_shape": self.slot_shape,
+            "dtype": self.dtype.str,
+        }
+
+    def write(self, slot: int, array: np.ndarray):
+        np.copyto(self.slots[slot], array)
+
+    def read(self, slot: int) -> np.ndarray:
+        # a view, only valid until the slot is written again
+        return self.slots[slot]
+
+    def close(self):
+        self.slots = None
+        try:
+            self.memory.close()
+        except BufferError:
+            # views on the slots are still referenced, the mapping is released with them
+            pass
+        if self.is_owner:
+            self.memory.unlink()
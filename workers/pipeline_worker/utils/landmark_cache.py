@@ -0,0 +1,223 @@
+import os
+import json
+import struct
+import hashlib
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from common.utils.app_utils import prune_cache_dir
+from pipeline_worker.utils.video_metadata import get_video_key
+from config import LANDMARK_CACHE_BASE_PATH, LANDMARK_CACHE_MAX_BYTES
+
+LANDMARK_CACHE_VERSION = 1
+LANDMARK_CACHE_MAGIC = b"LMRK"
+LANDMARK_CACHE_EXTENSION = ".lmrk"
+# x, y, z, visibility, presence of each landmark, missing values are stored as NaN
+LANDMARK_FIELDS = 5
+
+
+@dataclass
+class CachedLandmark:
+    x: float
+    y: float
+    z: float
+    visibility: Optional[float] = None
+    presence: Optional[float] = None
+
+
+@dataclass
+class CachedCategory:
+    category_name: str
+    score: float
+
+
+@dataclass
+class CachedPoseResult:
+    pose_landmarks: list
+    pose_world_landmarks: list
+
+
+@dataclass
+class CachedFaceResult:
+    face_landmarks: list
+    face_blendshapes: list
+    facial_transformation_matrixes: list
+
+
+def compute_landmark_cache_key(
+    task: str, model_options: dict, inference_resolution, video_metadata: dict
+) -> str:
+    key_data = {
+        "version": LANDMARK_CACHE_VERSION,
+        "task": task,
+        "options": model_options,
+        "inference_resolution": inference_resolution,
+        "video": get_video_key(video_metadata),
+    }
+    return hashlib.sha256(
+        json.dumps(key_data, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def get_landmark_cache_path(video_id: str, cache_key: str) -> str:
+    return os.path.join(
+        LANDMARK_CACHE_BASE_PATH, f"{video_id}_{cache_key}{LANDMARK_CACHE_EXTENSION}"
+    )
+
+
+def landmarks_to_array(landmarks_list: list) -> np.ndarray:
+    # list (per person) of lists of landmarks -> float32 array of shape (persons, landmarks, fields)
+    landmark_count = len(landmarks_list[0]) if landmarks_list else 0
+    array = np.full(
+        (len(landmarks_list), landmark_count, LANDMARK_FIELDS), np.nan, dtype=np.float32
+    )
+    for person_index, landmarks in enumerate(landmarks_list):
+        for landmark_index, landmark in enumerate(landmarks):
+            values = [
+                landmark.x,
+                landmark.y,
+                landmark.z,
+                getattr(landmark, "visibility", None),
+                getattr(landmark, "presence", None),
+            ]
+            array[person_index, landmark_index] = [
+                np.nan if value is None else value for value in values
+            ]
+    return array
+
+
+def array_to_landmarks(array: np.ndarray) -> list:
+    def to_value(value):
+        return None if np.isnan(value) else float(value)
+
+    return [
+        [CachedLandmark(*[to_value(value) for value in landmark]) for landmark in landmarks]
+        for landmarks in array
+    ]
+
+
+def write_array(file, array: np.ndarray):
+    file.write(struct.pack("<B", array.ndim))
+    file.write(struct.pack(f"<{array.ndim}I", *array.shape))
+    file.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_array(file, dtype) -> np.ndarray:
+    (ndim,) = struct.unpack("<B", file.read(1))
+    shape = struct.unpack(f"<{ndim}I", file.read(4 * ndim))
+    count = int(np.prod(shape))
+    data = file.read(count * np.dtype(dtype).itemsize)
+    return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+
+class LandmarkCacheWriter:
+    """
+    Records the per frame results of a MediaPipe landmark model for a video. The footer
+    (frame count and blendshape names) is appended when the cache is closed and the file
+    is only moved to its final path once all frames of the video were written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.frame_count = 0
+        self.blendshape_names = None
+        self.file = open(self.tmp_path, "wb")
+        self.file.write(LANDMARK_CACHE_MAGIC)
+
+    def write_pose_result(self, pose_result):
+        write_array(self.file, landmarks_to_array(pose_result.pose_landmarks))
+        write_array(self.file, landmarks_to_array(pose_result.pose_world_landmarks))
+        self.frame_count += 1
+
+    def write_face_result(self, face_result):
+        write_array(self.file, landmarks_to_array(face_result.face_landmarks))
+
+        blendshapes = face_result.face_blendshapes or []
+        if blendshapes and self.blendshape_names is None:
+            self.blendshape_names = [entry.category_name for entry in blendshapes[0]]
+        scores = np.zeros(
+            (len(blendshapes), len(self.blendshape_names or [])), dtype=np.float32
+        )
+        for person_index, categories in enumerate(blendshapes):
+            scores[person_index] = [entry.score for entry in categories]
+        write_array(self.file, scores)
+
+        matrixes = face_result.facial_transformation_matrixes or []
+        write_array(
+            self.file,
+            np.array(matrixes, dtype=np.float64).reshape(len(matrixes), 4, 4),
+        )
+        self.frame_count += 1
+
+    def close(self, complete: bool):
+        if complete:
+            footer = json.dumps(
+                {
+                    "frame_count": self.frame_count,
+                    "blendshape_names": self.blendshape_names or [],
+                }
+            ).encode("utf-8")
+            self.file.write(footer + struct.pack("<I", len(footer)))
+        self.file.close()
+
+        if complete:
+            os.replace(self.tmp_path, self.path)
+            prune_cache_dir(
+                LANDMARK_CACHE_BASE_PATH,
+                LANDMARK_CACHE_EXTENSION,
+                LANDMARK_CACHE_MAX_BYTES,
+            )
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class LandmarkCacheReader:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        os.utime(path)  # marks the cache as recently used for pruning
+        if self.file.read(len(LANDMARK_CACHE_MAGIC)) != LANDMARK_CACHE_MAGIC:
+            raise Exception(f"Invalid landmark cache {path}")
+
+        self.file.seek(-4, os.SEEK_END)
+        (footer_length,) = struct.unpack("<I", self.file.read(4))
+        self.file.seek(-4 - footer_length, os.SEEK_END)
+        footer = json.loads(self.file.read(footer_length))
+        self.frame_count: int = footer["frame_count"]
+        self.blendshape_names: List[str] = footer["blendshape_names"]
+        self.frames_read = 0
+        self.file.seek(len(LANDMARK_CACHE_MAGIC))
+
+    def next_frame(self):
+        if self.frames_read >= self.frame_count:
+            raise Exception("Landmark cache ended before the video")
+        self.frames_read += 1
+
+    def read_pose_result(self) -> CachedPoseResult:
+        self.next_frame()
+        return CachedPoseResult(
+            pose_landmarks=array_to_landmarks(read_array(self.file, np.float32)),
+            pose_world_landmarks=array_to_landmarks(read_array(self.file, np.float32)),
+        )
+
+    def read_face_result(self) -> CachedFaceResult:
+        self.next_frame()
+        face_landmarks = array_to_landmarks(read_array(self.file, np.float32))
+        blendshape_scores = read_array(self.file, np.float32)
+        matrixes = read_array(self.file, np.float64)
+        return CachedFaceResult(
+            face_landmarks=face_landmarks,
+            face_blendshapes=[
+                [
+                    CachedCategory(name, float(score))
+                    for name, score in zip(self.blendshape_names, scores)
+                ]
+                for scores in blendshape_scores
+            ],
+            facial_transformation_matrixes=[matrix.copy() for matrix in matrixes],
+        )
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,146 @@
+import os
+import json
+import struct
+import zlib
+import hashlib
+from typing import List
+
+import numpy as np
+
+from common.utils.app_utils import prune_cache_dir
+from pipeline_worker.utils.video_metadata import get_video_key
+from config import MASK_TRACKS_BASE_PATH, MASK_TRACKS_MAX_BYTES
+
+MASK_TRACK_VERSION = 2
+MASK_TRACK_MAGIC = b"MTRK"
+MASK_TRACK_EXTENSION = ".mtrk"
+# after the magic: number of frames (set once the track is complete), header length
+FILE_HEADER = struct.Struct("<II")
+# per part and frame: mask height, mask width, length of the compressed data
+RECORD_HEADER = struct.Struct("<HHI")
+
+
+def compute_track_key(
+    model_name: str, parts_to_detect: list, inference_resolution, video_metadata: dict
+) -> str:
+    """
+    Key of the detection masks a detector produces for a video. Only depends on the video
+    content, the model, the inference resolution of the detector and the detection
+    params, not on how the masks are hidden.
+    """
+    key_data = {
+        "version": MASK_TRACK_VERSION,
+        "model": model_name,
+        "inference_resolution": inference_resolution,
+        "parts": sorted(
+            [
+                {
+                    "part_name": part["part_name"],
+                    "detection_type": part["detection_type"],
+                    "detection_params": part.get("detection_params"),
+                }
+                for part in parts_to_detect
+            ],
+            key=lambda part: part["part_name"],
+        ),
+        "video": get_video_key(video_metadata),
+    }
+    return hashlib.sha256(
+        json.dumps(key_data, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def get_mask_track_path(video_id: str, track_key: str) -> str:
+    return os.path.join(MASK_TRACKS_BASE_PATH, f"{video_id}_{track_key}{MASK_TRACK_EXTENSION}")
+
+
+def encode_mask(mask: np.ndarray) -> tuple:
+    # The hider only distinguishes zero and non zero mask pixels, so 1 bit per pixel is lossless
+    if mask is None:
+        return 0, 0, b""
+    binary_mask = mask != 0
+    if binary_mask.ndim == 3:
+        binary_mask = np.any(binary_mask, axis=2)
+    height, width = binary_mask.shape
+    return height, width, zlib.compress(np.packbits(binary_mask).tobytes(), 1)
+
+
+def decode_mask(height: int, width: int, data: bytes) -> np.ndarray:
+    if not data:
+        return None
+    bits = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+    binary_mask = np.unpackbits(bits, count=height * width).reshape(height, width)
+    return np.repeat(binary_mask[:, :, np.newaxis], 3, axis=2)
+
+
+class MaskTrackWriter:
+    """
+    Writes the per frame detection masks of all parts of a detector. The track is written
+    to a temporary file and only moved to its final path once all frames were written.
+    """
+
+    def __init__(self, path: str, part_names: List[str]):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.part_names = part_names
+        self.frame_count = 0
+        self.file = open(self.tmp_path, "wb")
+        header = json.dumps({"parts": part_names}).encode("utf-8")
+        self.file.write(MASK_TRACK_MAGIC + FILE_HEADER.pack(0, len(header)) + header)
+
+    def write_frame(self, detection_results: list):
+        masks = {result["part_name"]: result["mask"] for result in detection_results}
+        for part_name in self.part_names:
+            height, width, data = encode_mask(masks.get(part_name))
+            self.file.write(RECORD_HEADER.pack(height, width, len(data)))
+            self.file.write(data)
+        self.frame_count += 1
+
+    def close(self, complete: bool):
+        if complete:
+            self.file.seek(len(MASK_TRACK_MAGIC))
+            self.file.write(struct.pack("<I", self.frame_count))
+        self.file.close()
+        if complete:
+            os.replace(self.tmp_path, self.path)
+            prune_cache_dir(
+                MASK_TRACKS_BASE_PATH, MASK_TRACK_EXTENSION, MASK_TRACKS_MAX_BYTES
+            )
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class MaskTrackReader:
+    def __init__(self, path: str, expected_frame_count: int = None):
+        # Raises if the track can not be read or has fewer frames than expected, the
+        # caller runs the detector instead
+        self.file = open(path, "rb")
+        try:
+            os.utime(path)  # marks the track as recently used for pruning
+            if self.file.read(len(MASK_TRACK_MAGIC)) != MASK_TRACK_MAGIC:
+                raise Exception(f"Invalid mask track {path}")
+            self.frame_count, header_length = FILE_HEADER.unpack(
+                self.file.read(FILE_HEADER.size)
+            )
+            self.part_names = json.loads(self.file.read(header_length))["parts"]
+            if expected_frame_count is not None and self.frame_count < expected_frame_count:
+                raise Exception(
+                    f"Mask track {path} has {self.frame_count} of {expected_frame_count} frames"
+                )
+        except Exception:
+            self.file.close()
+            raise
+
+    def read_frame(self) -> dict:
+        # Returns part_name -> mask of the next frame
+        masks = {}
+        for part_name in self.part_names:
+            record_header = self.file.read(RECORD_HEADER.size)
+            if len(record_header) < RECORD_HEADER.size:
+                raise Exception("Mask track ended before the video")
+            height, width, length = RECORD_HEADER.unpack(record_header)
+            masks[part_name] = decode_mask(height, width, self.file.read(length))
+        return masks
+
+    def close(self):
+        self.file.close()
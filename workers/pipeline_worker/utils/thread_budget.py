@@ -0,0 +1,152 @@
+import os
+
+from common.utils.metrics import metrics_registry
+from config import THREAD_BUDGET, THREAD_BUDGET_PIN_CPUS
+
+# read by OpenMP, BLAS and numexpr when torch or numpy are imported
+THREAD_ENV_VARIABLES = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+]
+
+thread_budget_gauge = metrics_registry.gauge(
+    "worker_thread_budget",
+    "Effective thread settings of the process, see pipeline_worker.utils.thread_budget",
+    ("setting",),
+)
+
+
+def read_cgroup_cpu_limit():
+    # CPU quota of the container (cgroup v2, then v1), None if unlimited
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return max(1, int(quota / period))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_available_cpus() -> int:
+    # CPUs the process may run on, limited by the CPU quota of the container
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    cgroup_limit = read_cgroup_cpu_limit()
+    return min(cpus, cgroup_limit) if cgroup_limit else cpus
+
+
+class ThreadBudget:
+    """
+    Splits one CPU thread budget between the processes and concurrent jobs of a worker
+    and configures OpenCV, torch, OpenMP/BLAS and the video decoder and encoder from it.
+    Without it every library starts a thread per core in every process.
+
+    The stages of a frame (decode, detect, hide, mask, encode) run one after another,
+    so each library gets the whole share of a job. MediaPipe Tasks have no thread
+    option in Python, with THREAD_BUDGET_PIN_CPUS the processes are pinned to disjoint
+    CPUs, which also bounds them.
+
+    configure has to be called before the model libraries are imported, as some of
+    them only read their thread settings on import.
+    """
+
+    def __init__(self):
+        self.settings = {}
+
+    def configure(
+        self,
+        processes: int = 1,
+        concurrent_jobs: int = 1,
+        process_index: int = None,
+        total_threads: int = None,
+    ) -> dict:
+        available_cpus = get_available_cpus()
+        total_threads = total_threads or THREAD_BUDGET or available_cpus
+        job_threads = max(1, total_threads // max(1, processes * concurrent_jobs))
+
+        settings = {
+            "available_cpus": available_cpus,
+            "total_threads": total_threads,
+            "processes": processes,
+            "concurrent_jobs": concurrent_jobs,
+            "job_threads": job_threads,
+            "opencv_threads": job_threads,
+            "torch_threads": job_threads,
+            # inference of a single model is parallelized within ops, not between them
+            "torch_interop_threads": 1,
+            "openmp_threads": job_threads,
+            "decoder_threads": job_threads,
+            "encoder_threads": job_threads,
+            "pinned_cpus": 0,
+        }
+
+        for name in THREAD_ENV_VARIABLES:
+            os.environ[name] = str(job_threads)
+        # codec options of the FFmpeg backend of cv2.VideoWriter
+        os.environ["OPENCV_FFMPEG_WRITER_OPTIONS"] = f"threads;{job_threads}"
+
+        if THREAD_BUDGET_PIN_CPUS and process_index is not None and processes > 1:
+            settings["pinned_cpus"] = self.pin_cpus(processes, process_index)
+
+        self.configure_opencv(job_threads)
+        settings["torch_threads"], settings["torch_interop_threads"] = self.configure_torch(
+            job_threads, settings["torch_interop_threads"]
+        )
+
+        self.settings = settings
+        for name, value in settings.items():
+            thread_budget_gauge.set(value, setting=name)
+        print("Thread budget: " + str(settings))
+        return settings
+
+    @staticmethod
+    def pin_cpus(processes: int, process_index: int) -> int:
+        # process i gets the CPUs i, i + processes, i + 2 * processes, ...
+        cpus = sorted(os.sched_getaffinity(0))
+        process_cpus = cpus[process_index % processes :: processes] or cpus
+        os.sched_setaffinity(0, process_cpus)
+        return len(process_cpus)
+
+    @staticmethod
+    def configure_opencv(threads: int):
+        import cv2
+
+        cv2.setNumThreads(threads)
+
+    @staticmethod
+    def configure_torch(threads: int, interop_threads: int) -> tuple:
+        # returns the effective settings, torch is optional (YOLO and RVC only)
+        try:
+            import torch
+        except ImportError:
+            return 0, 0
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # only possible before torch ran parallel work, e.g. in a later configure call
+            pass
+        return torch.get_num_threads(), torch.get_num_interop_threads()
+
+    def get(self, name: str):
+        # None until configure was called, the libraries keep their defaults then
+        return self.settings.get(name)
+
+
+thread_budget = ThreadBudget()
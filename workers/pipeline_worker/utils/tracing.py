@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+
+from common.utils.metrics import metrics_registry
+from config import TRACING_ENABLED, TRACING_MAX_EVENTS
+
+stage_calls = metrics_registry.counter(
+    "pipeline_stage_calls_total",
+    "Number of recorded spans per stage of traced jobs, frames for per frame stages",
+    ("stage",),
+)
+stage_seconds = metrics_registry.counter(
+    "pipeline_stage_seconds_total",
+    "Time spent per stage of traced jobs",
+    ("stage",),
+)
+stage_fps = metrics_registry.gauge(
+    "pipeline_stage_fps",
+    "Frames per second of the per frame stages of the last traced job",
+    ("stage",),
+)
+
+# stages recorded once per frame, besides the per model stages like "detect.YoloDetector"
+PER_FRAME_STAGES = {"decode", "overlay", "encode", "timeseries_write"}
+
+
+class NullSpan:
+    # Returned while tracing is disabled, so a span costs a single attribute check
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Collects timed spans of a job, e.g. `with tracer.span("decode"): ...`.
+
+    Spans are aggregated into a per-stage summary (count, total, mean and max duration)
+    and, up to max_events, kept as Chrome trace events (chrome://tracing or Perfetto).
+    Times of nested spans are inclusive, e.g. the "job" span contains all others.
+    """
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.dropped_events = 0
+        self.stages = {}  # name -> [count, total seconds, max seconds]
+
+    def begin_job(self, enabled: bool):
+        self.enabled = enabled
+        self.reset()
+
+    def end_job(self):
+        if self.enabled:
+            self.record_stage_metrics()
+        self.enabled = False
+        self.reset()
+
+    def record_stage_metrics(self):
+        for name, (count, total, _maximum) in self.stages.items():
+            stage_calls.inc(count, stage=name)
+            stage_seconds.inc(total, stage=name)
+            if name in PER_FRAME_STAGES or "." in name:
+                stage_fps.set(count / total if total > 0 else 0, stage=name)
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name: str, start: float, end: float, args: dict):
+        duration = end - start
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [1, duration, duration]
+        else:
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = max(stage[2], duration)
+
+        if len(self.events) < self.max_events:
+            self.events.append(
+                (name, start - self.origin, duration, threading.get_ident(), args)
+            )
+        else:
+            self.dropped_events += 1
+
+    def get_summary(self) -> dict:
+        # name -> count and durations in ms, the most expensive stages first
+        summary = {}
+        for name, (count, total, maximum) in sorted(
+            self.stages.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            summary[name] = {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / count, 3),
+                "max_ms": round(maximum * 1000, 3),
+            }
+        return summary
+
+    def export_chrome_trace(self) -> bytes:
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": round(start * 1e6, 3),
+                "dur": round(duration * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            for name, start, duration, tid, args in self.events
+        ]
+        return json.dumps(
+            {
+                "traceEvents": trace_events,
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped_events},
+            }
+        ).encode("utf-8")
+
+
+def is_tracing_requested(run_params: dict) -> bool:
+    return TRACING_ENABLED or bool(run_params.get("tracing", False))
+
+
+tracer = Tracer(TRACING_MAX_EVENTS)
@@ -0,0 +1,219 @@
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from pipeline_worker.utils.thread_budget import thread_budget
+
+try:
+    import av
+except ImportError:  # PyAV is optional, fall back to OpenCV decoding
+    av = None
+
+# with seek_sampling, the decoder seeks to the next sample if it is further ahead than
+# this, instead of decoding all frames in between
+SEEK_MIN_GAP_MS = 2000
+
+
+def get_output_size(width: int, height: int, max_resolution: Optional[int]):
+    # Returns the (even) frame size so that the longer side is at most max_resolution
+    if not max_resolution or max(width, height) <= max_resolution:
+        return width, height
+    scale = max_resolution / float(max(width, height))
+    return (
+        max(2, int(round(width * scale / 2)) * 2),
+        max(2, int(round(height * scale / 2)) * 2),
+    )
+
+
+class VideoDecoder:
+    """
+    Iterates over the frames of a video as (frame, pts_ms) pairs.
+
+    Timestamps are taken from the packet PTS (relative to the stream start), so no
+    frame is dropped and they are strictly increasing, as required by the MediaPipe
+    VIDEO running mode. With PyAV the BGR conversion and optional downscaling happen
+    in a single swscale pass and the returned arrays are views on the decoded buffer.
+    Without PyAV, OpenCV is used and timestamps are taken from the packet index
+    (frame_timestamps of the video metadata) if given.
+
+    Args:
+        video_path (str): Path of the video to decode.
+        max_resolution (int): If given, frames are downscaled so that their longer side
+            is at most max_resolution pixels.
+        target_fps (float): If given, frames are sampled to approximately this rate.
+        frame_timestamps (List[float]): Packet timestamps in ms, used by the OpenCV fallback.
+        seek_sampling (bool): Seek to far apart samples (see SEEK_MIN_GAP_MS) instead of
+            decoding every frame, for a few frames sampled from a long video. PyAV only.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        max_resolution: Optional[int] = None,
+        target_fps: Optional[float] = None,
+        frame_timestamps: Optional[List[float]] = None,
+        seek_sampling: bool = False,
+    ):
+        self.video_path = video_path
+        self.max_resolution = max_resolution
+        self.target_fps = target_fps
+        self.frame_timestamps = frame_timestamps
+        self.seek_sampling = seek_sampling
+
+        self._container = None
+        self._capture = None
+        if av is not None:
+            self._container = av.open(video_path)
+            self._stream = self._container.streams.video[0]
+            self._stream.thread_type = "AUTO"
+            if thread_budget.get("decoder_threads"):
+                self._stream.codec_context.thread_count = thread_budget.get(
+                    "decoder_threads"
+                )
+            source_width = self._stream.codec_context.width
+            source_height = self._stream.codec_context.height
+            rate = self._stream.average_rate or self._stream.guessed_rate
+            self.source_fps = float(rate) if rate else 0.0
+        else:
+            if thread_budget.get("decoder_threads") and hasattr(
+                cv2, "CAP_PROP_N_THREADS"
+            ):
+                self._capture = cv2.VideoCapture(
+                    video_path,
+                    cv2.CAP_ANY,
+                    [cv2.CAP_PROP_N_THREADS, thread_budget.get("decoder_threads")],
+                )
+            else:
+                self._capture = cv2.VideoCapture(video_path)
+            source_width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            source_height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.source_fps = self._capture.get(cv2.CAP_PROP_FPS)
+
+        self.width, self.height = get_output_size(
+            source_width, source_height, max_resolution
+        )
+        self.is_scaled = (self.width, self.height) != (source_width, source_height)
+
+    @property
+    def fps(self) -> float:
+        # frame rate of the produced frames
+        if self.target_fps and self.source_fps:
+            return min(self.target_fps, self.source_fps)
+        return self.source_fps or self.target_fps or 0.0
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, int]]:
+        next_sample_ms = None
+        last_pts_ms = None
+        sample_interval_ms = 1000.0 / self.target_fps if self.target_fps else None
+
+        if self.seek_sampling and sample_interval_ms and self._container is not None:
+            # sampled with the same schedule as below
+            frames = self._decode_seeking(sample_interval_ms)
+        else:
+            frames = self._decode()
+
+        for pts_ms, raw_frame in frames:
+            if sample_interval_ms is not None:
+                if next_sample_ms is not None and pts_ms < next_sample_ms:
+                    continue
+                next_sample_ms = (
+                    pts_ms if next_sample_ms is None else next_sample_ms
+                ) + sample_interval_ms
+
+            pts_ms = int(round(pts_ms))
+            if last_pts_ms is not None and pts_ms <= last_pts_ms:
+                pts_ms = last_pts_ms + 1
+            last_pts_ms = pts_ms
+
+            yield self._to_bgr(raw_frame), pts_ms
+
+    def _decode(self):
+        if self._container is not None:
+            start_time = self._stream.start_time or 0
+            time_base = float(self._stream.time_base)
+            fallback_ms = 1000.0 / self.source_fps if self.source_fps else 40.0
+            last_pts_ms = None
+            for frame in self._container.decode(self._stream):
+                if frame.pts is not None:
+                    pts_ms = (frame.pts - start_time) * time_base * 1000.0
+                elif last_pts_ms is not None:
+                    pts_ms = last_pts_ms + fallback_ms
+                else:
+                    pts_ms = 0.0
+                last_pts_ms = pts_ms
+                yield pts_ms, frame
+            return
+
+        index = 0
+        fallback_ms = 1000.0 / self.source_fps if self.source_fps else 40.0
+        first_timestamp = self.frame_timestamps[0] if self.frame_timestamps else 0.0
+        while True:
+            ret, frame = self._capture.read()
+            if not ret:
+                break
+            if self.frame_timestamps and index < len(self.frame_timestamps):
+                pts_ms = self.frame_timestamps[index] - first_timestamp
+            else:
+                pts_ms = index * fallback_ms
+            index += 1
+            yield pts_ms, frame
+
+    def _decode_seeking(self, sample_interval_ms: float):
+        # Yields the first frame at or after each sample time, starting with the first
+        # frame of the video. Seeking lands on the keyframe before the sample time.
+        start_time = self._stream.start_time or 0
+        time_base = float(self._stream.time_base)
+        frames = self._container.decode(self._stream)
+        next_sample_ms = None
+        last_pts_ms = None
+        while True:
+            if next_sample_ms is not None and next_sample_ms - last_pts_ms > SEEK_MIN_GAP_MS:
+                self._container.seek(
+                    start_time + int(next_sample_ms / 1000.0 / time_base),
+                    stream=self._stream,
+                )
+                frames = self._container.decode(self._stream)
+
+            for frame in frames:
+                if frame.pts is None:
+                    continue
+                pts_ms = (frame.pts - start_time) * time_base * 1000.0
+                if next_sample_ms is None or pts_ms >= next_sample_ms:
+                    break
+            else:
+                return
+
+            next_sample_ms = (
+                pts_ms if next_sample_ms is None else next_sample_ms
+            ) + sample_interval_ms
+            last_pts_ms = pts_ms
+            yield pts_ms, frame
+
+    def _to_bgr(self, raw_frame) -> np.ndarray:
+        if self._container is not None:
+            if self.is_scaled:
+                return raw_frame.to_ndarray(
+                    format="bgr24", width=self.width, height=self.height
+                )
+            return raw_frame.to_ndarray(format="bgr24")
+
+        if self.is_scaled:
+            return cv2.resize(
+                raw_frame, (self.width, self.height), interpolation=cv2.INTER_AREA
+            )
+        return raw_frame
+
+    def close(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,61 @@
+import os
+import json
+
+from pipeline_worker.utils.video_probe import probe_video, compute_content_hash
+from config import VIDEOS_BASE_PATH
+
+# video_id -> (mtime of the stored metadata, metadata), shared by everything that runs inside this worker process
+_metadata_cache = {}
+
+
+def get_video_key(video_metadata: dict) -> dict:
+    # identifies the content of a video in the keys of the stored masks and landmarks
+    return {"etag": video_metadata["etag"]}
+
+
+def get_video_info(video_path: str) -> dict:
+    # video_info of a result video as the backend stores it, without the frame timestamps
+    video_info = probe_video(video_path)
+    video_info.pop("frame_timestamps")
+    return video_info
+
+
+def get_metadata_path(video_id: str) -> str:
+    return os.path.join(VIDEOS_BASE_PATH, video_id + ".metadata.json")
+
+
+def store_video_metadata(video_id: str, metadata: dict):
+    # stores metadata received from the backend, so it does not need to be probed again
+    metadata_path = get_metadata_path(video_id)
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f)
+    _metadata_cache[video_id] = (os.stat(metadata_path).st_mtime_ns, metadata)
+
+
+def get_video_metadata(video_id: str, video_path: str) -> dict:
+    """
+    Returns the metadata of an original video. Uses (in this order) the in-process
+    cache, the metadata stored next to the video (usually fetched from the backend)
+    and finally probes the video locally. Videos that were not fetched from the backend
+    (batch and bench runs) get a content hash as their "etag".
+    """
+    size = os.path.getsize(video_path)
+    metadata_path = get_metadata_path(video_id)
+    # the stored metadata is replaced whenever the video is fetched again
+    mtime_ns = os.stat(metadata_path).st_mtime_ns if os.path.exists(metadata_path) else None
+
+    cached = _metadata_cache.get(video_id)
+    if cached is not None and cached[0] == mtime_ns and cached[1]["size"] == size:
+        return cached[1]
+
+    if mtime_ns is not None:
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+        if metadata["size"] == size and "etag" in metadata:
+            _metadata_cache[video_id] = (mtime_ns, metadata)
+            return metadata
+
+    metadata = probe_video(video_path)
+    metadata["etag"] = compute_content_hash(video_path)
+    store_video_metadata(video_id, metadata)
+    return metadata
@@ -6,12 +6,7 @@ import numpy as np
 from config import RESULT_BASE_PATH, VIDEOS_BASE_PATH
 
 
-def setup_video_processing(video_in_path: str, video_out_path: str):
-    video_cap = cv2.VideoCapture(video_in_path)
-    frameWidth = video_cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-    frameHeight = video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-    samplerate = video_cap.get(cv2.CAP_PROP_FPS)
-
+def create_video_writer(video_out_path: str, fps: float, frame_size: tuple):
     """
     vp09 seems to be a reasonable compromise that doesn't require a custom build, works in most modern browsers
     and is comparably efficient
@@ -23,11 +18,11 @@ def setup_video_processing(video_in_path: str, video_out_path: str):
     out = cv2.VideoWriter(
         video_out_path,
         fourcc,
-        fps=samplerate,
-        frameSize=(int(frameWidth), int(frameHeight)),
+        fps=fps,
+        frameSize=(int(frame_size[0]), int(frame_size[1])),
     )
 
-    return video_cap, out
+    return out
 
 
 def merge_results(
@@ -84,7 +79,6 @@ def merge_results(
     cap2.release()
     cap3.release()
     out.release()
-    cv2.destroyAllWindows()
     print("Done merging results")
 
     return hidden_video_path